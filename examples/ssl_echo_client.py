@@ -15,8 +15,8 @@ if __name__ == '__main__':
     client = TcpServerConnection('::', 12345)
     client.connect()
     client.wrap('example.com', ca_file='ca-cert.pem')
-    # wrap() will by default set connection to nonblocking
-    # flip it back to blocking
+    # connection has a timeout, hence wrap() completes the
+    # handshake before returning.  Flip it to blocking
     client.connection.setblocking(True)
     try:
         while True:
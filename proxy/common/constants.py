@@ -40,13 +40,23 @@ PROXY_AGENT_HEADER = PROXY_AGENT_HEADER_KEY + \
 DEFAULT_BACKLOG = 100
 DEFAULT_BASIC_AUTH = None
 DEFAULT_BUFFER_SIZE = 1024 * 1024
+DEFAULT_BODY_BUFFER_SIZE = DEFAULT_BUFFER_SIZE
+DEFAULT_BODY_SPOOL_DIR = None
 DEFAULT_CA_CERT_DIR = None
+DEFAULT_CA_CERT_PREWARM = ''
+DEFAULT_CA_CERT_RENEW_BEFORE = 30
 DEFAULT_CA_CERT_FILE = None
 DEFAULT_CA_KEY_FILE = None
 DEFAULT_CA_SIGNING_KEY_FILE = None
+DEFAULT_CACHE_DISK_SIZE = 1024 * 1024 * 1024
+DEFAULT_CACHE_MAX_OBJECT_SIZE = 8 * 1024 * 1024
+DEFAULT_CACHE_MEMORY_SIZE = 64 * 1024 * 1024
+DEFAULT_CACHE_SEGMENT_SIZE = 64 * 1024 * 1024
 DEFAULT_CERT_FILE = None
 DEFAULT_CA_FILE = None
 DEFAULT_CLIENT_RECVBUF_SIZE = DEFAULT_BUFFER_SIZE
+DEFAULT_CONN_POOL_IDLE_TIMEOUT = 30
+DEFAULT_CONN_POOL_MAX_PER_HOST = 8
 DEFAULT_DEVTOOLS_WS_PATH = b'/devtools'
 DEFAULT_DISABLE_HEADERS: List[bytes] = []
 DEFAULT_DISABLE_HTTP_PROXY = False
@@ -62,19 +72,25 @@ DEFAULT_KEY_FILE = None
 DEFAULT_LOG_FILE = None
 DEFAULT_LOG_FORMAT = '%(asctime)s - pid:%(process)d [%(levelname)-.1s] %(funcName)s:%(lineno)d - %(message)s'
 DEFAULT_LOG_LEVEL = 'INFO'
+DEFAULT_MAX_BODY_SIZE = 0
+DEFAULT_MAX_HEADER_SIZE = 64 * 1024
+DEFAULT_MAX_REQUEST_LINE_SIZE = 8 * 1024
 DEFAULT_NUM_WORKERS = 0
 DEFAULT_OPEN_FILE_LIMIT = 1024
 DEFAULT_PAC_FILE = None
 DEFAULT_PAC_FILE_URL_PATH = b'/'
 DEFAULT_PID_FILE = None
+DEFAULT_PKI_BACKEND = 'openssl'
 DEFAULT_PLUGINS = ''
 DEFAULT_PORT = 8899
+DEFAULT_PROXY_POOL = ''
 DEFAULT_SERVER_RECVBUF_SIZE = DEFAULT_BUFFER_SIZE
 DEFAULT_STATIC_SERVER_DIR = os.path.join(PROXY_PY_DIR, "public")
 DEFAULT_THREADLESS = False
 DEFAULT_TIMEOUT = 10
 DEFAULT_VERSION = False
 DEFAULT_HTTP_PORT = 80
+DEFAULT_HTTP_PARSER = 'python'
 DEFAULT_MAX_SEND_SIZE = 16 * 1024
 
 DEFAULT_DATA_DIRECTORY_PATH = os.path.join(str(pathlib.Path.home()), '.proxy')
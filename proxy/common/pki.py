@@ -12,21 +12,62 @@ import time
 import sys
 import argparse
 import contextlib
+import datetime
+import functools
 import os
 import uuid
 import subprocess
 import tempfile
 import logging
-from typing import List, Generator, Optional, Tuple
+from typing import Any, List, Generator, NamedTuple, Optional, Tuple
 
 from .utils import bytes_
-from .constants import COMMA
+from .constants import COMMA, DEFAULT_PKI_BACKEND
+from .flag import flags
 from .version import __version__
 
+try:
+    from cryptography import x509
+    from cryptography.hazmat.backends import default_backend
+    from cryptography.hazmat.primitives import hashes, serialization
+    from cryptography.x509.oid import ExtendedKeyUsageOID, NameOID
+except ImportError:     # pragma: no cover
+    x509 = None
+
 
 logger = logging.getLogger(__name__)
 
 
+PkiBackends = NamedTuple('PkiBackends', [
+    ('OPENSSL', str),
+    ('CRYPTOGRAPHY', str),
+])
+pkiBackends = PkiBackends('openssl', 'cryptography')
+
+
+flags.add_argument(
+    '--pki-backend',
+    type=str,
+    default=DEFAULT_PKI_BACKEND,
+    choices=list(pkiBackends),
+    help='Default: openssl.  Backend used to generate certificates for TLS '
+    'interception.  openssl backend spawns openssl subprocesses, cryptography '
+    'backend signs certificates in-process and requires cryptography package '
+    'to be installed, otherwise openssl is used.'
+)
+
+# Subject components understood by openssl -subj, see gen_public_key
+SUBJECT_OIDS = {
+    'CN': 'COMMON_NAME',
+    'C': 'COUNTRY_NAME',
+    'ST': 'STATE_OR_PROVINCE_NAME',
+    'L': 'LOCALITY_NAME',
+    'O': 'ORGANIZATION_NAME',
+    'OU': 'ORGANIZATIONAL_UNIT_NAME',
+    'emailAddress': 'EMAIL_ADDRESS',
+}
+
+
 DEFAULT_CONFIG = b'''[ req ]
 #default_bits		= 2048
 #default_md		    = sha256
@@ -208,6 +249,102 @@ def ssl_config(
     os.remove(config_path)
 
 
+def sign_certificate(
+        crt_path: str,
+        key_path: str,
+        key_password: str,
+        ca_key_path: str,
+        ca_key_password: str,
+        ca_crt_path: str,
+        subject: str,
+        serial: int,
+        alt_subj_names: Optional[List[str]] = None,
+        extended_key_usage: Optional[str] = None,
+        validity_in_days: int = 365) -> bool:
+    """Generates a certificate for public key of key_path, signed using
+    CA key and certificate, in-process.  Equivalent of gen_public_key,
+    gen_csr and sign_csr.  Requires cryptography package.
+
+    Keys and CA certificate are loaded once and reused."""
+    try:
+        key = load_private_key(key_path, key_password, os.stat(key_path).st_mtime)
+        ca_key = load_private_key(ca_key_path, ca_key_password, os.stat(ca_key_path).st_mtime)
+        ca_crt = load_certificate(ca_crt_path, os.stat(ca_crt_path).st_mtime)
+        now = datetime.datetime.utcnow()
+        builder = x509.CertificateBuilder() \
+            .subject_name(parse_subject(subject)) \
+            .issuer_name(ca_crt.subject) \
+            .public_key(key.public_key()) \
+            .serial_number(serial) \
+            .not_valid_before(now) \
+            .not_valid_after(now + datetime.timedelta(days=validity_in_days))
+        if alt_subj_names:
+            builder = builder.add_extension(
+                x509.SubjectAlternativeName(
+                    [x509.DNSName(name) for name in alt_subj_names]),
+                critical=False)
+        if extended_key_usage is not None:
+            builder = builder.add_extension(
+                x509.ExtendedKeyUsage([
+                    getattr(ExtendedKeyUsageOID, usage_oid_name(usage))
+                    for usage in extended_key_usage.split(',')]),
+                critical=False)
+        crt = builder.sign(ca_key, hashes.SHA256(), default_backend())
+        with tempfile.NamedTemporaryFile(
+                dir=os.path.dirname(crt_path) or None, delete=False) as f:
+            f.write(crt.public_bytes(serialization.Encoding.PEM))
+        os.replace(f.name, crt_path)
+        return True
+    except (OSError, ValueError, TypeError, AttributeError) as e:
+        logger.error('Unable to generate certificate %s: %r', crt_path, e)
+        return False
+
+
+@functools.lru_cache(maxsize=None)
+def load_private_key(path: str, password: str, mtime: float) -> Any:
+    """Loads a PEM private key, cached until file is modified."""
+    with open(path, 'rb') as f:
+        return serialization.load_pem_private_key(
+            f.read(), password=bytes_(password) if password else None,
+            backend=default_backend())
+
+
+@functools.lru_cache(maxsize=None)
+def load_certificate(path: str, mtime: float) -> Any:
+    """Loads a PEM certificate, cached until file is modified."""
+    with open(path, 'rb') as f:
+        return x509.load_pem_x509_certificate(f.read(), default_backend())
+
+
+def parse_subject(subject: str) -> Any:
+    """Parses an openssl style subject e.g. /CN=example.com/O=Example."""
+    attributes = []
+    for component in subject.split('/'):
+        if not component:
+            continue
+        name, _, value = component.partition('=')
+        attributes.append(x509.NameAttribute(
+            getattr(NameOID, SUBJECT_OIDS[name.strip()]), value.strip()))
+    return x509.Name(attributes)
+
+
+def usage_oid_name(usage: str) -> str:
+    """Converts an openssl extendedKeyUsage name e.g. serverAuth to SERVER_AUTH."""
+    return ''.join('_' + c if c.isupper() else c.upper() for c in usage.strip())
+
+
+def get_pki_backend(backend: Optional[str]) -> str:
+    """Returns PKI backend to use for requested backend.
+
+    Falls back to openssl when cryptography is not installed."""
+    if backend == pkiBackends.CRYPTOGRAPHY:
+        if x509 is not None:
+            return pkiBackends.CRYPTOGRAPHY
+        logger.warning(
+            'cryptography is not installed, falling back to openssl pki backend')
+    return pkiBackends.OPENSSL
+
+
 def run_openssl_command(command: List[str], timeout: int) -> bool:
     cmd = subprocess.Popen(
         command,
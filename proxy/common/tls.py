@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+"""
+    proxy.py
+    ~~~~~~~~
+    ⚡⚡⚡ Fast, Lightweight, Pluggable, TLS interception capable proxy server focused on
+    Network monitoring, controls & Application development, testing, debugging.
+
+    :copyright: (c) 2013-present by Abhinav Singh and contributors.
+    :license: BSD, see LICENSE for more details.
+"""
+import os
+import ssl
+import logging
+import functools
+import threading
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Maximum number of contexts kept per process.  With TLS interception
+# a context is loaded for every intercepted host.
+MAX_CONTEXTS = 1024
+
+# Maximum number of upstream sessions kept per process
+MAX_SESSIONS = 1024
+
+# Upstream host, port and id of context used for the connection
+SessionKey = Tuple[str, int, int]
+
+sessions: 'OrderedDict[SessionKey, ssl.SSLSession]' = OrderedDict()
+sessions_lock = threading.Lock()
+
+
+def mtime(path: Optional[str]) -> float:
+    if path is None:
+        return 0.0
+    try:
+        return os.stat(path).st_mtime
+    except FileNotFoundError:
+        return 0.0
+
+
+@functools.lru_cache(maxsize=MAX_CONTEXTS)
+def load_server_context(certfile: str, keyfile: str, mtime: float) -> ssl.SSLContext:
+    """Loads context for accepting TLS connections, cached until certfile is modified.
+
+    Session tickets are encrypted using a key owned by the context,
+    hence clients can resume sessions across connections served
+    by the same context."""
+    ctx = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+    ctx.options |= ssl.OP_NO_SSLv2 | ssl.OP_NO_SSLv3 | ssl.OP_NO_TLSv1 | ssl.OP_NO_TLSv1_1
+    ctx.options &= ~ssl.OP_NO_TICKET
+    ctx.verify_mode = ssl.CERT_NONE
+    ctx.load_cert_chain(certfile=certfile, keyfile=keyfile)
+    return ctx
+
+
+@functools.lru_cache(maxsize=None)
+def load_client_context(ca_file: Optional[str], mtime: float) -> ssl.SSLContext:
+    """Loads context for upstream TLS connections, cached until ca_file is modified."""
+    ctx = ssl.create_default_context(ssl.Purpose.SERVER_AUTH, cafile=ca_file)
+    ctx.options |= ssl.OP_NO_SSLv2 | ssl.OP_NO_SSLv3 | ssl.OP_NO_TLSv1
+    ctx.check_hostname = True
+    return ctx
+
+
+def server_context(certfile: str, keyfile: str) -> ssl.SSLContext:
+    return load_server_context(certfile, keyfile, mtime(certfile))
+
+
+def client_context(ca_file: Optional[str]) -> ssl.SSLContext:
+    return load_client_context(ca_file, mtime(ca_file))
+
+
+def get_session(key: SessionKey) -> Optional[ssl.SSLSession]:
+    """Returns last session established with upstream, if any."""
+    with sessions_lock:
+        return sessions.get(key)
+
+
+def save_session(key: SessionKey, conn: ssl.SSLSocket) -> None:
+    """Saves session of an upstream connection for reuse by
+    subsequent connections to the same upstream."""
+    session = conn.session
+    if session is None:
+        return
+    with sessions_lock:
+        sessions[key] = session
+        sessions.move_to_end(key)
+        while len(sessions) > MAX_SESSIONS:
+            sessions.popitem(last=False)
+
+
+def clear() -> None:
+    """Drops all contexts and sessions of this process."""
+    load_server_context.cache_clear()
+    load_client_context.cache_clear()
+    with sessions_lock:
+        sessions.clear()
@@ -15,9 +15,11 @@ import ipaddress
 import socket
 
 from types import TracebackType
-from typing import Optional, Dict, Any, List, Tuple, Type, Callable
+from typing import Optional, Dict, Any, List, Tuple, Type, Callable, Union
 
 from .constants import HTTP_1_1, COLON, WHITESPACE, CRLF, DEFAULT_TIMEOUT
+from .tls import server_context
+from ..http.headers import HttpHeaders
 
 
 def text_(s: Any, encoding: str = 'utf-8', errors: str = 'strict') -> Any:
@@ -46,7 +48,7 @@ def bytes_(s: Any, encoding: str = 'utf-8', errors: str = 'strict') -> Any:
 
 def build_http_request(method: bytes, url: bytes,
                        protocol_version: bytes = HTTP_1_1,
-                       headers: Optional[Dict[bytes, bytes]] = None,
+                       headers: Optional[Union[Dict[bytes, bytes], HttpHeaders]] = None,
                        body: Optional[bytes] = None) -> bytes:
     """Build and returns a HTTP request packet."""
     if headers is None:
@@ -58,7 +60,7 @@ def build_http_request(method: bytes, url: bytes,
 def build_http_response(status_code: int,
                         protocol_version: bytes = HTTP_1_1,
                         reason: Optional[bytes] = None,
-                        headers: Optional[Dict[bytes, bytes]] = None,
+                        headers: Optional[Union[Dict[bytes, bytes], HttpHeaders]] = None,
                         body: Optional[bytes] = None) -> bytes:
     """Build and returns a HTTP response packet."""
     line = [protocol_version, bytes_(status_code)]
@@ -68,15 +70,23 @@ def build_http_response(status_code: int,
         headers = {}
     has_content_length = False
     has_transfer_encoding = False
-    for k in headers:
-        if k.lower() == b'content-length':
-            has_content_length = True
-        if k.lower() == b'transfer-encoding':
-            has_transfer_encoding = True
+    if isinstance(headers, HttpHeaders):
+        has_content_length = b'content-length' in headers
+        has_transfer_encoding = b'transfer-encoding' in headers
+    else:
+        for k in headers:
+            if k.lower() == b'content-length':
+                has_content_length = True
+            if k.lower() == b'transfer-encoding':
+                has_transfer_encoding = True
     if body is not None and \
             not has_transfer_encoding and \
             not has_content_length:
-        headers[b'Content-Length'] = bytes_(len(body))
+        if isinstance(headers, HttpHeaders):
+            headers = headers.copy()
+            headers.add(b'Content-Length', bytes_(len(body)))
+        else:
+            headers[b'Content-Length'] = bytes_(len(body))
     return build_http_pkt(line, headers, body)
 
 
@@ -86,17 +96,19 @@ def build_http_header(k: bytes, v: bytes) -> bytes:
 
 
 def build_http_pkt(line: List[bytes],
-                   headers: Optional[Dict[bytes, bytes]] = None,
+                   headers: Optional[Union[Dict[bytes, bytes], HttpHeaders]] = None,
                    body: Optional[bytes] = None) -> bytes:
     """Build and returns a HTTP request or response packet."""
-    req = WHITESPACE.join(line) + CRLF
-    if headers is not None:
+    pkt = [WHITESPACE.join(line) + CRLF]
+    if isinstance(headers, HttpHeaders):
+        pkt.append(headers.build())
+    elif headers is not None:
         for k in headers:
-            req += build_http_header(k, headers[k]) + CRLF
-    req += CRLF
+            pkt.append(build_http_header(k, headers[k]) + CRLF)
+    pkt.append(CRLF)
     if body:
-        req += body
-    return req
+        pkt.append(body)
+    return b''.join(pkt)
 
 
 def build_websocket_handshake_request(
@@ -152,17 +164,11 @@ def find_http_line(raw: bytes) -> Tuple[Optional[bytes], bytes]:
 
 
 def wrap_socket(conn: socket.socket, keyfile: str,
-                certfile: str) -> ssl.SSLSocket:
-    ctx = ssl.create_default_context(
-        ssl.Purpose.CLIENT_AUTH)
-    ctx.options |= ssl.OP_NO_SSLv2 | ssl.OP_NO_SSLv3 | ssl.OP_NO_TLSv1 | ssl.OP_NO_TLSv1_1
-    ctx.verify_mode = ssl.CERT_NONE
-    ctx.load_cert_chain(
-        certfile=certfile,
-        keyfile=keyfile)
-    return ctx.wrap_socket(
+                certfile: str, do_handshake_on_connect: bool = True) -> ssl.SSLSocket:
+    return server_context(certfile, keyfile).wrap_socket(
         conn,
         server_side=True,
+        do_handshake_on_connect=do_handshake_on_connect,
     )
 
 
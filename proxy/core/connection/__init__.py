@@ -11,11 +11,13 @@
 from .connection import TcpConnection, TcpConnectionUninitializedException, tcpConnectionTypes
 from .client import TcpClientConnection
 from .server import TcpServerConnection
+from .pool import UpstreamConnectionPool
 
 __all__ = [
     'TcpConnection',
     'TcpConnectionUninitializedException',
     'TcpServerConnection',
     'TcpClientConnection',
+    'UpstreamConnectionPool',
     'tcpConnectionTypes',
 ]
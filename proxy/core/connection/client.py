@@ -12,6 +12,7 @@ import socket
 import ssl
 from typing import Union, Tuple, Optional
 
+from ...common.tls import server_context
 from .connection import TcpConnection, tcpConnectionTypes, TcpConnectionUninitializedException
 
 
@@ -32,13 +33,13 @@ class TcpClientConnection(TcpConnection):
         return self._conn
 
     def wrap(self, keyfile: str, certfile: str) -> None:
-        self.connection.setblocking(True)
-        self.flush()
-        self._conn = ssl.wrap_socket(
+        """Wraps connection for TLS, handshake is performed using do_handshake.
+
+        Pending buffer must be flushed before wrapping."""
+        assert not self.has_buffer()
+        self._conn = server_context(certfile, keyfile).wrap_socket(
             self.connection,
             server_side=True,
-            # ca_certs=self.flags.ca_cert_file,
-            certfile=certfile,
-            keyfile=keyfile,
-            ssl_version=ssl.PROTOCOL_TLS)
-        self.connection.setblocking(False)
+            do_handshake_on_connect=False)
+        self.handshaking = True
+        self.do_handshake()
@@ -11,6 +11,7 @@
 import socket
 import ssl
 import logging
+import selectors
 from abc import ABC, abstractmethod
 from typing import NamedTuple, Optional, Union, List
 
@@ -43,6 +44,10 @@ class TcpConnection(ABC):
         self.buffer: List[memoryview] = []
         self.closed: bool = False
         self.tag: str = 'server' if tag == tcpConnectionTypes.SERVER else 'client'
+        # Whether a non-blocking TLS handshake is in progress and
+        # the selector event it is waiting for
+        self.handshaking: bool = False
+        self.want: int = selectors.EVENT_READ
 
     @property
     @abstractmethod
@@ -66,6 +71,23 @@ class TcpConnection(ABC):
         # logger.info(data)
         return memoryview(data)
 
+    def do_handshake(self) -> bool:
+        """Advances non-blocking TLS handshake, returns True once it has completed.
+
+        Users must handle ssl.SSLError and OSError exceptions"""
+        assert isinstance(self.connection, ssl.SSLSocket)
+        try:
+            self.connection.do_handshake()
+        except ssl.SSLWantReadError:
+            self.want = selectors.EVENT_READ
+            return False
+        except ssl.SSLWantWriteError:
+            self.want = selectors.EVENT_WRITE
+            return False
+        self.handshaking = False
+        logger.debug('TLS handshake with %s completed', self.tag)
+        return True
+
     def close(self) -> bool:
         if not self.closed:
             self.connection.close()
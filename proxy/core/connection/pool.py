@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+"""
+    proxy.py
+    ~~~~~~~~
+    ⚡⚡⚡ Fast, Lightweight, Pluggable, TLS interception capable proxy server focused on
+    Network monitoring, controls & Application development, testing, debugging.
+
+    :copyright: (c) 2013-present by Abhinav Singh and contributors.
+    :license: BSD, see LICENSE for more details.
+"""
+import select
+import socket
+import ssl
+import time
+import logging
+import threading
+
+from typing import Dict, List, Optional, Tuple
+
+from .server import TcpServerConnection
+from .connection import TcpConnectionUninitializedException
+
+logger = logging.getLogger(__name__)
+
+# (host, port, tls)
+UpstreamConnectionKey = Tuple[str, int, bool]
+
+
+class UpstreamConnectionPool:
+    """Pool of idle upstream server connections.
+
+    Connections are keyed by (host, port, tls).  A connection is put back
+    into the pool by its user once it is idle, e.g. after a response has
+    completed, and can then be borrowed by any other user within the same
+    process.  Idle connections are closed after idle_timeout seconds and at
+    most max_per_host idle connections are kept for a key.
+
+    Connections are checked for liveness before being handed out, hence
+    connections closed by upstream while idle are never reused."""
+
+    def __init__(self, max_per_host: int, idle_timeout: float) -> None:
+        self.max_per_host = max_per_host
+        self.idle_timeout = idle_timeout
+        # Most recently released connection is last
+        self.pools: Dict[UpstreamConnectionKey,
+                         List[Tuple[float, TcpServerConnection]]] = {}
+        self.lock = threading.Lock()
+
+    def acquire(self, key: UpstreamConnectionKey) -> Optional[TcpServerConnection]:
+        """Returns an idle and live connection for key, if any."""
+        while True:
+            with self.lock:
+                idle = self.pools.get(key)
+                if not idle:
+                    return None
+                released_at, conn = idle.pop()
+            if time.time() - released_at < self.idle_timeout and \
+                    UpstreamConnectionPool.is_alive(conn):
+                logger.debug('Reusing upstream connection %s:%d' % conn.addr)
+                return conn
+            UpstreamConnectionPool.close(conn)
+
+    def release(self, key: UpstreamConnectionKey, conn: TcpServerConnection) -> bool:
+        """Puts an idle connection back into the pool.
+
+        Returns False when connection was not pooled, callers
+        must then close the connection themselves."""
+        if self.max_per_host <= 0 or conn.closed or conn.has_buffer():
+            return False
+        self.cleanup()
+        with self.lock:
+            idle = self.pools.setdefault(key, [])
+            if len(idle) >= self.max_per_host:
+                return False
+            idle.append((time.time(), conn))
+        return True
+
+    def cleanup(self) -> None:
+        """Closes all connections idle for longer than idle_timeout."""
+        now = time.time()
+        expired: List[TcpServerConnection] = []
+        with self.lock:
+            for key in list(self.pools):
+                idle = self.pools[key]
+                while idle and now - idle[0][0] >= self.idle_timeout:
+                    expired.append(idle.pop(0)[1])
+                if not idle:
+                    del self.pools[key]
+        for conn in expired:
+            UpstreamConnectionPool.close(conn)
+
+    @staticmethod
+    def is_alive(conn: TcpServerConnection) -> bool:
+        """Idle connection must neither be closed by upstream
+        nor have any unsolicited data pending to be read."""
+        try:
+            sock = conn.connection
+            if isinstance(sock, ssl.SSLSocket):
+                readable, _, _ = select.select([sock], [], [], 0)
+                return not readable and sock.pending() == 0
+            # Pooled connections are in non-blocking mode
+            sock.recv(1, socket.MSG_PEEK)
+        except BlockingIOError:
+            return True
+        except (OSError, ValueError, TcpConnectionUninitializedException):
+            pass
+        return False
+
+    @staticmethod
+    def close(conn: TcpServerConnection) -> None:
+        try:
+            conn.close()
+        except (OSError, TcpConnectionUninitializedException):
+            pass
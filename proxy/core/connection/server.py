@@ -13,6 +13,7 @@ import socket
 from typing import Optional, Union, Tuple
 
 from .connection import TcpConnection, tcpConnectionTypes, TcpConnectionUninitializedException
+from ...common.tls import SessionKey, client_context, get_session, save_session
 from ...common.utils import new_socket_connection
 
 
@@ -23,6 +24,7 @@ class TcpServerConnection(TcpConnection):
         super().__init__(tcpConnectionTypes.SERVER)
         self._conn: Optional[Union[ssl.SSLSocket, socket.socket]] = None
         self.addr: Tuple[str, int] = (host, int(port))
+        self.session_key: Optional[SessionKey] = None
 
     @property
     def connection(self) -> Union[ssl.SSLSocket, socket.socket]:
@@ -36,12 +38,31 @@ class TcpServerConnection(TcpConnection):
         self._conn = new_socket_connection(self.addr)
 
     def wrap(self, hostname: str, ca_file: Optional[str]) -> None:
-        ctx = ssl.create_default_context(
-            ssl.Purpose.SERVER_AUTH, cafile=ca_file)
-        ctx.options |= ssl.OP_NO_SSLv2 | ssl.OP_NO_SSLv3 | ssl.OP_NO_TLSv1
-        ctx.check_hostname = True
-        self.connection.setblocking(True)
+        """Wraps connection for TLS.  For non-blocking connections,
+        handshake must be completed using do_handshake."""
+        ctx = client_context(ca_file)
+        # Resume last session established with this upstream, if any
+        self.session_key = (hostname, self.addr[1], id(ctx))
         self._conn = ctx.wrap_socket(
             self.connection,
-            server_hostname=hostname)
-        self.connection.setblocking(False)
+            server_hostname=hostname,
+            session=get_session(self.session_key),
+            do_handshake_on_connect=False)
+        self.handshaking = True
+        self.do_handshake()
+
+    def do_handshake(self) -> bool:
+        if super().do_handshake():
+            self.save_session()
+            return True
+        return False
+
+    def save_session(self) -> None:
+        if self.session_key is not None and isinstance(self._conn, ssl.SSLSocket):
+            save_session(self.session_key, self._conn)
+
+    def close(self) -> bool:
+        # TLSv1.3 session tickets are only received after handshake
+        if not self.closed:
+            self.save_session()
+        return super().close()
@@ -8,9 +8,9 @@
     :copyright: (c) 2013-present by Abhinav Singh and contributors.
     :license: BSD, see LICENSE for more details.
 """
-from typing import NamedTuple, Tuple, List, Optional
+from typing import NamedTuple, List, Optional, Union
 
-from ..common.utils import bytes_, find_http_line
+from ..common.utils import bytes_
 from ..common.constants import CRLF, DEFAULT_BUFFER_SIZE
 
 
@@ -23,59 +23,104 @@ chunkParserStates = ChunkParserStates(1, 2, 3)
 
 
 class ChunkParser:
-    """HTTP chunked encoding response parser."""
+    """HTTP chunked encoding response parser.
+
+    Received bytes are decoded using a memoryview cursor, hence chunk data
+    is never copied more than once.  Decoded data is made available via
+    body as it arrives.  Callers streaming chunks can drain body after
+    every parse call.
+
+    Chunk size lines are remembered as received, so that an unmodified
+    body can be re-emitted with its original framing."""
 
     def __init__(self) -> None:
         self.state = chunkParserStates.WAITING_FOR_SIZE
         self.body: bytes = b''  # Parsed chunks
-        self.chunk: bytes = b''  # Partial chunk received
-        # Expected size of next following chunk
+        self.chunk: bytes = b''  # Partial chunk size line received
+        # Expected size of current chunk and
+        # size of chunk data received so far
         self.size: Optional[int] = None
+        self.received: int = 0
+        # Chunk size lines as received, excluding last chunk
+        self.lines: List[bytes] = []
+        # Whether last chunk was received
+        self.last: bool = False
 
     def parse(self, raw: bytes) -> bytes:
-        more = True if len(raw) > 0 else False
-        while more and self.state != chunkParserStates.COMPLETE:
-            more, raw = self.process(raw)
-        return raw
-
-    def process(self, raw: bytes) -> Tuple[bool, bytes]:
-        if self.state == chunkParserStates.WAITING_FOR_SIZE:
-            # Consume prior chunk in buffer
-            # in case chunk size without CRLF was received
+        """Parses chunks out of raw bytes.  Returns bytes received
+        after last chunk, if any."""
+        if self.chunk:
             raw = self.chunk + raw
             self.chunk = b''
-            # Extract following chunk data size
-            line, raw = find_http_line(raw)
-            # CRLF not received or Blank line was received.
-            if line is None or line.strip() == b'':
-                self.chunk = raw
-                raw = b''
-            else:
-                self.size = int(line, 16)
-                self.state = chunkParserStates.WAITING_FOR_DATA
-        elif self.state == chunkParserStates.WAITING_FOR_DATA:
-            assert self.size is not None
-            remaining = self.size - len(self.chunk)
-            self.chunk += raw[:remaining]
-            raw = raw[remaining:]
-            if len(self.chunk) == self.size:
-                raw = raw[len(CRLF):]
-                self.body += self.chunk
-                if self.size == 0:
+        view = memoryview(raw)
+        end = len(raw)
+        data: List[Union[bytes, memoryview]] = [self.body] if self.body else []
+        cursor = 0
+        while cursor < end and self.state != chunkParserStates.COMPLETE:
+            if self.state == chunkParserStates.WAITING_FOR_DATA:
+                assert self.size is not None
+                take = min(self.size - self.received, end - cursor)
+                data.append(view[cursor:cursor + take])
+                cursor += take
+                self.received += take
+                if self.received == self.size:
+                    self.state = chunkParserStates.WAITING_FOR_SIZE
+                    self.size = None
+                    self.received = 0
+                continue
+            # Extract next line i.e. chunk size, trailer or blank line
+            index = raw.find(CRLF, cursor)
+            if index == -1:
+                # CRLF not received, wait for more data
+                self.chunk = raw[cursor:]
+                cursor = end
+                break
+            line = raw[cursor:index]
+            cursor = index + len(CRLF)
+            if self.last:
+                # Trailers are ignored, blank line terminates message
+                if line == b'':
                     self.state = chunkParserStates.COMPLETE
+            elif line.strip() != b'':
+                # Blank lines are CRLF trailing previous chunk data
+                size = int(line.split(b';', 1)[0], 16)
+                if size == 0:
+                    self.last = True
                 else:
-                    self.state = chunkParserStates.WAITING_FOR_SIZE
-                self.chunk = b''
-                self.size = None
-        return len(raw) > 0, raw
+                    self.lines.append(line)
+                    self.size = size
+                    self.state = chunkParserStates.WAITING_FOR_DATA
+        self.body = b''.join(data)
+        return raw[cursor:]
+
+    def build(self, body: bytes) -> bytes:
+        """Returns body chunk encoded with original framing.
+
+        Falls back to to_chunks when body size no longer
+        matches chunk sizes as received."""
+        sizes = [int(line.split(b';', 1)[0], 16) for line in self.lines]
+        if sum(sizes) != len(body):
+            return ChunkParser.to_chunks(body)
+        view = memoryview(body)
+        chunks: List[Union[bytes, memoryview]] = []
+        offset = 0
+        for line, size in zip(self.lines, sizes):
+            chunks.extend((line, CRLF, view[offset:offset + size], CRLF))
+            offset += size
+        chunks.append(b'0' + CRLF + CRLF)
+        return b''.join(chunks)
+
+    @staticmethod
+    def to_chunk(raw: bytes) -> bytes:
+        """Frames raw as a single chunk.  Empty raw frames the last chunk."""
+        return b'%x' % len(raw) + CRLF + raw + CRLF
 
     @staticmethod
     def to_chunks(raw: bytes, chunk_size: int = DEFAULT_BUFFER_SIZE) -> bytes:
-        chunks: List[bytes] = []
+        view = memoryview(raw)
+        chunks: List[Union[bytes, memoryview]] = []
         for i in range(0, len(raw), chunk_size):
-            chunk = raw[i: i + chunk_size]
-            chunks.append(bytes_('{:x}'.format(len(chunk))))
-            chunks.append(chunk)
-        chunks.append(bytes_('{:x}'.format(0)))
-        chunks.append(b'')
-        return CRLF.join(chunks) + CRLF
+            chunk = view[i: i + chunk_size]
+            chunks.extend((bytes_('{:x}'.format(len(chunk))), CRLF, chunk, CRLF))
+        chunks.append(b'0' + CRLF + CRLF)
+        return b''.join(chunks)
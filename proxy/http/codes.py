@@ -20,6 +20,7 @@ HttpStatusCodes = NamedTuple('HttpStatusCodes', [
     # 3xx
     ('MOVED_PERMANENTLY', int),
     ('SEE_OTHER', int),
+    ('NOT_MODIFIED', int),
     ('TEMPORARY_REDIRECT', int),
     ('PERMANENT_REDIRECT', int),
     # 4xx
@@ -29,7 +30,10 @@ HttpStatusCodes = NamedTuple('HttpStatusCodes', [
     ('NOT_FOUND', int),
     ('PROXY_AUTH_REQUIRED', int),
     ('REQUEST_TIMEOUT', int),
+    ('PAYLOAD_TOO_LARGE', int),
+    ('URI_TOO_LONG', int),
     ('I_AM_A_TEAPOT', int),
+    ('REQUEST_HEADER_FIELDS_TOO_LARGE', int),
     # 5xx
     ('INTERNAL_SERVER_ERROR', int),
     ('NOT_IMPLEMENTED', int),
@@ -41,7 +45,7 @@ HttpStatusCodes = NamedTuple('HttpStatusCodes', [
 httpStatusCodes = HttpStatusCodes(
     100, 101,
     200,
-    301, 303, 307, 308,
-    400, 401, 403, 404, 407, 408, 418,
+    301, 303, 304, 307, 308,
+    400, 401, 403, 404, 407, 408, 413, 414, 418, 431,
     500, 501, 502, 504, 598, 599
 )
@@ -8,9 +8,10 @@
     :copyright: (c) 2013-present by Abhinav Singh and contributors.
     :license: BSD, see LICENSE for more details.
 """
-from typing import Optional
+from typing import TYPE_CHECKING, Optional
 
-from ..parser import HttpParser
+if TYPE_CHECKING:
+    from ..parser import HttpParser    # pragma: no cover
 
 
 class HttpProtocolException(Exception):
@@ -20,5 +21,5 @@ class HttpProtocolException(Exception):
     inherit HttpProtocolException base class. Implement response() method
     to optionally return custom response to client."""
 
-    def response(self, request: HttpParser) -> Optional[memoryview]:
+    def response(self, request: 'HttpParser') -> Optional[memoryview]:
         return None  # pragma: no cover
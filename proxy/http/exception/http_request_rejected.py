@@ -8,12 +8,14 @@
     :copyright: (c) 2013-present by Abhinav Singh and contributors.
     :license: BSD, see LICENSE for more details.
 """
-from typing import Optional, Dict
+from typing import TYPE_CHECKING, Optional, Dict
 
 from .base import HttpProtocolException
-from ..parser import HttpParser
 from ...common.utils import build_http_response
 
+if TYPE_CHECKING:
+    from ..parser import HttpParser    # pragma: no cover
+
 
 class HttpRequestRejected(HttpProtocolException):
     """Generic exception that can be used to reject the client requests.
@@ -31,7 +33,7 @@ class HttpRequestRejected(HttpProtocolException):
         self.headers: Optional[Dict[bytes, bytes]] = headers
         self.body: Optional[bytes] = body
 
-    def response(self, _request: HttpParser) -> Optional[memoryview]:
+    def response(self, _request: 'HttpParser') -> Optional[memoryview]:
         if self.status_code:
             return memoryview(build_http_response(
                 status_code=self.status_code,
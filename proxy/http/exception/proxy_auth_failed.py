@@ -8,13 +8,17 @@
     :copyright: (c) 2013-present by Abhinav Singh and contributors.
     :license: BSD, see LICENSE for more details.
 """
+from typing import TYPE_CHECKING
+
 from .base import HttpProtocolException
-from ..parser import HttpParser
 from ..codes import httpStatusCodes
 
 from ...common.constants import PROXY_AGENT_HEADER_VALUE, PROXY_AGENT_HEADER_KEY
 from ...common.utils import build_http_response
 
+if TYPE_CHECKING:
+    from ..parser import HttpParser    # pragma: no cover
+
 
 class ProxyAuthenticationFailed(HttpProtocolException):
     """Exception raised when Http Proxy auth is enabled and
@@ -30,5 +34,5 @@ class ProxyAuthenticationFailed(HttpProtocolException):
         },
         body=b'Proxy Authentication Required'))
 
-    def response(self, _request: HttpParser) -> memoryview:
+    def response(self, _request: 'HttpParser') -> memoryview:
         return self.RESPONSE_PKT
@@ -8,13 +8,17 @@
     :copyright: (c) 2013-present by Abhinav Singh and contributors.
     :license: BSD, see LICENSE for more details.
 """
+from typing import TYPE_CHECKING
+
 from .base import HttpProtocolException
-from ..parser import HttpParser
 from ..codes import httpStatusCodes
 
 from ...common.constants import PROXY_AGENT_HEADER_VALUE, PROXY_AGENT_HEADER_KEY
 from ...common.utils import build_http_response
 
+if TYPE_CHECKING:
+    from ..parser import HttpParser    # pragma: no cover
+
 
 class ProxyConnectionFailed(HttpProtocolException):
     """Exception raised when HttpProxyPlugin is unable to establish connection to upstream server."""
@@ -34,5 +38,5 @@ class ProxyConnectionFailed(HttpProtocolException):
         self.port: int = port
         self.reason: str = reason
 
-    def response(self, _request: HttpParser) -> memoryview:
+    def response(self, _request: 'HttpParser') -> memoryview:
         return self.RESPONSE_PKT
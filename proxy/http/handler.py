@@ -31,6 +31,8 @@ from ..core.event import EventQueue
 from ..core.connection import TcpClientConnection
 from ..common.flag import flags
 from ..common.constants import DEFAULT_CLIENT_RECVBUF_SIZE, DEFAULT_KEY_FILE, DEFAULT_TIMEOUT
+from ..common.constants import DEFAULT_MAX_REQUEST_LINE_SIZE, DEFAULT_MAX_HEADER_SIZE
+from ..common.constants import DEFAULT_MAX_BODY_SIZE, DEFAULT_BODY_BUFFER_SIZE, DEFAULT_BODY_SPOOL_DIR
 
 
 logger = logging.getLogger(__name__)
@@ -60,6 +62,42 @@ flags.add_argument(
     'an inactive connection must be dropped.  Inactivity is defined by no '
     'data sent or received by the client.'
 )
+flags.add_argument(
+    '--max-request-line-size',
+    type=int,
+    default=DEFAULT_MAX_REQUEST_LINE_SIZE,
+    help='Default: 8 KB.  Maximum size of client request line.  '
+    'Larger requests are rejected with 414 URI Too Long.  0 disables the limit.'
+)
+flags.add_argument(
+    '--max-header-size',
+    type=int,
+    default=DEFAULT_MAX_HEADER_SIZE,
+    help='Default: 64 KB.  Maximum size of client request headers.  '
+    'Larger requests are rejected with 431 Request Header Fields Too Large.  '
+    '0 disables the limit.'
+)
+flags.add_argument(
+    '--max-body-size',
+    type=int,
+    default=DEFAULT_MAX_BODY_SIZE,
+    help='Default: 0 i.e. unlimited.  Maximum size of client request body.  '
+    'Larger requests are rejected with 413 Payload Too Large.'
+)
+flags.add_argument(
+    '--body-buffer-size',
+    type=int,
+    default=DEFAULT_BODY_BUFFER_SIZE,
+    help='Default: 1 MB.  Request bodies larger than this are spooled '
+    'to disk when --body-spool-dir is provided.'
+)
+flags.add_argument(
+    '--body-spool-dir',
+    type=str,
+    default=DEFAULT_BODY_SPOOL_DIR,
+    help='Default: None.  Directory used to spool large request bodies.  '
+    'By default request bodies are buffered in memory.'
+)
 
 
 class HttpProtocolHandler(Work):
@@ -76,8 +114,10 @@ class HttpProtocolHandler(Work):
 
         self.start_time: float = time.time()
         self.last_activity: float = self.start_time
-        self.request: HttpParser = HttpParser(httpParserTypes.REQUEST_PARSER)
-        self.response: HttpParser = HttpParser(httpParserTypes.RESPONSE_PARSER)
+        self.request: HttpParser = self.flags.http_parser_klass(
+            httpParserTypes.REQUEST_PARSER, self.flags.http_parser_limits)
+        self.response: HttpParser = self.flags.http_parser_klass(
+            httpParserTypes.RESPONSE_PARSER)
         self.selector = selectors.DefaultSelector()
         self.client: TcpClientConnection = client
         self.plugins: Dict[str, HttpProtocolHandlerPlugin] = {}
@@ -88,10 +128,12 @@ class HttpProtocolHandler(Work):
 
     def initialize(self) -> None:
         """Optionally upgrades connection to HTTPS, set conn in non-blocking mode and initializes plugins."""
+        self.client.connection.setblocking(False)
         conn = self.optionally_wrap_socket(self.client.connection)
-        conn.setblocking(False)
         if self.encryption_enabled():
             self.client = TcpClientConnection(conn=conn, addr=self.client.addr)
+            # Handshake is completed within the event loop
+            self.client.handshaking = True
         if b'HttpProtocolHandlerPlugin' in self.flags.plugins:
             for klass in self.flags.plugins[b'HttpProtocolHandlerPlugin']:
                 instance = klass(
@@ -110,11 +152,14 @@ class HttpProtocolHandler(Work):
         return False
 
     def get_events(self) -> Dict[socket.socket, int]:
-        events: Dict[socket.socket, int] = {
-            self.client.connection: selectors.EVENT_READ
-        }
-        if self.client.has_buffer():
-            events[self.client.connection] |= selectors.EVENT_WRITE
+        events: Dict[socket.socket, int] = {}
+        if not self.client.handshaking:
+            events[self.client.connection] = selectors.EVENT_READ
+            if self.client.has_buffer():
+                events[self.client.connection] |= selectors.EVENT_WRITE
+        elif isinstance(self.client.connection, ssl.SSLSocket):
+            events[self.client.connection] = self.client.want
+        # else a plugin is yet to wrap client connection e.g. TLS interception
 
         # HttpProtocolHandlerPlugin.get_descriptors
         for plugin in self.plugins.values():
@@ -137,6 +182,14 @@ class HttpProtocolHandler(Work):
             readables: Readables,
             writables: Writables) -> bool:
         """Returns True if proxy must teardown."""
+        if self.client.handshaking:
+            teardown = self.handle_handshake(readables, writables)
+            if teardown:
+                return True
+            # Client connection carried handshake records only
+            readables = [r for r in readables if r is not self.client.connection]
+            writables = [w for w in writables if w is not self.client.connection]
+
         # Flush buffer for ready to write sockets
         teardown = self.handle_writables(writables)
         if teardown:
@@ -197,9 +250,25 @@ class HttpProtocolHandler(Work):
         """
         if self.encryption_enabled():
             assert self.flags.keyfile and self.flags.certfile
-            conn = wrap_socket(conn, self.flags.keyfile, self.flags.certfile)
+            conn = wrap_socket(conn, self.flags.keyfile, self.flags.certfile,
+                               do_handshake_on_connect=False)
         return conn
 
+    def handle_handshake(self, readables: Readables, writables: Writables) -> bool:
+        """Advances TLS handshake with client.  Returns True if handshake failed."""
+        if not isinstance(self.client.connection, ssl.SSLSocket):
+            return False
+        if self.client.connection not in readables and \
+                self.client.connection not in writables:
+            return False
+        self.last_activity = time.time()
+        try:
+            self.client.do_handshake()
+        except (ssl.SSLError, OSError) as e:
+            logger.warning('TLS handshake with client failed: %r' % e)
+            return True
+        return False
+
     def connection_inactive_for(self) -> float:
         return time.time() - self.last_activity
 
@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+"""
+    proxy.py
+    ~~~~~~~~
+    ⚡⚡⚡ Fast, Lightweight, Pluggable, TLS interception capable proxy server focused on
+    Network monitoring, controls & Application development, testing, debugging.
+
+    :copyright: (c) 2013-present by Abhinav Singh and contributors.
+    :license: BSD, see LICENSE for more details.
+"""
+from array import array
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+
+from ..common.constants import COLON, CRLF, WHITESPACE
+
+# Offsets stored per header entry within HttpHeaders.spans:
+# line start, name start, name end, value start, value end, line end
+STRIDE = 6
+
+
+def strip_span(part: bytes, offset: int) -> Tuple[int, int]:
+    """Returns (start, end) offsets of whitespace stripped part."""
+    end = offset + len(part.rstrip())
+    start = offset + len(part) - len(part.lstrip())
+    return min(start, end), end
+
+
+class HttpHeaders:
+    """Order preserving, multi-value HTTP header store.
+
+    Header lines are kept in a single raw byte block, exactly as received
+    for parsed headers, while line, name and value spans of every header
+    are tracked in an array.  Lowercased name index is built lazily on
+    first lookup.  Untouched header lines are spliced back as-is by build().
+    """
+
+    __slots__ = ('raw', 'spans', '_index')
+
+    def __init__(
+            self,
+            headers: Optional[Union[Dict[bytes, bytes], List[Tuple[bytes, bytes]]]] = None) -> None:
+        self.raw: bytearray = bytearray()
+        self.spans: 'array[int]' = array('I')
+        self._index: Optional[Dict[bytes, List[int]]] = None
+        if headers is not None:
+            for name, value in (headers.items() if isinstance(headers, dict) else headers):
+                self.add(name, value)
+
+    def __len__(self) -> int:
+        return len(self.spans) // STRIDE
+
+    def __contains__(self, name: bytes) -> bool:
+        return bool(self.find(name))
+
+    def __getitem__(self, name: bytes) -> Tuple[bytes, bytes]:
+        """Returns (name, value) of first header matching name."""
+        positions = self.find(name)
+        if not positions:
+            raise KeyError(name)
+        return self.name_at(positions[0]), self.value_at(positions[0])
+
+    def __iter__(self) -> Iterator[Tuple[bytes, bytes]]:
+        return iter(self.items())
+
+    def __repr__(self) -> str:
+        return 'HttpHeaders(%r)' % self.items()
+
+    def name_at(self, i: int) -> bytes:
+        o = i * STRIDE
+        return bytes(self.raw[self.spans[o + 1]:self.spans[o + 2]])
+
+    def value_at(self, i: int) -> bytes:
+        o = i * STRIDE
+        return bytes(self.raw[self.spans[o + 3]:self.spans[o + 4]])
+
+    def items(self) -> List[Tuple[bytes, bytes]]:
+        """Returns (name, value) pairs in order, including duplicates."""
+        return [(self.name_at(i), self.value_at(i)) for i in range(len(self))]
+
+    def fold(self) -> List[Tuple[bytes, bytes]]:
+        """Returns (lowercased name, comma joined values) pairs in order of first occurrence."""
+        folded: Dict[bytes, List[bytes]] = {}
+        for name, value in self.items():
+            folded.setdefault(name.lower(), []).append(value)
+        return [(name, b', '.join(values)) for name, values in folded.items()]
+
+    def get(self, name: bytes, default: Optional[bytes] = None) -> Optional[bytes]:
+        """Returns value of first header matching name."""
+        positions = self.find(name)
+        return self.value_at(positions[0]) if positions else default
+
+    def get_all(self, name: bytes) -> List[bytes]:
+        """Returns values of all headers matching name, e.g. Set-Cookie."""
+        return [self.value_at(i) for i in self.find(name) or []]
+
+    def find(self, name: bytes) -> Optional[List[int]]:
+        """Returns positions of headers matching name."""
+        if self._index is None:
+            self._index = {}
+            for i in range(len(self)):
+                self._index.setdefault(self.name_at(i).lower(), []).append(i)
+        positions = self._index.get(name)
+        if positions is None and not name.islower():
+            positions = self._index.get(name.lower())
+        return positions
+
+    def parse_line(self, line: bytes) -> None:
+        """Appends a header line as received, without trailing CRLF."""
+        colon = line.find(COLON)
+        if colon == -1:
+            ns, ne = strip_span(line, 0)
+            vs, ve = len(line), len(line)
+        else:
+            ns, ne = strip_span(line[:colon], 0)
+            vs, ve = strip_span(line[colon + 1:], colon + 1)
+        self.append(line, ns, ne, vs, ve)
+
+    def add(self, name: bytes, value: bytes) -> None:
+        """Appends a header, even if one with same name already exists."""
+        line = name + COLON + WHITESPACE + value
+        self.append(line, 0, len(name), len(name) + 2, len(line))
+
+    def set(self, name: bytes, value: bytes) -> None:
+        """Replaces value of first header matching name in place and
+        removes any duplicates.  Appends header if none exists."""
+        positions = self.find(name)
+        if not positions:
+            self.add(name, value)
+            return
+        positions = list(positions)
+        self.add(name, value)
+        first = positions[0] * STRIDE
+        self.spans[first:first + STRIDE] = self.spans[-STRIDE:]
+        del self.spans[-STRIDE:]
+        for i in reversed(positions[1:]):
+            del self.spans[i * STRIDE:(i + 1) * STRIDE]
+        self._index = None
+
+    def remove(self, name: bytes) -> bool:
+        """Removes all headers matching name.  Returns False if none existed."""
+        positions = self.find(name)
+        if not positions:
+            return False
+        for i in reversed(positions):
+            del self.spans[i * STRIDE:(i + 1) * STRIDE]
+        self._index = None
+        return True
+
+    def copy(self) -> 'HttpHeaders':
+        headers = HttpHeaders()
+        headers.raw = bytearray(self.raw)
+        headers.spans = array('I', self.spans)
+        return headers
+
+    def build(self) -> bytes:
+        """Returns header lines, each terminated by CRLF.
+
+        Contiguous runs of lines are spliced from the raw block, hence
+        for untouched parsed headers this is a single slice."""
+        spans, raw = self.spans, self.raw
+        chunks: List[bytearray] = []
+        run_start, run_end = 0, 0
+        for o in range(0, len(spans), STRIDE):
+            if spans[o] != run_end:
+                if run_end > run_start:
+                    chunks.append(raw[run_start:run_end])
+                run_start = spans[o]
+            run_end = spans[o + 5]
+        if run_end > run_start:
+            chunks.append(raw[run_start:run_end])
+        return b''.join(chunks)
+
+    def append(self, line: bytes, ns: int, ne: int, vs: int, ve: int) -> None:
+        start = len(self.raw)
+        self.raw += line
+        self.raw += CRLF
+        self.spans.extend((start, start + ns, start + ne,
+                           start + vs, start + ve, len(self.raw)))
+        if self._index is not None:
+            self._index.setdefault(
+                line[ns:ne].lower(), []).append(len(self) - 1)
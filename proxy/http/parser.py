@@ -8,14 +8,20 @@
     :copyright: (c) 2013-present by Abhinav Singh and contributors.
     :license: BSD, see LICENSE for more details.
 """
+import tempfile
+
 from urllib import parse as urlparse
-from typing import TypeVar, NamedTuple, Optional, Dict, Type, Tuple, List
+from typing import IO, Callable, TypeVar, NamedTuple, Optional, Type, Tuple, List
 
+from .codes import httpStatusCodes
+from .headers import HttpHeaders
 from .methods import httpMethods
 from .chunk_parser import ChunkParser, chunkParserStates
+from .exception import HttpRequestRejected
 
-from ..common.constants import DEFAULT_DISABLE_HEADERS, COLON, CRLF, WHITESPACE, HTTP_1_1, DEFAULT_HTTP_PORT
-from ..common.utils import build_http_request, build_http_response, find_http_line, text_
+from ..common.constants import DEFAULT_DISABLE_HEADERS, CRLF, WHITESPACE, HTTP_1_1, DEFAULT_HTTP_PORT
+from ..common.constants import COLON
+from ..common.utils import build_http_request, build_http_response, find_http_line, text_, bytes_
 
 
 HttpParserStates = NamedTuple('HttpParserStates', [
@@ -34,6 +40,18 @@ HttpParserTypes = NamedTuple('HttpParserTypes', [
 ])
 httpParserTypes = HttpParserTypes(1, 2)
 
+# Size limits enforced by HttpParser, in bytes.  0 disables a limit.
+#
+# Bodies larger than body_buffer_size are spooled into a temporary
+# file within body_spool_dir, when configured.
+HttpParserLimits = NamedTuple('HttpParserLimits', [
+    ('max_request_line_size', int),
+    ('max_header_size', int),
+    ('max_body_size', int),
+    ('body_buffer_size', int),
+    ('body_spool_dir', Optional[str]),
+])
+
 
 T = TypeVar('T', bound='HttpParser')
 
@@ -41,9 +59,11 @@ T = TypeVar('T', bound='HttpParser')
 class HttpParser:
     """HTTP request/response parser."""
 
-    def __init__(self, parser_type: int) -> None:
+    def __init__(self, parser_type: int,
+                 limits: Optional[HttpParserLimits] = None) -> None:
         self.type: int = parser_type
         self.state: int = httpParserStates.INITIALIZED
+        self.limits: Optional[HttpParserLimits] = limits
 
         # Total size of raw bytes passed for parsing
         self.total_size: int = 0
@@ -51,8 +71,15 @@ class HttpParser:
         # Buffer to hold unprocessed bytes
         self.buffer: bytes = b''
 
-        self.headers: Dict[bytes, Tuple[bytes, bytes]] = dict()
-        self.body: Optional[bytes] = None
+        self.headers: HttpHeaders = HttpHeaders()
+        # Size of header block received so far
+        self.header_size: int = 0
+
+        self._body: Optional[bytes] = None
+        # Size of body received so far and temporary
+        # file holding it, if body was spooled to disk
+        self.body_size: int = 0
+        self.body_file: Optional[IO[bytes]] = None
 
         self.method: Optional[bytes] = None
         self.url: Optional[urlparse.SplitResultBytes] = None
@@ -60,7 +87,17 @@ class HttpParser:
         self.reason: Optional[bytes] = None
         self.version: Optional[bytes] = None
 
+        # When unset, body is only accounted for in body_size,
+        # e.g. when response is merely observed while streamed through
+        self.retain_body: bool = True
+        # Method of request a response is for.  Responses to
+        # HEAD requests carry headers of the entity but no body.
+        self.request_method: Optional[bytes] = None
+
         self.chunk_parser: Optional[ChunkParser] = None
+        # When set, decoded chunks of a chunk encoded body are
+        # handed over as they arrive, instead of being buffered.
+        self.on_chunk: Optional[Callable[[bytes], None]] = None
 
         # This cleans up developer APIs as Python urlparse.urlsplit behaves differently
         # for incoming proxy request and incoming web request.  Web request is the one
@@ -81,24 +118,60 @@ class HttpParser:
         parser.parse(raw)
         return parser
 
+    @property
+    def body(self) -> Optional[bytes]:
+        if self.body_file is not None:
+            self.body_file.seek(0)
+            return self.body_file.read()
+        return self._body
+
+    @body.setter
+    def body(self, body: Optional[bytes]) -> None:
+        if self.body_file is not None:
+            self.body_file.close()
+            self.body_file = None
+        self._body = body
+        self.body_size = 0 if body is None else len(body)
+
+    def write_body(self, data: bytes) -> None:
+        """Appends data to body, spooling it to disk once
+        body grows beyond configured body_buffer_size."""
+        self.body_size += len(data)
+        self.check_body_size(self.body_size)
+        if not self.retain_body:
+            return
+        if self.body_file is not None:
+            self.body_file.write(data)
+            return
+        self._body = data if self._body is None else self._body + data
+        if self.limits and \
+                self.limits.body_spool_dir and \
+                self.limits.body_buffer_size and \
+                self.body_size > self.limits.body_buffer_size:
+            self.body_file = tempfile.TemporaryFile(
+                dir=self.limits.body_spool_dir)
+            self.body_file.write(self._body)
+            self._body = None
+
     def header(self, key: bytes) -> bytes:
-        if key.lower() not in self.headers:
+        value = self.headers.get(key)
+        if value is None:
             raise KeyError('%s not found in headers', text_(key))
-        return self.headers[key.lower()][1]
+        return value
 
     def has_header(self, key: bytes) -> bool:
-        return key.lower() in self.headers
+        return key in self.headers
 
     def add_header(self, key: bytes, value: bytes) -> None:
-        self.headers[key.lower()] = (key, value)
+        """Sets header value, replacing any existing header with same name in place."""
+        self.headers.set(key, value)
 
     def add_headers(self, headers: List[Tuple[bytes, bytes]]) -> None:
         for (key, value) in headers:
             self.add_header(key, value)
 
     def del_header(self, header: bytes) -> None:
-        if header.lower() in self.headers:
-            del self.headers[header.lower()]
+        self.headers.remove(header)
 
     def del_headers(self, headers: List[bytes]) -> None:
         for key in headers:
@@ -130,10 +203,17 @@ class HttpParser:
             self.path = self.build_path()
 
     def is_chunked_encoded(self) -> bool:
-        return b'transfer-encoding' in self.headers and \
-               self.headers[b'transfer-encoding'][1].lower() == b'chunked'
+        te = self.headers.get(b'transfer-encoding')
+        return te is not None and te.lower() == b'chunked'
 
     def body_expected(self) -> bool:
+        if self.type == httpParserTypes.RESPONSE_PARSER and (
+                self.request_method == httpMethods.HEAD or
+                (self.request_method == httpMethods.CONNECT and
+                 self.code is not None and self.code.startswith(b'2')) or
+                (self.code is not None and (
+                    self.code.startswith(b'1') or self.code in (b'204', b'304')))):
+            return False
         return (b'content-length' in self.headers and
                 int(self.header(b'content-length')) > 0) or \
             self.is_chunked_encoded()
@@ -153,21 +233,34 @@ class HttpParser:
                     httpParserStates.RCVING_BODY):
                 if b'content-length' in self.headers:
                     self.state = httpParserStates.RCVING_BODY
-                    if self.body is None:
-                        self.body = b''
                     total_size = int(self.header(b'content-length'))
-                    received_size = len(self.body)
-                    self.body += raw[:total_size - received_size]
-                    if self.body and \
-                            len(self.body) == int(self.header(b'content-length')):
+                    received_size = self.body_size
+                    if self.retain_body:
+                        self.write_body(raw[:total_size - received_size])
+                    else:
+                        # Avoid copying body which isn't retained anyway
+                        self.body_size += min(len(raw), total_size - received_size)
+                        self.check_body_size(self.body_size)
+                    if self.body_size == total_size:
                         self.state = httpParserStates.COMPLETE
                     more, raw = len(raw) > 0, raw[total_size - received_size:]
                 elif self.is_chunked_encoded():
                     if not self.chunk_parser:
                         self.chunk_parser = ChunkParser()
                     raw = self.chunk_parser.parse(raw)
+                    # Drain decoded chunks, so that they are
+                    # accounted for and streamed as they arrive.
+                    data, self.chunk_parser.body = self.chunk_parser.body, b''
+                    if self.on_chunk is None:
+                        self.write_body(data)
+                    elif data:
+                        self.body_size += len(data)
+                        self.check_body_size(self.body_size)
+                        self.on_chunk(data)
+                    if self.chunk_parser.size is not None:
+                        self.check_body_size(
+                            self.body_size + self.chunk_parser.size - self.chunk_parser.received)
                     if self.chunk_parser.state == chunkParserStates.COMPLETE:
-                        self.body = self.chunk_parser.body
                         self.state = httpParserStates.COMPLETE
                     more = False
                 else:
@@ -181,9 +274,15 @@ class HttpParser:
         """Returns False when no CRLF could be found in received bytes."""
         line, raw = find_http_line(raw)
         if line is None:
+            # Guard against clients which never send a CRLF
+            if self.state == httpParserStates.INITIALIZED:
+                self.check_request_line_size(len(raw))
+            else:
+                self.check_header_size(self.header_size + len(raw))
             return False, raw
 
         if self.state == httpParserStates.INITIALIZED:
+            self.check_request_line_size(len(line))
             self.process_line(line)
             self.state = httpParserStates.LINE_RCVD
         elif self.state in (httpParserStates.LINE_RCVD, httpParserStates.RCVING_HEADERS):
@@ -193,6 +292,8 @@ class HttpParser:
             if line.strip() == b'':  # Blank line received.
                 self.state = httpParserStates.HEADERS_COMPLETE
             else:
+                self.header_size += len(line) + len(CRLF)
+                self.check_header_size(self.header_size)
                 self.process_header(line)
 
         # When server sends a response line without any header or body e.g.
@@ -201,13 +302,40 @@ class HttpParser:
                 self.type == httpParserTypes.RESPONSE_PARSER and \
                 raw == CRLF:
             self.state = httpParserStates.COMPLETE
-        elif self.state == httpParserStates.HEADERS_COMPLETE and \
-                not self.body_expected() and \
-                raw == b'':
-            self.state = httpParserStates.COMPLETE
+        elif self.state == httpParserStates.HEADERS_COMPLETE:
+            if not self.body_expected():
+                # Any remaining bytes belong to a pipelined message
+                self.state = httpParserStates.COMPLETE
+            elif b'content-length' in self.headers:
+                # Reject early, before receiving any of the body
+                self.check_body_size(int(self.header(b'content-length')))
 
         return len(raw) > 0, raw
 
+    def check_request_line_size(self, size: int) -> None:
+        if self.limits and self.limits.max_request_line_size and \
+                size > self.limits.max_request_line_size:
+            raise HttpRequestRejected(
+                status_code=httpStatusCodes.URI_TOO_LONG,
+                reason=b'URI Too Long',
+                headers={b'Connection': b'close'})
+
+    def check_header_size(self, size: int) -> None:
+        if self.limits and self.limits.max_header_size and \
+                size > self.limits.max_header_size:
+            raise HttpRequestRejected(
+                status_code=httpStatusCodes.REQUEST_HEADER_FIELDS_TOO_LARGE,
+                reason=b'Request Header Fields Too Large',
+                headers={b'Connection': b'close'})
+
+    def check_body_size(self, size: int) -> None:
+        if self.limits and self.limits.max_body_size and \
+                size > self.limits.max_body_size:
+            raise HttpRequestRejected(
+                status_code=httpStatusCodes.PAYLOAD_TOO_LARGE,
+                reason=b'Payload Too Large',
+                headers={b'Connection': b'close'})
+
     def process_line(self, raw: bytes) -> None:
         line = raw.split(WHITESPACE)
         if self.type == httpParserTypes.REQUEST_PARSER:
@@ -220,10 +348,7 @@ class HttpParser:
             self.reason = WHITESPACE.join(line[2:])
 
     def process_header(self, raw: bytes) -> None:
-        parts = raw.split(COLON)
-        key = parts[0].strip()
-        value = COLON.join(parts[1:]).strip()
-        self.add_headers([(key, value)])
+        self.headers.parse_line(raw)
 
     def build_path(self) -> bytes:
         if not self.url:
@@ -237,31 +362,51 @@ class HttpParser:
             url += b'#' + self.url.fragment
         return url
 
-    def build(self, disable_headers: Optional[List[bytes]] = None) -> bytes:
-        """Rebuild the request object."""
+    def build(self, disable_headers: Optional[List[bytes]] = None, for_proxy: bool = False) -> bytes:
+        """Rebuild the request object.
+
+        Header lines received over the wire are spliced back as-is,
+        only added or modified headers are serialized.  When for_proxy
+        is True, request line is built in absolute-form."""
         assert self.method and self.version and self.path and self.type == httpParserTypes.REQUEST_PARSER
         if disable_headers is None:
             disable_headers = DEFAULT_DISABLE_HEADERS
-        body: Optional[bytes] = ChunkParser.to_chunks(self.body) \
-            if self.is_chunked_encoded() and self.body else \
-            self.body
+        body = self.body
+        if self.is_chunked_encoded() and body:
+            body = self.build_chunks(body)
+        headers = self.headers
+        if any(header in headers for header in disable_headers):
+            headers = headers.copy()
+            for header in disable_headers:
+                headers.remove(header)
+        path = self.path
+        if for_proxy:
+            assert self.host and self.port
+            host = b'[' + self.host + b']' if COLON in self.host else self.host
+            path = b'http://' + host + (
+                b'' if self.port == DEFAULT_HTTP_PORT else COLON + bytes_(self.port)) + path
         return build_http_request(
-            self.method, self.path, self.version,
-            headers={} if not self.headers else {self.headers[k][0]: self.headers[k][1] for k in self.headers if
-                                                 k.lower() not in disable_headers},
+            self.method, path, self.version,
+            headers=headers,
             body=body
         )
 
     def build_response(self) -> bytes:
         """Rebuild the response object."""
-        assert self.code and self.version and self.body and self.type == httpParserTypes.RESPONSE_PARSER
+        body = self.body
+        assert self.code and self.version and body and self.type == httpParserTypes.RESPONSE_PARSER
         return build_http_response(
             status_code=int(self.code),
             protocol_version=self.version,
             reason=self.reason,
-            headers={} if not self.headers else {
-                self.headers[k][0]: self.headers[k][1] for k in self.headers},
-            body=self.body if not self.is_chunked_encoded() else ChunkParser.to_chunks(self.body))
+            headers=self.headers,
+            body=body if not self.is_chunked_encoded() else self.build_chunks(body))
+
+    def build_chunks(self, body: bytes) -> bytes:
+        """Chunk encodes body, preserving framing as received when possible."""
+        if self.chunk_parser:
+            return self.chunk_parser.build(body)
+        return ChunkParser.to_chunks(body)
 
     def has_upstream_server(self) -> bool:
         """Host field SHOULD be None for incoming local WebServer requests."""
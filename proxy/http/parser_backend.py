@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+"""
+    proxy.py
+    ~~~~~~~~
+    ⚡⚡⚡ Fast, Lightweight, Pluggable, TLS interception capable proxy server focused on
+    Network monitoring, controls & Application development, testing, debugging.
+
+    :copyright: (c) 2013-present by Abhinav Singh and contributors.
+    :license: BSD, see LICENSE for more details.
+"""
+import logging
+from typing import Any, NamedTuple, Optional, Type
+
+from .parser import HttpParser, HttpParserLimits, httpParserStates, httpParserTypes
+
+from ..common.constants import CRLF, DEFAULT_HTTP_PARSER
+from ..common.flag import flags
+from ..common.utils import bytes_
+
+httptools: Any
+try:
+    import httptools
+except ImportError:     # pragma: no cover
+    httptools = None
+
+logger = logging.getLogger(__name__)
+
+
+HttpParserBackends = NamedTuple('HttpParserBackends', [
+    ('PYTHON', str),
+    ('HTTPTOOLS', str),
+])
+httpParserBackends = HttpParserBackends('python', 'httptools')
+
+
+flags.add_argument(
+    '--http-parser',
+    type=str,
+    default=DEFAULT_HTTP_PARSER,
+    choices=list(httpParserBackends),
+    help='Default: python.  HTTP parser backend to use.  '
+    'httptools backend requires httptools package to be installed, '
+    'otherwise pure Python parser is used.'
+)
+
+
+class HttptoolsHttpParser(HttpParser):
+    """HttpParser backend which uses httptools (llhttp) for parsing
+    request / status line and headers.
+
+    Header block is handed over to httptools only once it has been
+    completely received.  Body parsing is shared with pure Python HttpParser."""
+
+    def __init__(self, parser_type: int,
+                 limits: Optional[HttpParserLimits] = None) -> None:
+        super().__init__(parser_type, limits)
+        self.raw_url: bytes = b''
+
+    def parse(self, raw: bytes) -> None:
+        if self.state != httpParserStates.INITIALIZED:
+            super().parse(raw)
+            return
+        self.total_size += len(raw)
+        raw = self.buffer + raw
+        end = raw.find(CRLF + CRLF)
+        if end == -1:
+            self.check_head_size(raw)
+            self.buffer = raw
+            return
+        end += 2 * len(CRLF)
+        self.check_head_size(raw[:end])
+        self.process_head(raw[:end])
+        self.buffer = b''
+        self.state = httpParserStates.HEADERS_COMPLETE \
+            if self.body_expected() else \
+            httpParserStates.COMPLETE
+        rest = raw[end:]
+        # Remaining bytes are accounted for by super().parse
+        self.total_size -= len(rest)
+        super().parse(rest)
+
+    def check_head_size(self, head: bytes) -> None:
+        """Enforces request line and header block size limits
+        on a (partially) received head."""
+        crlf = head.find(CRLF)
+        self.check_request_line_size(len(head) if crlf == -1 else crlf)
+        if crlf != -1:
+            self.check_header_size(len(head) - crlf - len(CRLF))
+
+    def process_head(self, head: bytes) -> None:
+        parser: Any = httptools.HttpRequestParser(self) \
+            if self.type == httpParserTypes.REQUEST_PARSER else \
+            httptools.HttpResponseParser(self)
+        try:
+            parser.feed_data(head)
+        except httptools.HttpParserUpgrade:
+            # CONNECT and Upgrade requests pause parser right after headers
+            pass
+        self.version = b'HTTP/' + bytes_(parser.get_http_version())
+        if self.type == httpParserTypes.REQUEST_PARSER:
+            self.method = parser.get_method().upper()
+            self.set_url(self.raw_url)
+        else:
+            self.code = bytes_(parser.get_status_code())
+            if self.reason is None:
+                self.reason = b''
+        # Header lines are kept as received, httptools has already
+        # validated them.  Skip status line and trailing blank line.
+        lines = head[head.find(CRLF) + len(CRLF):-2 * len(CRLF)]
+        if lines:
+            for line in lines.split(CRLF):
+                self.headers.parse_line(line)
+
+    #
+    # httptools callbacks
+    #
+
+    def on_url(self, url: bytes) -> None:
+        self.raw_url += url
+
+    def on_status(self, status: bytes) -> None:
+        self.reason = status if self.reason is None else self.reason + status
+
+
+def get_http_parser_klass(backend: Optional[str]) -> Type[HttpParser]:
+    """Returns HttpParser class for requested backend.
+
+    Falls back to pure Python HttpParser when httptools is not installed."""
+    if backend == httpParserBackends.HTTPTOOLS:
+        if httptools is not None:
+            return HttptoolsHttpParser
+        logger.warning(
+            'httptools is not installed, falling back to python http parser')
+    return HttpParser
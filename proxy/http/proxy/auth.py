@@ -31,9 +31,9 @@ class AuthPlugin(HttpProxyBasePlugin):
     def before_upstream_connection(
             self, request: HttpParser) -> Optional[HttpParser]:
         if self.flags.auth_code:
-            if b'proxy-authorization' not in request.headers:
+            if not request.has_header(b'proxy-authorization'):
                 raise ProxyAuthenticationFailed()
-            parts = request.headers[b'proxy-authorization'][1].split()
+            parts = request.header(b'proxy-authorization').split()
             if len(parts) != 2 \
                     and parts[0].lower() != b'basic' \
                     and parts[1] != self.flags.auth_code:
@@ -0,0 +1,241 @@
+# -*- coding: utf-8 -*-
+"""
+    proxy.py
+    ~~~~~~~~
+    ⚡⚡⚡ Fast, Lightweight, Pluggable, TLS interception capable proxy server focused on
+    Network monitoring, controls & Application development, testing, debugging.
+
+    :copyright: (c) 2013-present by Abhinav Singh and contributors.
+    :license: BSD, see LICENSE for more details.
+"""
+import os
+import time
+import uuid
+import queue
+import logging
+import argparse
+import multiprocessing
+from typing import Any, Dict, Tuple
+
+from ...common.constants import COMMA, DEFAULT_CA_CERT_PREWARM, DEFAULT_CA_CERT_RENEW_BEFORE
+from ...common.flag import flags
+from ...common.pki import gen_public_key, gen_csr, sign_csr, sign_certificate, pkiBackends
+from ...common.utils import text_
+
+logger = logging.getLogger(__name__)
+
+
+flags.add_argument(
+    '--ca-cert-prewarm',
+    type=str,
+    default=DEFAULT_CA_CERT_PREWARM,
+    help='Default: None.  Comma separated list of hostnames to generate '
+    'TLS interception certificates for at startup.'
+)
+flags.add_argument(
+    '--ca-cert-renew-before',
+    type=int,
+    default=DEFAULT_CA_CERT_RENEW_BEFORE,
+    help='Default: 30.  Number of days before expiry after which generated '
+    'TLS interception certificates are regenerated.'
+)
+
+CERT_VALIDITY_DAYS = 365 * 2
+
+# Seconds between checks for certificates due for renewal
+RENEWAL_INTERVAL = 3600
+
+# Upstream certificate subject fields copied into generated certificates
+SUBJECT_KEYS = {
+    'CN': 'commonName',
+    'C': 'countryName',
+    'ST': 'stateOrProvinceName',
+    'L': 'localityName',
+    'O': 'organizationName',
+    'OU': 'organizationalUnitName',
+}
+
+
+def generated_cert_file_path(ca_cert_dir: str, host: str) -> str:
+    return os.path.join(ca_cert_dir, '%s.pem' % host)
+
+
+def certificate_subject(certificate: Dict[str, Any]) -> str:
+    """Returns openssl style subject for upstream certificate
+    as returned by SSLSocket.getpeercert."""
+    upstream_subject = {s[0][0]: s[0][1] for s in certificate.get('subject', ())}
+    subject = ''
+    for key in SUBJECT_KEYS:
+        if upstream_subject.get(SUBJECT_KEYS[key], None):
+            subject += '/{0}={1}'.format(key, upstream_subject.get(SUBJECT_KEYS[key]))
+    return subject
+
+
+def needs_renewal(cert_file_path: str, renew_before: int) -> bool:
+    """Returns True if certificate doesn't exist or expires within renew_before days."""
+    try:
+        age = time.time() - os.stat(cert_file_path).st_mtime
+    except FileNotFoundError:
+        return True
+    return age > (CERT_VALIDITY_DAYS - renew_before) * 24 * 60 * 60
+
+
+def gen_ca_signed_certificate(
+        flags: argparse.Namespace, host: str, subject: str,
+        cert_file_path: str, serial: int, renew: bool = False) -> None:
+    '''CA signing key (default) is used for generating a public key
+    for common_name, if one already doesn't exist.  Using generated
+    public key a CSR request is generated, which is then signed by
+    CA key and secret.  Again this process only happen if signed
+    certificate doesn't already exist, unless renewing.
+
+    Signed certificate is written atomically, hence it can be
+    replaced while other processes are using the previous one.'''
+    assert flags.ca_cert_dir and flags.ca_signing_key_file and \
+        flags.ca_key_file and flags.ca_cert_file
+
+    private_key_path = flags.ca_signing_key_file
+    private_key_password = ''
+    alt_subj_names = [host, ]
+    timeout = 10
+    tmp_cert_file_path = '%s.%s' % (cert_file_path, uuid.uuid4().hex)
+
+    if flags.pki_backend == pkiBackends.CRYPTOGRAPHY:
+        # Sign public key of CA signing key in-process, only
+        # the signed certificate is written into ca_cert_dir
+        logger.debug('Generating certificate %s', cert_file_path)
+        resp = sign_certificate(
+            crt_path=tmp_cert_file_path, key_path=private_key_path,
+            key_password=private_key_password, ca_key_path=flags.ca_key_file,
+            ca_key_password='', ca_crt_path=flags.ca_cert_file,
+            subject=subject, serial=serial, alt_subj_names=alt_subj_names,
+            validity_in_days=CERT_VALIDITY_DAYS)
+        assert resp is True
+        os.replace(tmp_cert_file_path, cert_file_path)
+        return
+
+    public_key_path = os.path.join(flags.ca_cert_dir, '{0}.{1}'.format(host, 'pub'))
+    csr_path = os.path.join(flags.ca_cert_dir, '{0}.{1}'.format(host, 'csr'))
+    if renew:
+        for path in (public_key_path, csr_path):
+            if os.path.isfile(path):
+                os.remove(path)
+
+    # Generate a public key for the common name
+    if not os.path.isfile(public_key_path):
+        logger.debug('Generating public key %s', public_key_path)
+        resp = gen_public_key(public_key_path=public_key_path, private_key_path=private_key_path,
+                              private_key_password=private_key_password, subject=subject,
+                              alt_subj_names=alt_subj_names,
+                              validity_in_days=CERT_VALIDITY_DAYS, timeout=timeout)
+        assert resp is True
+
+    # Generate a CSR request for this common name
+    if not os.path.isfile(csr_path):
+        logger.debug('Generating CSR %s', csr_path)
+        resp = gen_csr(csr_path=csr_path, key_path=private_key_path, password=private_key_password,
+                       crt_path=public_key_path, timeout=timeout)
+        assert resp is True
+
+    # Sign generated CSR
+    if renew or not os.path.isfile(cert_file_path):
+        logger.debug('Signing CSR %s', cert_file_path)
+        resp = sign_csr(csr_path=csr_path, crt_path=tmp_cert_file_path, ca_key_path=flags.ca_key_file,
+                        ca_key_password='', ca_crt_path=flags.ca_cert_file,
+                        serial=str(serial), alt_subj_names=alt_subj_names,
+                        validity_in_days=CERT_VALIDITY_DAYS, timeout=timeout)
+        assert resp is True
+        if os.path.isfile(tmp_cert_file_path):
+            os.replace(tmp_cert_file_path, cert_file_path)
+
+
+class CertificateQueue:
+    """Queue through which worker processes request
+    certificates from the CertificateMinter process.
+
+    Workers waiting for a certificate are woken up
+    whenever minter has processed a request."""
+
+    def __init__(self) -> None:
+        self.requests: 'multiprocessing.Queue[Tuple[str, str]]' = multiprocessing.Queue()
+        self.minted = multiprocessing.Condition()
+
+    def request(self, host: str, subject: str) -> None:
+        self.requests.put((host, subject))
+
+    def mint(self, host: str, subject: str, cert_file_path: str, timeout: float) -> None:
+        """Requests certificate for host and waits until it exists."""
+        self.request(host, subject)
+        with self.minted:
+            if not self.minted.wait_for(lambda: os.path.isfile(cert_file_path), timeout):
+                raise TimeoutError('Timed out waiting for certificate of %s' % host)
+
+    def notify(self) -> None:
+        with self.minted:
+            self.minted.notify_all()
+
+
+class CertificateMinter(multiprocessing.Process):
+    """Generates TLS interception certificates on behalf of all worker processes.
+
+    Being a single process, a certificate is generated only once even
+    when several workers see a new host at the same time.  Certificates
+    of hostnames in --ca-cert-prewarm are generated at startup.  Certificates
+    requested since startup are regenerated --ca-cert-renew-before days
+    before they expire."""
+
+    def __init__(self, flags: argparse.Namespace, certificates: CertificateQueue) -> None:
+        super().__init__()
+        self.flags = flags
+        self.certificates = certificates
+        self.running = multiprocessing.Event()
+        # Subjects of hostnames requested so far, used for renewals
+        self.subjects: Dict[str, str] = {}
+        self.last_renewal = 0.0
+
+    def mint(self, host: str, subject: str) -> None:
+        self.subjects[host] = subject
+        cert_file_path = generated_cert_file_path(self.flags.ca_cert_dir, host)
+        renew = os.path.isfile(cert_file_path)
+        if needs_renewal(cert_file_path, self.flags.ca_cert_renew_before):
+            try:
+                gen_ca_signed_certificate(
+                    self.flags, host, subject, cert_file_path, uuid.uuid4().int, renew=renew)
+            except Exception as e:
+                logger.exception('Unable to generate certificate for %s', host, exc_info=e)
+        self.certificates.notify()
+
+    def renew(self) -> None:
+        self.last_renewal = time.time()
+        for host, subject in list(self.subjects.items()):
+            self.mint(host, subject)
+
+    def run_once(self) -> None:
+        try:
+            host, subject = self.certificates.requests.get(timeout=1)
+        except queue.Empty:
+            host = None
+        if host is not None:
+            self.mint(host, subject)
+        if time.time() - self.last_renewal > RENEWAL_INTERVAL:
+            self.renew()
+
+    def run(self) -> None:
+        try:
+            self.last_renewal = time.time()
+            for host in text_(self.flags.ca_cert_prewarm or '').split(text_(COMMA)):
+                if host.strip():
+                    self.mint(host.strip(), '/CN=%s' % host.strip())
+            while not self.running.is_set():
+                self.run_once()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            logger.debug('Certificate minter shutdown')
+
+    @staticmethod
+    def enabled(flags: argparse.Namespace) -> bool:
+        return flags.ca_key_file is not None and \
+            flags.ca_cert_dir is not None and \
+            flags.ca_signing_key_file is not None and \
+            flags.ca_cert_file is not None
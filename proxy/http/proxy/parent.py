@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+"""
+    proxy.py
+    ~~~~~~~~
+    ⚡⚡⚡ Fast, Lightweight, Pluggable, TLS interception capable proxy server focused on
+    Network monitoring, controls & Application development, testing, debugging.
+
+    :copyright: (c) 2013-present by Abhinav Singh and contributors.
+    :license: BSD, see LICENSE for more details.
+"""
+import base64
+import functools
+import threading
+from typing import NamedTuple, Optional, Tuple
+
+from ..methods import httpMethods
+from ...common.constants import COMMA, COLON, DEFAULT_PROXY_POOL
+from ...common.utils import build_http_request, bytes_, text_
+from ...common.flag import flags
+
+flags.add_argument(
+    '--proxy-pool',
+    type=str,
+    default=DEFAULT_PROXY_POOL,
+    help='Default: None.  Comma separated list of upstream proxies to chain '
+    'requests through e.g. localhost:9000,user:pass@localhost:9001.  '
+    'Plain HTTP requests are forwarded in absolute-form over pooled connections, '
+    'HTTPS requests are tunneled using CONNECT.')
+
+ParentProxy = NamedTuple('ParentProxy', [
+    ('host', str),
+    ('port', int),
+    # Base64 encoded credentials for Proxy-Authorization header
+    ('auth', Optional[bytes]),
+])
+
+
+def parse_proxy_pool(value: Optional[str]) -> Tuple[ParentProxy, ...]:
+    """Parses comma separated [user:pass@]host:port entries."""
+    proxies = []
+    for entry in (value or '').split(text_(COMMA)):
+        entry = entry.strip()
+        if entry == '':
+            continue
+        auth: Optional[bytes] = None
+        if '@' in entry:
+            credentials, entry = entry.rsplit('@', 1)
+            auth = base64.b64encode(bytes_(credentials))
+        host, port = entry.rsplit(text_(COLON), 1)
+        proxies.append(ParentProxy(host.strip('[]'), int(port), auth))
+    return tuple(proxies)
+
+
+def build_connect_request(host: bytes, port: int, parent: ParentProxy) -> bytes:
+    """Builds CONNECT request for tunneling to host:port through parent."""
+    authority = host + COLON + bytes_(port)
+    headers = {b'Host': authority}
+    if parent.auth is not None:
+        headers[b'Proxy-Authorization'] = b'Basic ' + parent.auth
+    return build_http_request(httpMethods.CONNECT, authority, headers=headers)
+
+
+class ParentProxyPool:
+    """Set of upstream proxies shared by all connections within a process.
+
+    Proxies are chosen in a round-robin fashion."""
+
+    def __init__(self, proxies: Tuple[ParentProxy, ...]) -> None:
+        self.proxies = proxies
+        self.next = 0
+        self.lock = threading.Lock()
+
+    def choose(self) -> ParentProxy:
+        with self.lock:
+            proxy = self.proxies[self.next % len(self.proxies)]
+            self.next += 1
+        return proxy
+
+
+@functools.lru_cache(maxsize=None)
+def parent_proxy_pool(proxies: Tuple[ParentProxy, ...]) -> Optional[ParentProxyPool]:
+    """Returns pool for configured upstream proxies, if any."""
+    return ParentProxyPool(proxies) if proxies else None
@@ -9,12 +9,14 @@
     :license: BSD, see LICENSE for more details.
 """
 from abc import ABC, abstractmethod
+import socket
 import argparse
-from typing import Optional
+from typing import List, Optional, Tuple
 from uuid import UUID
 from ..parser import HttpParser
 
 
+from ...common.types import Readables, Writables
 from ...core.event import EventQueue
 from ...core.connection import TcpClientConnection
 
@@ -84,3 +86,31 @@ class HttpProxyBasePlugin(ABC):
     def on_upstream_connection_close(self) -> None:
         """Handler called right after upstream connection has been closed."""
         pass  # pragma: no cover
+
+    def on_intercepted_response(
+            self, request: HttpParser, response: HttpParser) -> None:
+        """Handler called when a response received through an intercepted
+        TLS tunnel has completed, along with request it was sent for.
+
+        Response body is not retained, see response.body_size."""
+        pass  # pragma: no cover
+
+    def get_descriptors(
+            self) -> Tuple[List[socket.socket], List[socket.socket]]:
+        """Descriptors the plugin wants to be woken up for, besides
+        client and upstream connections."""
+        return [], []  # pragma: no cover
+
+    def read_from_descriptors(self, r: Readables) -> bool:
+        """Handler called when descriptors returned by get_descriptors
+        are ready for reads.  Return True to teardown the connection."""
+        return False  # pragma: no cover
+
+    def write_to_descriptors(self, w: Writables) -> bool:
+        """Handler called when descriptors returned by get_descriptors
+        are ready for writes.  Return True to teardown the connection."""
+        return False  # pragma: no cover
+
+    def on_client_connection_close(self) -> None:
+        """Handler called right before client connection is closed."""
+        pass  # pragma: no cover
@@ -16,9 +16,14 @@ import ssl
 import socket
 import time
 import errno
-from typing import Optional, List, Union, Dict, cast, Any, Tuple
+import selectors
+import collections
+from typing import Optional, List, Union, Dict, cast, Any, Tuple, Deque
 
 from .plugin import HttpProxyBasePlugin
+from .minter import CertificateQueue, certificate_subject, needs_renewal
+from .minter import gen_ca_signed_certificate, generated_cert_file_path
+from .parent import ParentProxy, build_connect_request, parent_proxy_pool
 from ..plugin import HttpProtocolHandlerPlugin
 from ..exception import HttpProtocolException, ProxyConnectionFailed
 from ..codes import httpStatusCodes
@@ -30,11 +35,12 @@ from ...common.constants import DEFAULT_CA_CERT_DIR, DEFAULT_CA_CERT_FILE, DEFAU
 from ...common.constants import DEFAULT_CA_KEY_FILE, DEFAULT_CA_SIGNING_KEY_FILE
 from ...common.constants import COMMA, DEFAULT_SERVER_RECVBUF_SIZE, DEFAULT_CERT_FILE
 from ...common.constants import PROXY_AGENT_HEADER_VALUE, DEFAULT_DISABLE_HEADERS
+from ...common.constants import DEFAULT_CONN_POOL_IDLE_TIMEOUT, DEFAULT_CONN_POOL_MAX_PER_HOST
 from ...common.utils import build_http_response, text_
-from ...common.pki import gen_public_key, gen_csr, sign_csr
 
 from ...core.event import eventNames
 from ...core.connection import TcpServerConnection, TcpConnectionUninitializedException
+from ...core.connection import UpstreamConnectionPool
 from ...common.flag import flags
 
 logger = logging.getLogger(__name__)
@@ -96,6 +102,21 @@ flags.add_argument(
     'server in a single recv() operation. Bump this '
     'value for faster downloads at the expense of '
     'increased RAM.')
+flags.add_argument(
+    '--conn-pool-max-per-host',
+    type=int,
+    default=DEFAULT_CONN_POOL_MAX_PER_HOST,
+    help='Default: ' + str(DEFAULT_CONN_POOL_MAX_PER_HOST) +
+    '.  Maximum number of idle keep-alive upstream connections kept '
+    'per upstream host, for reuse across client connections.  '
+    '0 disables upstream connection pooling.')
+flags.add_argument(
+    '--conn-pool-idle-timeout',
+    type=int,
+    default=DEFAULT_CONN_POOL_IDLE_TIMEOUT,
+    help='Default: ' + str(DEFAULT_CONN_POOL_IDLE_TIMEOUT) +
+    '.  Number of seconds after which an idle pooled '
+    'upstream connection is closed.')
 
 
 class HttpProxyPlugin(HttpProtocolHandlerPlugin):
@@ -109,15 +130,39 @@ class HttpProxyPlugin(HttpProtocolHandlerPlugin):
     # Used to synchronization during certificate generation.
     lock = threading.Lock()
 
+    # Upstream connection pool shared by all instances within a process.
+    pool: Optional[UpstreamConnectionPool] = None
+
     def __init__(
             self,
             *args: Any, **kwargs: Any) -> None:
         super().__init__(*args, **kwargs)
         self.start_time: float = time.time()
         self.server: Optional[TcpServerConnection] = None
-        self.response: HttpParser = HttpParser(httpParserTypes.RESPONSE_PARSER)
+        self.response: HttpParser = self.flags.http_parser_klass(
+            httpParserTypes.RESPONSE_PARSER)
         self.pipeline_request: Optional[HttpParser] = None
         self.pipeline_response: Optional[HttpParser] = None
+        # Whether TLS interception is waiting for upstream handshake
+        # to complete, before performing handshake with client
+        self.intercepting: bool = False
+        # Requests sent through intercepted TLS tunnel awaiting
+        # response, along with time they were sent at
+        self.intercepted_requests: Deque[Tuple[HttpParser, float]] = collections.deque()
+        self.intercepted_response: Optional[HttpParser] = None
+        # Unset once intercepted responses can no longer be parsed
+        # e.g. after a protocol upgrade
+        self.observe_intercepted: bool = True
+        # Upstream proxy current request is chained through, if any
+        self.parent: Optional[ParentProxy] = None
+        # Response of upstream proxy to CONNECT, until tunnel is established
+        self.tunnel_response: Optional[HttpParser] = None
+
+        with HttpProxyPlugin.lock:
+            if HttpProxyPlugin.pool is None:
+                HttpProxyPlugin.pool = UpstreamConnectionPool(
+                    self.flags.conn_pool_max_per_host,
+                    self.flags.conn_pool_idle_timeout)
 
         self.plugins: Dict[str, HttpProxyBasePlugin] = {}
         if b'HttpProxyBasePlugin' in self.flags.plugins:
@@ -137,11 +182,27 @@ class HttpProxyPlugin(HttpProtocolHandlerPlugin):
 
     def get_descriptors(
             self) -> Tuple[List[socket.socket], List[socket.socket]]:
-        if not self.request.has_upstream_server():
-            return [], []
-
         r: List[socket.socket] = []
         w: List[socket.socket] = []
+        for plugin in self.plugins.values():
+            plugin_read_desc, plugin_write_desc = plugin.get_descriptors()
+            r.extend(plugin_read_desc)
+            w.extend(plugin_write_desc)
+
+        if not self.request.has_upstream_server():
+            return r, w
+
+        if self.intercepting:
+            assert self.server
+            if self.server.handshaking and self.server.want == selectors.EVENT_READ:
+                r.append(self.server.connection)
+            elif self.server.handshaking:
+                w.append(self.server.connection)
+            # Client connection is left to us until it is wrapped
+            if self.client.has_buffer():
+                w.append(self.client.connection)
+            return r, w
+
         if self.server and not self.server.closed and self.server.connection:
             r.append(self.server.connection)
         if self.server and not self.server.closed and \
@@ -150,6 +211,11 @@ class HttpProxyPlugin(HttpProtocolHandlerPlugin):
         return r, w
 
     def write_to_descriptors(self, w: Writables) -> bool:
+        for plugin in self.plugins.values():
+            if plugin.write_to_descriptors(w):
+                return True
+        if self.intercepting:
+            return self.handle_interception([], w)
         if self.request.has_upstream_server() and \
                 self.server and not self.server.closed and \
                 self.server.has_buffer() and \
@@ -172,6 +238,11 @@ class HttpProxyPlugin(HttpProtocolHandlerPlugin):
         return False
 
     def read_from_descriptors(self, r: Readables) -> bool:
+        for plugin in self.plugins.values():
+            if plugin.read_from_descriptors(r):
+                return True
+        if self.intercepting:
+            return self.handle_interception(r, [])
         if self.request.has_upstream_server() \
                 and self.server \
                 and not self.server.closed \
@@ -208,6 +279,9 @@ class HttpProxyPlugin(HttpProtocolHandlerPlugin):
                 logger.debug('Server closed connection, tearing down...')
                 return True
 
+            if self.tunnel_response is not None:
+                return self.handle_tunnel_response(raw)
+
             for plugin in self.plugins.values():
                 raw = plugin.handle_upstream_chunk(raw)
 
@@ -215,29 +289,34 @@ class HttpProxyPlugin(HttpProtocolHandlerPlugin):
             # only for non-https requests and when
             # tls interception is enabled
             if self.request.method != httpMethods.CONNECT:
-                # See https://github.com/abhinavsingh/proxy.py/issues/127 for why
-                # currently response parsing is disabled when TLS interception is enabled.
-                #
-                # or self.tls_interception_enabled():
                 if self.response.state == httpParserStates.COMPLETE:
                     self.handle_pipeline_response(raw)
                 else:
+                    self.response.request_method = self.request.method
                     # TODO(abhinavsingh): Remove .tobytes after parser is
                     # memoryview compliant
                     self.response.parse(raw.tobytes())
                     self.emit_response_events()
+                    self.release_upstream(self.response)
             else:
                 self.response.total_size += len(raw)
-            # queue raw data for client
-            self.client.queue(raw)
+                if self.tls_interception_enabled() and self.observe_intercepted:
+                    self.handle_intercepted_response(raw)
+            # queue raw data for client, plugins may hold back chunks
+            if raw:
+                self.client.queue(raw)
         return False
 
     def on_client_connection_close(self) -> None:
+        for plugin in self.plugins.values():
+            plugin.on_client_connection_close()
         if not self.request.has_upstream_server():
             return
 
         self.access_log()
+        self.close_upstream()
 
+    def close_upstream(self) -> None:
         # If server was never initialized, return
         if self.server is None:
             return
@@ -264,21 +343,21 @@ class HttpProxyPlugin(HttpProtocolHandlerPlugin):
                 self.server.has_buffer())
 
     def on_response_chunk(self, chunk: List[memoryview]) -> List[memoryview]:
-        # TODO: Allow to output multiple access_log lines
-        # for each request over a pipelined HTTP connection (not for HTTPS).
-        # However, this must also be accompanied by resetting both request
-        # and response objects.
-        #
-        # if not self.request.method == httpMethods.CONNECT and \
-        #         self.response.state == httpParserStates.COMPLETE:
-        #     self.access_log()
         return chunk
 
     def on_client_data(self, raw: memoryview) -> Optional[memoryview]:
         if not self.request.has_upstream_server():
             return raw
 
-        if self.server and not self.server.closed:
+        # Plain HTTP requests received after previous response has completed
+        # are dispatched afresh, possibly to a different upstream server.
+        can_retarget = self.request.state == httpParserStates.COMPLETE and \
+            self.request.method != httpMethods.CONNECT and \
+            self.response.state == httpParserStates.COMPLETE and \
+            self.pipeline_response is None and \
+            (self.pipeline_request is None or not self.pipeline_request.is_connection_upgrade())
+
+        if can_retarget or (self.server and not self.server.closed):
             if self.request.state == httpParserStates.COMPLETE and (
                     self.request.method != httpMethods.CONNECT or
                     self.tls_interception_enabled()):
@@ -287,17 +366,23 @@ class HttpProxyPlugin(HttpProtocolHandlerPlugin):
                     # Previous pipelined request was a WebSocket
                     # upgrade request. Incoming client data now
                     # must be treated as WebSocket protocol packets.
+                    assert self.server
                     self.server.queue(raw)
                     return None
 
                 if self.pipeline_request is None:
-                    self.pipeline_request = HttpParser(
-                        httpParserTypes.REQUEST_PARSER)
+                    self.pipeline_request = self.flags.http_parser_klass(
+                        httpParserTypes.REQUEST_PARSER, self.flags.http_parser_limits)
 
                 # TODO(abhinavsingh): Remove .tobytes after parser is
                 # memoryview compliant
                 self.pipeline_request.parse(raw.tobytes())
                 if self.pipeline_request.state == httpParserStates.COMPLETE:
+                    if can_retarget:
+                        request, self.pipeline_request = self.pipeline_request, None
+                        self.retarget(request)
+                        return None
+                    assert self.server
                     for plugin in self.plugins.values():
                         assert self.pipeline_request is not None
                         r = plugin.handle_client_request(self.pipeline_request)
@@ -309,15 +394,41 @@ class HttpProxyPlugin(HttpProtocolHandlerPlugin):
                     # parser is fully memoryview compliant
                     self.server.queue(
                         memoryview(
-                            self.pipeline_request.build()))
+                            self.build_upstream_request(self.pipeline_request)))
+                    if self.request.method == httpMethods.CONNECT:
+                        self.intercepted_requests.append(
+                            (self.pipeline_request, time.time()))
                     if not self.pipeline_request.is_connection_upgrade():
                         self.pipeline_request = None
             else:
+                assert self.server
                 self.server.queue(raw)
             return None
         else:
             return raw
 
+    def retarget(self, request: HttpParser) -> None:
+        """Dispatches a request received over a keep-alive client connection,
+        after response for previous request has completed.
+
+        Request and response state is reset, hence an access log line
+        is emitted for each request.  Previous upstream connection is
+        released into the pool, from where it can be borrowed again if
+        request is for the same upstream."""
+        self.access_log()
+        if not request.has_upstream_server():
+            # Origin-form request, continue with previous upstream
+            request.host, request.port = self.request.host, self.request.port
+        self.release_upstream(self.response)
+        if self.server is not None:
+            self.close_upstream()
+            self.server = None
+        self.request = request
+        self.response = self.flags.http_parser_klass(
+            httpParserTypes.RESPONSE_PARSER)
+        self.start_time = time.time()
+        self.on_request_complete()
+
     def on_request_complete(self) -> Union[socket.socket, bool]:
         if not self.request.has_upstream_server():
             return False
@@ -343,13 +454,18 @@ class HttpProxyPlugin(HttpProtocolHandlerPlugin):
             if r is not None:
                 self.request = r
             else:
+                if not do_connect and self.request.method != httpMethods.CONNECT:
+                    # Plugin has responded on its own e.g. out of a cache.
+                    # Subsequent requests over a keep-alive client
+                    # connection must then be dispatched afresh.
+                    self.response.state = httpParserStates.COMPLETE
                 return False
 
         if self.request.method == httpMethods.CONNECT:
-            self.client.queue(
-                HttpProxyPlugin.PROXY_TUNNEL_ESTABLISHED_RESPONSE_PKT)
-            if self.tls_interception_enabled():
-                return self.intercept()
+            if self.tunnel_response is not None:
+                # Tunnel is established once upstream proxy responds
+                return False
+            return self.establish_tunnel()
         elif self.server:
             # - proxy-connection header is a mistake, it doesn't seem to be
             #   officially documented in any specification, drop it.
@@ -367,23 +483,136 @@ class HttpProxyPlugin(HttpProtocolHandlerPlugin):
                 [(b'Via', b'1.1 %s' % PROXY_AGENT_HEADER_VALUE)])
             # Disable args.disable_headers before dispatching to upstream
             self.server.queue(
-                memoryview(self.request.build(
-                    disable_headers=self.flags.disable_headers)))
+                memoryview(self.build_upstream_request(
+                    self.request, self.flags.disable_headers)))
+        return False
+
+    def establish_tunnel(self) -> Union[socket.socket, bool]:
+        self.client.queue(
+            HttpProxyPlugin.PROXY_TUNNEL_ESTABLISHED_RESPONSE_PKT)
+        if self.tls_interception_enabled():
+            return self.intercept()
         return False
 
+    def build_upstream_request(
+            self, request: HttpParser, disable_headers: Optional[List[bytes]] = None) -> bytes:
+        """Builds request for upstream.  Requests chained through an upstream
+        proxy are sent in absolute-form, along with credentials for the proxy."""
+        if self.parent is None or self.request.method == httpMethods.CONNECT:
+            return request.build(disable_headers=disable_headers)
+        if not request.has_upstream_server():
+            # Origin-form request pipelined to previous upstream
+            request.host, request.port = self.request.host, self.request.port
+        if self.parent.auth is not None:
+            request.add_header(b'Proxy-Authorization', b'Basic ' + self.parent.auth)
+        return request.build(disable_headers=disable_headers, for_proxy=True)
+
+    def handle_tunnel_response(self, raw: memoryview) -> bool:
+        """Parses response of upstream proxy to CONNECT.  Returns True
+        if tunnel could not be established.
+
+        Once upstream proxy has established the tunnel, tunnel established
+        response is sent to client and TLS interception begins, if enabled.
+        Otherwise, response of upstream proxy is relayed to client."""
+        assert self.tunnel_response is not None and self.parent is not None
+        response = self.tunnel_response
+        # TODO(abhinavsingh): Remove .tobytes after parser is
+        # memoryview compliant
+        response.parse(raw.tobytes())
+        if response.code is not None and not response.code.startswith(b'2'):
+            # Relay error response as-is and teardown once complete
+            self.client.queue(raw)
+            if response.state == httpParserStates.COMPLETE:
+                logger.warning(
+                    'Upstream proxy %s:%d refused tunnel to %s:%s: %s %s' %
+                    (self.parent.host, self.parent.port,
+                     text_(self.request.host), self.request.port,
+                     text_(response.code), text_(response.reason)))
+                return True
+            return False
+        if response.state != httpParserStates.COMPLETE:
+            return False
+        self.tunnel_response = None
+        logger.debug(
+            'Tunnel to %s:%s established via %s:%d' %
+            (text_(self.request.host), self.request.port,
+             self.parent.host, self.parent.port))
+        return self.establish_tunnel() is True
+
     def handle_pipeline_response(self, raw: memoryview) -> None:
         if self.pipeline_response is None:
-            self.pipeline_response = HttpParser(
+            self.pipeline_response = self.flags.http_parser_klass(
                 httpParserTypes.RESPONSE_PARSER)
         # TODO(abhinavsingh): Remove .tobytes after parser is memoryview
         # compliant
         self.pipeline_response.parse(raw.tobytes())
         if self.pipeline_response.state == httpParserStates.COMPLETE:
+            self.release_upstream(self.pipeline_response)
             self.pipeline_response = None
 
+    def handle_intercepted_response(self, raw: memoryview) -> None:
+        """Parses responses received through intercepted TLS tunnel.
+
+        Responses are paired with requests in the order requests were sent.
+        Body is only accounted for, not retained.  Once a response completes,
+        an access log line is emitted and plugins are notified."""
+        data = raw.tobytes()
+        while data and self.intercepted_requests:
+            request, sent_at = self.intercepted_requests[0]
+            if self.intercepted_response is None:
+                self.intercepted_response = self.flags.http_parser_klass(
+                    httpParserTypes.RESPONSE_PARSER)
+                self.intercepted_response.retain_body = False
+                self.intercepted_response.request_method = request.method
+            response = self.intercepted_response
+            try:
+                response.parse(data)
+            except Exception as e:
+                logger.info(
+                    'Unable to parse intercepted response from %s:%s: %r' %
+                    (text_(self.request.host), self.request.port, e))
+                self.stop_observing_intercepted()
+                return
+            if response.state != httpParserStates.COMPLETE:
+                return
+            # Remaining bytes belong to next response
+            data, response.buffer = response.buffer, b''
+            response.total_size -= len(data)
+            self.intercepted_response = None
+            if response.code == b'101':
+                # Protocol switched, rest of the tunnel isn't HTTP
+                self.on_intercepted_response(request, response, sent_at)
+                self.stop_observing_intercepted()
+                return
+            if response.code is not None and response.code.startswith(b'1'):
+                # Interim response, final response follows
+                continue
+            self.intercepted_requests.popleft()
+            self.on_intercepted_response(request, response, sent_at)
+
+    def on_intercepted_response(
+            self, request: HttpParser, response: HttpParser, sent_at: float) -> None:
+        for plugin in self.plugins.values():
+            plugin.on_intercepted_response(request, response)
+        logger.info(
+            '%s:%s - %s https://%s:%s%s - %s %s - %s bytes - %.2f ms' %
+            (self.client.addr[0], self.client.addr[1],
+             text_(request.method),
+             text_(self.request.host), self.request.port,
+             text_(request.path),
+             text_(response.code),
+             text_(response.reason),
+             response.total_size,
+             (time.time() - sent_at) * 1000))
+
+    def stop_observing_intercepted(self) -> None:
+        self.observe_intercepted = False
+        self.intercepted_requests.clear()
+        self.intercepted_response = None
+
     def access_log(self) -> None:
-        server_host, server_port = self.server.addr if self.server else (
-            None, None)
+        server_host, server_port = self.server.addr if self.server and self.parent is None else (
+            text_(self.request.host), self.request.port)
         connection_time_ms = (time.time() - self.start_time) * 1000
         if self.request.method == httpMethods.CONNECT:
             logger.info(
@@ -410,98 +639,72 @@ class HttpProxyPlugin(HttpProtocolHandlerPlugin):
     def connect_upstream(self) -> None:
         host, port = self.request.host, self.request.port
         if host and port:
-            self.server = TcpServerConnection(text_(host), port)
+            parents = parent_proxy_pool(getattr(self.flags, 'proxy_pool', ()))
+            self.parent = parents.choose() if parents else None
+            # Requests are chained through upstream proxy, if any
+            upstream_host, upstream_port = (self.parent.host, self.parent.port) \
+                if self.parent else (text_(host), port)
+            if self.request.method != httpMethods.CONNECT:
+                assert HttpProxyPlugin.pool
+                self.server = HttpProxyPlugin.pool.acquire(
+                    (upstream_host, upstream_port, False))
+                if self.server is not None:
+                    return
+            self.server = TcpServerConnection(upstream_host, upstream_port)
             try:
                 logger.debug(
                     'Connecting to upstream %s:%s' %
-                    (text_(host), port))
+                    (upstream_host, upstream_port))
                 self.server.connect()
                 self.server.connection.setblocking(False)
                 logger.debug(
                     'Connected to upstream %s:%s' %
-                    (text_(host), port))
+                    (upstream_host, upstream_port))
             except Exception as e:  # TimeoutError, socket.gaierror
                 self.server.closed = True
-                raise ProxyConnectionFailed(text_(host), port, repr(e)) from e
+                raise ProxyConnectionFailed(upstream_host, upstream_port, repr(e)) from e
+            if self.parent is not None and self.request.method == httpMethods.CONNECT:
+                self.server.queue(memoryview(build_connect_request(
+                    host, port, self.parent)))
+                self.tunnel_response = self.flags.http_parser_klass(
+                    httpParserTypes.RESPONSE_PARSER)
+                self.tunnel_response.request_method = httpMethods.CONNECT
         else:
             logger.exception('Both host and port must exist')
             raise HttpProtocolException()
 
+    def is_reusable(self, response: HttpParser) -> bool:
+        """Returns True if upstream connection can be reused after response,
+        i.e. response has completed and both ends intend to keep-alive.
+
+        Response must be framed, otherwise upstream will signal
+        end of response by closing the connection."""
+        return self.request.method != httpMethods.CONNECT and \
+            response.state == httpParserStates.COMPLETE and \
+            self.request.is_http_1_1_keep_alive() and \
+            response.is_http_1_1_keep_alive() and \
+            (response.has_header(b'content-length') or response.is_chunked_encoded())
+
+    def release_upstream(self, response: HttpParser) -> None:
+        """Puts upstream connection back into the pool once reusable."""
+        if self.server is None or \
+                self.pipeline_request is not None or \
+                not self.is_reusable(response):
+            return
+        assert HttpProxyPlugin.pool and self.request.host and self.request.port
+        host, port = (self.parent.host, self.parent.port) if self.parent else (
+            text_(self.request.host), self.request.port)
+        if HttpProxyPlugin.pool.release((host, port, False), self.server):
+            logger.debug('Released upstream connection %s:%d' % self.server.addr)
+            self.server = None
+
     #
     # Interceptor related methods
     #
 
-    def gen_ca_signed_certificate(
-            self, cert_file_path: str, certificate: Dict[str, Any]) -> None:
-        '''CA signing key (default) is used for generating a public key
-        for common_name, if one already doesn't exist.  Using generated
-        public key a CSR request is generated, which is then signed by
-        CA key and secret.  Again this process only happen if signed
-        certificate doesn't already exist.
-
-        returns signed certificate path.'''
-        assert(self.request.host and self.flags.ca_cert_dir and self.flags.ca_signing_key_file and
-               self.flags.ca_key_file and self.flags.ca_cert_file)
-
-        upstream_subject = {s[0][0]: s[0][1] for s in certificate['subject']}
-        public_key_path = os.path.join(self.flags.ca_cert_dir,
-                                       '{0}.{1}'.format(text_(self.request.host), 'pub'))
-        private_key_path = self.flags.ca_signing_key_file
-        private_key_password = ''
-
-        # Build certificate subject
-        keys = {
-            'CN': 'commonName',
-            'C': 'countryName',
-            'ST': 'stateOrProvinceName',
-            'L': 'localityName',
-            'O': 'organizationName',
-            'OU': 'organizationalUnitName',
-        }
-        subject = ''
-        for key in keys:
-            if upstream_subject.get(keys[key], None):
-                subject += '/{0}={1}'.format(key,
-                                             upstream_subject.get(keys[key]))
-        alt_subj_names = [text_(self.request.host), ]
-        validity_in_days = 365 * 2
-        timeout = 10
-
-        # Generate a public key for the common name
-        if not os.path.isfile(public_key_path):
-            logger.debug('Generating public key %s', public_key_path)
-            resp = gen_public_key(public_key_path=public_key_path, private_key_path=private_key_path,
-                                  private_key_password=private_key_password, subject=subject, alt_subj_names=alt_subj_names,
-                                  validity_in_days=validity_in_days, timeout=timeout)
-            assert(resp is True)
-
-        csr_path = os.path.join(self.flags.ca_cert_dir,
-                                '{0}.{1}'.format(text_(self.request.host), 'csr'))
-
-        # Generate a CSR request for this common name
-        if not os.path.isfile(csr_path):
-            logger.debug('Generating CSR %s', csr_path)
-            resp = gen_csr(csr_path=csr_path, key_path=private_key_path, password=private_key_password,
-                           crt_path=public_key_path, timeout=timeout)
-            assert(resp is True)
-
-        ca_key_path = self.flags.ca_key_file
-        ca_key_password = ''
-        ca_crt_path = self.flags.ca_cert_file
-        serial = self.uid.int
-
-        # Sign generated CSR
-        if not os.path.isfile(cert_file_path):
-            logger.debug('Signing CSR %s', cert_file_path)
-            resp = sign_csr(csr_path=csr_path, crt_path=cert_file_path, ca_key_path=ca_key_path,
-                            ca_key_password=ca_key_password, ca_crt_path=ca_crt_path,
-                            serial=str(serial), alt_subj_names=alt_subj_names,
-                            validity_in_days=validity_in_days, timeout=timeout)
-            assert(resp is True)
-
     @staticmethod
     def generated_cert_file_path(ca_cert_dir: str, host: str) -> str:
-        return os.path.join(ca_cert_dir, '%s.pem' % host)
+        return generated_cert_file_path(ca_cert_dir, host)
 
     def generate_upstream_certificate(
             self, certificate: Dict[str, Any]) -> str:
@@ -512,21 +715,74 @@ class HttpProxyPlugin(HttpProtocolHandlerPlugin):
                 f'--ca-cert-file:{ self.flags.ca_cert_file }, '
                 f'--ca-key-file:{ self.flags.ca_key_file }, '
                 f'--ca-signing-key-file:{ self.flags.ca_signing_key_file }')
+        host = text_(self.request.host)
         cert_file_path = HttpProxyPlugin.generated_cert_file_path(
-            self.flags.ca_cert_dir, text_(self.request.host))
-        with self.lock:
+            self.flags.ca_cert_dir, host)
+        subject = certificate_subject(certificate)
+        renew = needs_renewal(cert_file_path, self.flags.ca_cert_renew_before)
+        certificates: Optional[CertificateQueue] = getattr(
+            self.flags, 'certificate_queue', None)
+        if certificates is not None:
+            # Minter process generates certificates on behalf of all workers.
+            # A certificate due for renewal is still usable, hence only wait
+            # for certificates which doesn't exist yet.
             if not os.path.isfile(cert_file_path):
-                self.gen_ca_signed_certificate(cert_file_path, certificate)
+                certificates.mint(host, subject, cert_file_path,
+                                  timeout=self.flags.timeout)
+            elif renew:
+                certificates.request(host, subject)
+            return cert_file_path
+        with self.lock:
+            if needs_renewal(cert_file_path, self.flags.ca_cert_renew_before):
+                gen_ca_signed_certificate(
+                    self.flags, host, subject, cert_file_path, self.uid.int,
+                    renew=os.path.isfile(cert_file_path))
         return cert_file_path
 
     def intercept(self) -> Union[socket.socket, bool]:
-        # Perform SSL/TLS handshake with upstream
+        # Start SSL/TLS handshake with upstream.  Handshake is continued
+        # within the event loop, see handle_interception.
         self.wrap_server()
-        # Generate certificate and perform handshake with client
+        self.intercepting = True
+        # Client must not be read from until wrapped, as it
+        # starts handshake as soon as tunnel is established
+        self.client.handshaking = True
+        if self.handle_interception([], []):
+            return True
+        if self.intercepting:
+            return False
+        return self.client.connection
+
+    def handle_interception(self, r: Readables, w: Writables) -> bool:
+        """Advances TLS interception.  Returns True if interception failed.
+
+        Once handshake with upstream completes and tunnel established
+        response has been flushed, client connection is wrapped using
+        certificate generated for upstream.  Handshake with client is
+        then continued by HttpProtocolHandler."""
+        assert self.server is not None
+        if self.server.handshaking:
+            if self.server.connection not in r and self.server.connection not in w:
+                return False
+            try:
+                if not self.server.do_handshake():
+                    return False
+            except (ssl.SSLError, OSError) as e:
+                logger.warning(
+                    'TLS handshake with %s:%d failed: %r' %
+                    (self.server.addr[0], self.server.addr[1], e))
+                return True
         try:
-            # wrap_client also flushes client data before wrapping
-            # sending to client can raise, handle expected exceptions
+            # Tunnel established response must reach client
+            # before handshake with client can begin
+            if self.client.has_buffer():
+                self.client.flush()
+            if self.client.has_buffer():
+                return False
+            self.intercepting = False
             self.wrap_client()
+        except BlockingIOError:
+            return False
         except subprocess.TimeoutExpired as e:  # Popen communicate timeout
             logger.exception(
                 'TimeoutExpired during certificate generation', exc_info=e)
@@ -543,7 +799,7 @@ class HttpProxyPlugin(HttpProtocolHandlerPlugin):
         # TODO(abhinavsingh): Is this required?
         for plugin in self.plugins.values():
             plugin.client._conn = self.client.connection
-        return self.client.connection
+        return False
 
     def wrap_server(self) -> None:
         assert self.server is not None
@@ -578,7 +834,7 @@ class HttpProxyPlugin(HttpProtocolHandlerPlugin):
                 if self.request.method == httpMethods.CONNECT
                 else 'http://%s:%d%s' % (text_(self.request.host), self.request.port, text_(self.request.path)),
                 'method': text_(self.request.method),
-                'headers': {text_(k): text_(v[1]) for k, v in self.request.headers.items()},
+                'headers': {text_(k): text_(v) for k, v in self.request.headers.fold()},
                 'body': text_(self.request.body)
                 if self.request.method == httpMethods.POST
                 else None
@@ -211,8 +211,8 @@ class HttpWebServerPlugin(HttpProtocolHandlerPlugin):
                 self.request.is_http_1_1_keep_alive() and \
                 self.route is not None:
             if self.pipeline_request is None:
-                self.pipeline_request = HttpParser(
-                    httpParserTypes.REQUEST_PARSER)
+                self.pipeline_request = self.flags.http_parser_klass(
+                    httpParserTypes.REQUEST_PARSER, self.flags.http_parser_limits)
             # TODO(abhinavsingh): Remove .tobytes after parser is memoryview
             # compliant
             self.pipeline_request.parse(raw.tobytes())
@@ -8,7 +8,7 @@
     :copyright: (c) 2013-present by Abhinav Singh and contributors.
     :license: BSD, see LICENSE for more details.
 """
-from .cache import CacheResponsesPlugin, BaseCacheResponsesPlugin
+from .cache import CacheResponsesPlugin, BaseCacheResponsesPlugin, SharedCacheResponsesPlugin
 from .filter_by_upstream import FilterByUpstreamHostPlugin
 from .man_in_the_middle import ManInTheMiddlePlugin
 from .mock_rest_api import ProposedRestApiPlugin
@@ -25,6 +25,7 @@ from .modify_chunk_response import ModifyChunkResponsePlugin
 __all__ = [
     'CacheResponsesPlugin',
     'BaseCacheResponsesPlugin',
+    'SharedCacheResponsesPlugin',
     'FilterByUpstreamHostPlugin',
     'ManInTheMiddlePlugin',
     'ProposedRestApiPlugin',
@@ -10,8 +10,10 @@
 """
 from .base import BaseCacheResponsesPlugin
 from .cache_responses import CacheResponsesPlugin
+from .shared_cache_responses import SharedCacheResponsesPlugin
 
 __all__ = [
     'BaseCacheResponsesPlugin',
     'CacheResponsesPlugin',
+    'SharedCacheResponsesPlugin',
 ]
@@ -25,6 +25,9 @@ class BaseCacheResponsesPlugin(HttpProxyBasePlugin):
     must implement CacheStore interface.
 
     Different storage backends can be used per request if required.
+
+    When store has a response for the request, it is served
+    to the client without establishing upstream connection.
     """
 
     def __init__(
@@ -33,6 +36,7 @@ class BaseCacheResponsesPlugin(HttpProxyBasePlugin):
             **kwargs: Any) -> None:
         super().__init__(*args, **kwargs)
         self.store: Optional[CacheStore] = None
+        self.cached_response: Optional[memoryview] = None
 
     def set_store(self, store: CacheStore) -> None:
         self.store = store
@@ -40,6 +44,13 @@ class BaseCacheResponsesPlugin(HttpProxyBasePlugin):
     def before_upstream_connection(
             self, request: HttpParser) -> Optional[HttpParser]:
         assert self.store
+        try:
+            self.cached_response = self.store.cached_response(request)
+        except Exception as e:
+            logger.info('Cache lookup failed due to exception message %s', str(e))
+            self.cached_response = None
+        if self.cached_response is not None:
+            return None
         try:
             self.store.open(request)
         except Exception as e:
@@ -49,6 +60,12 @@ class BaseCacheResponsesPlugin(HttpProxyBasePlugin):
     def handle_client_request(
             self, request: HttpParser) -> Optional[HttpParser]:
         assert self.store
+        if self.cached_response is not None:
+            # Empty response is streamed by the store later on
+            if self.cached_response:
+                self.client.queue(self.cached_response)
+            self.cached_response = None
+            return None
         return self.store.cache_request(request)
 
     def handle_upstream_chunk(self, chunk: memoryview) -> memoryview:
@@ -8,21 +8,59 @@
     :copyright: (c) 2013-present by Abhinav Singh and contributors.
     :license: BSD, see LICENSE for more details.
 """
+import os
+import threading
 import multiprocessing
-from typing import Any
+from typing import Any, Optional
 
+from ...http.parser import HttpParser
+from .store.base import CacheStore
 from .store.disk import OnDiskCacheStore
+from .store.replay import ReplayCacheStore
+from .store.segment import SegmentCacheTier
 from .base import BaseCacheResponsesPlugin
 
 
 class CacheResponsesPlugin(BaseCacheResponsesPlugin):
-    """Caches response using OnDiskCacheStore."""
+    """Caches response using OnDiskCacheStore.
+
+    While ENABLED is set, responses are instead recorded into an
+    archive under --cache-dir and replayed using ReplayCacheStore."""
 
     # Dynamically enable / disable cache
     ENABLED = multiprocessing.Event()
 
+    archive: Optional[SegmentCacheTier] = None
+    lock = threading.Lock()
+
     def __init__(self, *args: Any, **kwargs: Any) -> None:
         super().__init__(*args, **kwargs)
         self.disk_store = OnDiskCacheStore(
             uid=self.uid, cache_dir=self.flags.cache_dir)
+        self.replay_store: Optional[ReplayCacheStore] = None
         self.set_store(self.disk_store)
+
+    def before_upstream_connection(
+            self, request: HttpParser) -> Optional[HttpParser]:
+        store: CacheStore = self.disk_store
+        if CacheResponsesPlugin.ENABLED.is_set():
+            if self.replay_store is None:
+                self.replay_store = ReplayCacheStore(
+                    uid=self.uid, archive=self.get_archive(),
+                    offline=self.flags.cache_offline)
+            store = self.replay_store
+        if self.store is not store:
+            # Keep-alive connection spanning enabling / disabling the cache
+            assert self.store
+            self.store.close()
+            self.set_store(store)
+        return super().before_upstream_connection(request)
+
+    def get_archive(self) -> SegmentCacheTier:
+        with CacheResponsesPlugin.lock:
+            if CacheResponsesPlugin.archive is None:
+                CacheResponsesPlugin.archive = SegmentCacheTier(
+                    os.path.join(self.flags.cache_dir, 'proxy.py-vcr'),
+                    max_size=self.flags.cache_disk_size,
+                    segment_size=self.flags.cache_segment_size)
+            return CacheResponsesPlugin.archive
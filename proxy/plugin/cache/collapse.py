@@ -0,0 +1,271 @@
+# -*- coding: utf-8 -*-
+"""
+    proxy.py
+    ~~~~~~~~
+    ⚡⚡⚡ Fast, Lightweight, Pluggable, TLS interception capable proxy server focused on
+    Network monitoring, controls & Application development, testing, debugging.
+
+    :copyright: (c) 2013-present by Abhinav Singh and contributors.
+    :license: BSD, see LICENSE for more details.
+"""
+import socket
+import logging
+import threading
+from typing import List, NamedTuple, Optional
+
+from ...common.constants import CRLF, DEFAULT_BUFFER_SIZE
+from ...common.utils import socket_connection, text_
+from ...http.chunk_parser import ChunkParser, chunkParserStates
+from ...http.parser import HttpParser
+
+from .policy import is_storable, parse_cache_control, vary_names, vary_values
+
+logger = logging.getLogger(__name__)
+
+
+WaiterStates = NamedTuple('WaiterStates', [
+    ('WAITING', int),
+    ('STREAMING', int),
+    ('FALLBACK', int),
+    ('DONE', int),
+    ('FAILED', int),
+])
+waiterStates = WaiterStates(1, 2, 3, 4, 5)
+
+
+class CollapsedFetch:
+    """Upstream response stream shared by identical concurrent requests.
+
+    Leader feeds response bytes exactly as they are sent to its own
+    client.  Requests attached as waiters replay the stream from its
+    start, once response head shows that it may be shared with them,
+    i.e. response is storable by a shared cache and their request
+    headers match those nominated by Vary.
+
+    A private fetch serves a single waiter, whatever the response."""
+
+    def __init__(self, key: bytes, request: HttpParser,
+                 max_size: int, private: bool = False) -> None:
+        self.key = key
+        self.request = request
+        self.max_size = max_size
+        self.private = private
+        self.lock = threading.Lock()
+        # Retained response chunks, chunks[0] is chunk number base
+        self.chunks: List[bytes] = []
+        self.base = 0
+        self.size = 0
+        self.head = b''
+        self.response: Optional[HttpParser] = None
+        self.shareable: Optional[bool] = None
+        # Content-Length bytes yet to be received
+        self.remaining: Optional[int] = None
+        self.chunk_parser: Optional[ChunkParser] = None
+        self.complete = False
+        self.failed = False
+        # Whether new waiters may still attach
+        self.accepting = not private
+        self.waiters: List['Waiter'] = []
+
+    @property
+    def done(self) -> bool:
+        return self.complete or self.failed
+
+    @property
+    def unframed(self) -> bool:
+        """Response is delimited by upstream closing the connection."""
+        return self.response is not None and \
+            self.remaining is None and self.chunk_parser is None
+
+    def attach(self, request: HttpParser) -> Optional['Waiter']:
+        with self.lock:
+            if not self.accepting or self.done:
+                return None
+            waiter = Waiter(self, request)
+            self.waiters.append(waiter)
+        # Replay whatever has been received so far
+        waiter.notify()
+        return waiter
+
+    def detach(self, waiter: 'Waiter') -> None:
+        with self.lock:
+            if waiter in self.waiters:
+                self.waiters.remove(waiter)
+            self.trim()
+
+    def feed(self, data: bytes) -> None:
+        with self.lock:
+            if self.done:
+                return
+            if self.shareable is not False:
+                self.chunks.append(data)
+            self.size += len(data)
+            if self.response is None:
+                self.parse_head(data)
+            else:
+                self.track(data)
+            if self.size > self.max_size:
+                self.accepting = False
+                self.trim()
+        self.notify()
+
+    def finish(self, eof: bool = False) -> None:
+        """Marks fetch as failed unless response has completed.
+
+        When upstream closed the connection, i.e. on eof,
+        a response without framing is complete."""
+        with self.lock:
+            if not self.done:
+                self.complete = eof and self.unframed
+                self.failed = not self.complete
+            self.accepting = False
+        self.notify()
+
+    def notify(self) -> None:
+        for waiter in list(self.waiters):
+            waiter.notify()
+
+    def take(self, waiter: 'Waiter') -> List[bytes]:
+        """Returns chunks not yet received by waiter and updates its state."""
+        with self.lock:
+            if waiter.state == waiterStates.WAITING:
+                if self.shareable is None and not self.failed:
+                    return []
+                if not self.failed and self.may_serve(waiter.request):
+                    waiter.state = waiterStates.STREAMING
+                else:
+                    # Private fetch has no one else to fall back to
+                    waiter.state = waiterStates.FAILED if self.private \
+                        else waiterStates.FALLBACK
+            if waiter.state != waiterStates.STREAMING:
+                return []
+            chunks = self.chunks[waiter.position - self.base:]
+            waiter.position = self.base + len(self.chunks)
+            if self.complete:
+                waiter.state = waiterStates.DONE
+            elif self.failed:
+                waiter.state = waiterStates.FAILED
+            self.trim()
+            return chunks
+
+    def may_serve(self, request: HttpParser) -> bool:
+        if self.private:
+            return True
+        if not self.shareable:
+            return False
+        assert self.response
+        names = vary_names(self.response) or []
+        return vary_values(self.request, names) == vary_values(request, names)
+
+    def trim(self) -> None:
+        """Drops chunks received by all waiters, once no waiter can attach."""
+        if self.accepting:
+            return
+        position = min(
+            (w.position for w in self.waiters if w.state != waiterStates.FALLBACK),
+            default=self.base + len(self.chunks))
+        del self.chunks[:position - self.base]
+        self.base = position
+
+    def parse_head(self, data: bytes) -> None:
+        self.head += data
+        end = self.head.find(CRLF * 2)
+        if end == -1:
+            return
+        head, rest = self.head[:end + 4], self.head[end + 4:]
+        self.head = b''
+        self.response = HttpParser.response(head)
+        length = self.response.headers.get(b'content-length')
+        if self.response.is_chunked_encoded():
+            self.chunk_parser = ChunkParser()
+        elif length is not None and length.isdigit():
+            self.remaining = int(length)
+        elif self.response.code in (b'204', b'304'):
+            self.remaining = 0
+        self.shareable = self.private or (
+            is_storable(self.request, self.response, parse_cache_control(
+                self.response.headers.get_all(b'cache-control'))) and
+            (self.chunk_parser is not None or
+             (self.remaining is not None and self.remaining <= self.max_size)))
+        if not self.shareable:
+            self.chunks = []
+            self.accepting = False
+        self.track(rest)
+
+    def track(self, data: bytes) -> None:
+        if self.chunk_parser is not None:
+            self.chunk_parser.parse(data)
+            self.chunk_parser.body = b''
+            self.complete = self.chunk_parser.state == chunkParserStates.COMPLETE
+        elif self.remaining is not None:
+            self.remaining -= len(data)
+            self.complete = self.remaining <= 0
+
+
+class Waiter:
+    """A request attached to a CollapsedFetch.
+
+    Reader end of a socket pair is readable whenever fetch
+    has progressed, so that waiter can be driven by the
+    event loop which owns the client connection."""
+
+    def __init__(self, fetch: CollapsedFetch, request: HttpParser) -> None:
+        self.fetch = fetch
+        self.request = request
+        self.state = waiterStates.WAITING
+        self.position = 0
+        self.reader, self.writer = socket.socketpair()
+        self.reader.setblocking(False)
+        self.writer.setblocking(False)
+
+    def notify(self) -> None:
+        try:
+            self.writer.send(b'\x00')
+        except OSError:
+            # Reader already has a pending notification
+            pass
+
+    def receive(self) -> List[bytes]:
+        try:
+            while self.reader.recv(DEFAULT_BUFFER_SIZE):
+                pass
+        except OSError:
+            pass
+        return self.fetch.take(self)
+
+    def fallback(self, max_size: int) -> None:
+        """Fetches response privately when collapsed fetch can't serve waiter."""
+        assert self.request.host and self.request.port
+        self.fetch.detach(self)
+        fetch = CollapsedFetch(self.fetch.key, self.request, max_size, private=True)
+        fetch.waiters.append(self)
+        self.fetch, self.state, self.position = fetch, waiterStates.WAITING, 0
+        request = HttpParser.request(self.request.build())
+        request.del_headers([b'proxy-authorization', b'proxy-connection', b'connection', b'keep-alive'])
+        request.add_headers([(b'Connection', b'close')])
+        threading.Thread(
+            target=Waiter.fetch_privately,
+            args=(fetch, request.build(), text_(self.request.host), self.request.port),
+            daemon=True).start()
+
+    @staticmethod
+    def fetch_privately(fetch: CollapsedFetch, request: bytes, host: str, port: int) -> None:
+        eof = False
+        try:
+            with socket_connection((host, port)) as conn:
+                conn.sendall(request)
+                while not fetch.done:
+                    data = conn.recv(DEFAULT_BUFFER_SIZE)
+                    if not data:
+                        eof = True
+                        break
+                    fetch.feed(data)
+        except Exception as e:
+            logger.info('Fetch for %s failed: %r', text_(fetch.key), e)
+        finally:
+            fetch.finish(eof)
+
+    def close(self) -> None:
+        self.fetch.detach(self)
+        self.reader.close()
+        self.writer.close()
@@ -0,0 +1,432 @@
+# -*- coding: utf-8 -*-
+"""
+    proxy.py
+    ~~~~~~~~
+    ⚡⚡⚡ Fast, Lightweight, Pluggable, TLS interception capable proxy server focused on
+    Network monitoring, controls & Application development, testing, debugging.
+
+    :copyright: (c) 2013-present by Abhinav Singh and contributors.
+    :license: BSD, see LICENSE for more details.
+"""
+import json
+import struct
+import email.utils
+from typing import Dict, List, Optional, Any, Tuple, Union
+
+from ...common.constants import CRLF, COLON, WHITESPACE
+from ...http.headers import HttpHeaders
+from ...http.methods import httpMethods
+from ...http.parser import HttpParser
+
+# Status codes which are cacheable by default, i.e. can be
+# stored with heuristic freshness.  See RFC 9110 Section 15.1.
+HEURISTICALLY_CACHEABLE = (200, 203, 204, 300, 301, 308, 404, 405, 410, 414, 501)
+
+# Heuristic freshness is 10% of time since Last-Modified, capped at a day.
+HEURISTIC_FRACTION = 0.1
+HEURISTIC_MAX_LIFETIME = 24 * 60 * 60
+
+# Headers which are never stored, Age is recomputed when serving and
+# Transfer-Encoding is dropped because stored body is de-chunked.
+HOP_BY_HOP_HEADERS = (
+    b'age', b'connection', b'keep-alive', b'proxy-connection',
+    b'proxy-authenticate', b'te', b'trailer', b'transfer-encoding', b'upgrade',
+)
+
+# Status codes for which stale-if-error permits serving a stale response
+ERROR_CODES = (500, 502, 503, 504)
+
+# Responses are stored with header names and values decoded as latin-1,
+# which round trips arbitrary bytes.
+ENCODING = 'latin-1'
+
+Directives = Dict[str, Optional[str]]
+
+
+def parse_cache_control(values: List[bytes]) -> Directives:
+    """Parses Cache-Control header values into a directive -> argument dict.
+
+    Directive names are lowercased and quoted arguments are unquoted.
+    Commas within quoted arguments e.g. no-cache="a, b" are respected."""
+    directives: Directives = {}
+    for value in values:
+        for part in split_quoted(value.decode(ENCODING)):
+            name, sep, arg = part.partition('=')
+            name = name.strip().lower()
+            if not name:
+                continue
+            arg = arg.strip()
+            if len(arg) >= 2 and arg[0] == arg[-1] == '"':
+                arg = arg[1:-1]
+            # First occurrence wins for duplicate directives
+            directives.setdefault(name, arg if sep else None)
+    return directives
+
+
+def split_quoted(value: str) -> List[str]:
+    parts, start, quoted = [], 0, False
+    for i, c in enumerate(value):
+        if c == '"':
+            quoted = not quoted
+        elif c == ',' and not quoted:
+            parts.append(value[start:i])
+            start = i + 1
+    parts.append(value[start:])
+    return parts
+
+
+def delta_seconds(arg: Optional[str]) -> Optional[int]:
+    """Returns delta-seconds argument of a directive, None if invalid."""
+    if arg is None or not arg.isdigit():
+        return None
+    return int(arg)
+
+
+def parse_http_date(value: Optional[bytes]) -> Optional[float]:
+    """Returns HTTP-date as unix timestamp, None if absent or invalid."""
+    if value is None:
+        return None
+    parsed = email.utils.parsedate_tz(value.decode(ENCODING))
+    if parsed is None:
+        return None
+    try:
+        return float(email.utils.mktime_tz(parsed))
+    except (OverflowError, ValueError):
+        return None
+
+
+def request_directives(request: HttpParser) -> Directives:
+    """Returns Cache-Control directives of a request.
+
+    HTTP/1.0 Pragma: no-cache is honoured when
+    Cache-Control is absent, see RFC 9111 Section 5.4."""
+    values = request.headers.get_all(b'cache-control')
+    if not values:
+        pragma = request.headers.get(b'pragma')
+        if pragma is not None and b'no-cache' in pragma.lower():
+            return {'no-cache': None}
+    return parse_cache_control(values)
+
+
+def vary_names(response: HttpParser) -> Optional[List[str]]:
+    """Returns lowercased header names listed in Vary, None for Vary: *."""
+    names: List[str] = []
+    for value in response.headers.get_all(b'vary'):
+        for name in value.decode(ENCODING).split(','):
+            name = name.strip().lower()
+            if name == '*':
+                return None
+            if name and name not in names:
+                names.append(name)
+    return sorted(names)
+
+
+def vary_values(request: HttpParser, names: List[str]) -> Dict[str, str]:
+    """Returns normalized values of request headers nominated by Vary."""
+    values: Dict[str, str] = {}
+    for name in names:
+        value = b', '.join(request.headers.get_all(name.encode(ENCODING)))
+        values[name] = ' '.join(value.decode(ENCODING).split())
+    return values
+
+
+def freshness_lifetime(response: HttpParser, directives: Directives,
+                       date: float) -> Optional[float]:
+    """Returns freshness lifetime of a response for a shared cache.
+
+    Returns None when response neither has explicit expiration
+    nor is eligible for heuristic freshness, see RFC 9111 Section 4.2.1."""
+    for directive in ('s-maxage', 'max-age'):
+        if directive in directives:
+            lifetime = delta_seconds(directives[directive])
+            return 0.0 if lifetime is None else float(lifetime)
+    expires = response.headers.get(b'expires')
+    if expires is not None:
+        # Invalid dates e.g. Expires: 0 represent a time in the past
+        expires_at = parse_http_date(expires)
+        return 0.0 if expires_at is None else max(0.0, expires_at - date)
+    assert response.code
+    last_modified = parse_http_date(response.headers.get(b'last-modified'))
+    if last_modified is not None and \
+            (int(response.code) in HEURISTICALLY_CACHEABLE or 'public' in directives):
+        return min(max(0.0, (date - last_modified) * HEURISTIC_FRACTION),
+                   float(HEURISTIC_MAX_LIFETIME))
+    return None
+
+
+def is_storable(request: HttpParser, response: HttpParser,
+                directives: Directives) -> bool:
+    """Returns True if a complete response may be stored by a shared cache,
+    see RFC 9111 Section 3.
+
+    Responses carrying Set-Cookie are never stored, to avoid
+    sharing them between clients."""
+    if request.method != httpMethods.GET or response.code is None or \
+            not response.code.isdigit():
+        return False
+    code = int(response.code)
+    if code < 200 or code in (206, 304):
+        return False
+    if 'no-store' in directives or 'private' in directives or \
+            'no-store' in request_directives(request):
+        return False
+    if b'authorization' in request.headers and \
+            not any(d in directives for d in ('public', 's-maxage', 'must-revalidate')):
+        return False
+    if b'set-cookie' in response.headers or vary_names(response) is None:
+        return False
+    # Response must have been delimited, not by closing the connection
+    if code != 204 and b'content-length' not in response.headers and \
+            not response.is_chunked_encoded():
+        return False
+    date = parse_http_date(response.headers.get(b'date'))
+    return freshness_lifetime(response, directives, date or 0.0) is not None or \
+        b'etag' in response.headers or b'last-modified' in response.headers
+
+
+def weak_tag(tag: bytes) -> bytes:
+    """Returns entity tag for weak comparison i.e. without W/ prefix."""
+    tag = tag.strip()
+    return tag[2:] if tag.startswith(b'W/') else tag
+
+
+class CacheEntry:
+    """A stored response and metadata required to compute its freshness.
+
+    Body is stored decoded, hence entries are served with a Content-Length
+    irrespective of how the response was originally framed."""
+
+    __slots__ = (
+        'key', 'vary', 'line', 'headers', 'body',
+        'request_time', 'response_time', 'date', 'age', 'lifetime',
+        'directives',
+    )
+
+    def __init__(self, key: bytes, vary: Dict[str, str],
+                 line: bytes, headers: bytes, body: bytes,
+                 request_time: float, response_time: float,
+                 date: float, age: float, lifetime: float,
+                 directives: Directives) -> None:
+        self.key = key
+        self.vary = vary
+        # Status line and header lines (each terminated by CRLF) as stored
+        self.line = line
+        self.headers = headers
+        self.body = body
+        self.request_time = request_time
+        self.response_time = response_time
+        self.date = date
+        self.age = age
+        self.lifetime = lifetime
+        self.directives = directives
+
+    @classmethod
+    def from_response(cls, key: bytes, request: Optional[HttpParser], response: HttpParser,
+                      request_time: float, response_time: float) -> 'CacheEntry':
+        assert response.version and response.code
+        directives = parse_cache_control(response.headers.get_all(b'cache-control'))
+        date = parse_http_date(response.headers.get(b'date')) or response_time
+        age = delta_seconds(
+            (response.headers.get(b'age') or b'').decode(ENCODING)) or 0
+        lifetime = freshness_lifetime(response, directives, date)
+        headers = HttpHeaders()
+        hop_by_hop = list(HOP_BY_HOP_HEADERS)
+        for value in response.headers.get_all(b'connection'):
+            hop_by_hop.extend(n.strip().lower() for n in value.split(b','))
+        for name, value in response.headers.items():
+            if name.lower() not in hop_by_hop:
+                headers.add(name, value)
+        body = response.body or b''
+        if int(response.code) != 204:
+            headers.set(b'Content-Length', b'%d' % len(body))
+        line = WHITESPACE.join(
+            [response.version, response.code, response.reason or b''])
+        vary = vary_values(request, vary_names(response) or []) if request else {}
+        return cls(key, vary, line, headers.build(), body,
+                   request_time, response_time, date, float(age),
+                   0.0 if lifetime is None else lifetime, directives)
+
+    @property
+    def size(self) -> int:
+        return len(self.line) + len(self.headers) + len(self.body)
+
+    def header(self, name: bytes) -> Optional[bytes]:
+        for line in self.headers.split(CRLF):
+            n, _, value = line.partition(COLON)
+            if n.strip().lower() == name:
+                return value.strip()
+        return None
+
+    @property
+    def etag(self) -> Optional[bytes]:
+        return self.header(b'etag')
+
+    @property
+    def last_modified(self) -> Optional[bytes]:
+        return self.header(b'last-modified')
+
+    def conditional_headers(self) -> List[Tuple[bytes, bytes]]:
+        """Returns headers to validate this entry with upstream."""
+        headers = []
+        if self.etag is not None:
+            headers.append((b'If-None-Match', self.etag))
+        if self.last_modified is not None:
+            headers.append((b'If-Modified-Since', self.last_modified))
+        return headers
+
+    def not_modified(self, request: HttpParser) -> bool:
+        """Returns True if conditional request of a client is satisfied
+        by this entry, see RFC 9110 Section 13.1.2 and 13.1.3."""
+        if_none_match = request.headers.get(b'if-none-match')
+        if if_none_match is not None:
+            etag = self.etag
+            if etag is None:
+                return False
+            tags = [weak_tag(tag) for tag in if_none_match.split(b',')]
+            return b'*' in tags or weak_tag(etag) in tags
+        if_modified_since = parse_http_date(request.headers.get(b'if-modified-since'))
+        last_modified = parse_http_date(self.last_modified)
+        return if_modified_since is not None and last_modified is not None and \
+            last_modified <= if_modified_since
+
+    def matches(self, request: HttpParser) -> bool:
+        """Returns True if request selects this entry, see RFC 9111 Section 4.1."""
+        return not self.vary or \
+            vary_values(request, list(self.vary)) == self.vary
+
+    def current_age(self, now: float) -> float:
+        """See RFC 9111 Section 4.2.3."""
+        apparent_age = max(0.0, self.response_time - self.date)
+        response_delay = self.response_time - self.request_time
+        corrected_age_value = self.age + response_delay
+        corrected_initial_age = max(apparent_age, corrected_age_value)
+        resident_time = max(0.0, now - self.response_time)
+        return corrected_initial_age + resident_time
+
+    def is_fresh(self, directives: Directives, now: float) -> bool:
+        """Returns True if entry can be served without validation
+        for a request with given Cache-Control directives."""
+        if 'no-cache' in self.directives or 'no-cache' in directives:
+            return False
+        age = self.current_age(now)
+        max_age = delta_seconds(directives.get('max-age'))
+        if max_age is not None and age > max_age:
+            return False
+        lifetime = self.lifetime - \
+            (delta_seconds(directives.get('min-fresh')) or 0)
+        if lifetime > age:
+            return True
+        # Stale responses may only be served when client asked for them
+        if any(d in self.directives for d in
+               ('must-revalidate', 'proxy-revalidate', 's-maxage')):
+            return False
+        if 'max-stale' in directives:
+            max_stale = delta_seconds(directives['max-stale'])
+            return max_stale is None or age - self.lifetime <= max_stale
+        return False
+
+    def can_serve_stale(self, directive: str, directives: Directives, now: float) -> bool:
+        """Returns True if entry may be served stale under an explicit
+        stale-while-revalidate or stale-if-error grant, see RFC 5861.
+
+        Client may extend stale-if-error window through the same request directive."""
+        if 'no-cache' in directives or any(
+                d in self.directives for d in ('no-cache', 'must-revalidate', 'proxy-revalidate')):
+            return False
+        age = self.current_age(now)
+        max_age = delta_seconds(directives.get('max-age'))
+        if max_age is not None and age > max_age:
+            return False
+        windows = [delta_seconds(self.directives.get(directive))]
+        if directive == 'stale-if-error':
+            windows.append(delta_seconds(directives.get(directive)))
+        window = max((w for w in windows if w is not None), default=None)
+        return window is not None and age - self.lifetime <= window
+
+    def freshen(self, response: HttpParser,
+                request_time: float, response_time: float) -> 'CacheEntry':
+        """Returns entry with stored headers updated by a 304 response
+        received upon validation, see RFC 9111 Section 4.3.4."""
+        stored = HttpParser.response(self.line + CRLF + self.headers + CRLF)
+        updated = [
+            (name, value) for name, value in response.headers.items()
+            if name.lower() == b'age' or
+            name.lower() not in HOP_BY_HOP_HEADERS + (b'content-length',)
+        ]
+        for name in {name.lower() for name, _ in updated}:
+            stored.headers.remove(name)
+        for name, value in updated:
+            stored.headers.add(name, value)
+        stored.body = self.body
+        entry = CacheEntry.from_response(
+            self.key, None, stored, request_time, response_time)
+        entry.vary = self.vary
+        return entry
+
+    def build(self, now: float) -> bytes:
+        """Returns response to serve, with Age header set as of now."""
+        return b''.join([
+            self.line, CRLF,
+            b'Age: %d' % int(self.current_age(now)), CRLF,
+            self.headers, CRLF,
+            self.body,
+        ])
+
+    def build_not_modified(self, now: float) -> bytes:
+        """Returns a 304 response for this entry, with Age header set as of now."""
+        version = self.line.split(WHITESPACE, 1)[0]
+        headers = [
+            line + CRLF for line in self.headers.split(CRLF)
+            if line and line.partition(COLON)[0].strip().lower() != b'content-length'
+        ]
+        return b''.join([
+            version, b' 304 Not Modified', CRLF,
+            b'Age: %d' % int(self.current_age(now)), CRLF,
+        ] + headers + [CRLF])
+
+    def serialize(self) -> bytes:
+        meta: Dict[str, Any] = {
+            'key': self.key.decode(ENCODING),
+            'vary': self.vary,
+            'sizes': [len(self.line), len(self.headers), len(self.body)],
+            'request_time': self.request_time,
+            'response_time': self.response_time,
+            'date': self.date,
+            'age': self.age,
+            'lifetime': self.lifetime,
+            'directives': self.directives,
+        }
+        raw = json.dumps(meta).encode()
+        return struct.pack('!I', len(raw)) + raw + \
+            self.line + self.headers + self.body
+
+    @classmethod
+    def deserialize(cls, data: memoryview) -> 'CacheEntry':
+        size, = struct.unpack('!I', data[:4])
+        meta = json.loads(bytes(data[4:4 + size]))
+        offset = 4 + size
+        parts = []
+        for length in meta['sizes']:
+            parts.append(bytes(data[offset:offset + length]))
+            offset += length
+        return cls(meta['key'].encode(ENCODING), meta['vary'],
+                   parts[0], parts[1], parts[2],
+                   meta['request_time'], meta['response_time'],
+                   meta['date'], meta['age'], meta['lifetime'],
+                   meta['directives'])
+
+    @staticmethod
+    def pack(entries: List['CacheEntry']) -> bytes:
+        """Serializes all variants of a key into a single blob."""
+        blobs = [entry.serialize() for entry in entries]
+        return b''.join(struct.pack('!I', len(b)) + b for b in blobs)
+
+    @staticmethod
+    def unpack(data: Union[bytes, memoryview]) -> List['CacheEntry']:
+        entries, view, offset = [], memoryview(data), 0
+        while offset < len(view):
+            size, = struct.unpack('!I', view[offset:offset + 4])
+            offset += 4
+            entries.append(CacheEntry.deserialize(view[offset:offset + size]))
+            offset += size
+        return entries
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+"""
+    proxy.py
+    ~~~~~~~~
+    ⚡⚡⚡ Fast, Lightweight, Pluggable, TLS interception capable proxy server focused on
+    Network monitoring, controls & Application development, testing, debugging.
+
+    :copyright: (c) 2013-present by Abhinav Singh and contributors.
+    :license: BSD, see LICENSE for more details.
+"""
+import time
+import logging
+import threading
+from typing import Set
+
+from ...common.constants import DEFAULT_BUFFER_SIZE
+from ...common.utils import socket_connection, text_
+from ...http.parser import HttpParser, httpParserStates, httpParserTypes
+
+from .policy import CacheEntry
+from .store.shared import SharedCache
+
+logger = logging.getLogger(__name__)
+
+# Request headers which are not forwarded with background revalidation requests
+DROPPED_HEADERS = [
+    b'proxy-authorization', b'proxy-connection', b'connection', b'keep-alive',
+    b'if-none-match', b'if-modified-since', b'if-match', b'if-unmodified-since',
+    b'if-range', b'range',
+]
+
+
+class Revalidator:
+    """Revalidates stale cache entries with upstream in background threads,
+    used for stale-while-revalidate.
+
+    At most one revalidation per cache key is in flight within a process."""
+
+    def __init__(self, cache: SharedCache) -> None:
+        self.cache = cache
+        self.inflight: Set[bytes] = set()
+        self.lock = threading.Lock()
+
+    def revalidate(self, entry: CacheEntry, request: HttpParser) -> bool:
+        """Starts revalidation of entry, returns False if already in flight."""
+        assert request.host and request.port
+        with self.lock:
+            if entry.key in self.inflight:
+                return False
+            self.inflight.add(entry.key)
+        # Request parser is owned by the connection, hence send a copy
+        conditional = HttpParser.request(request.build())
+        conditional.del_headers(DROPPED_HEADERS)
+        conditional.add_headers(
+            entry.conditional_headers() + [(b'Connection', b'close')])
+        threading.Thread(
+            target=self.run,
+            args=(entry, conditional, text_(request.host), request.port),
+            daemon=True).start()
+        return True
+
+    def run(self, entry: CacheEntry, request: HttpParser, host: str, port: int) -> None:
+        try:
+            request_time = time.time()
+            response = self.fetch(request, host, port)
+            if response.state == httpParserStates.COMPLETE:
+                self.cache.update(entry.key, entry, request, response, request_time, time.time())
+        except Exception as e:
+            logger.info('Background revalidation of %s failed: %r', text_(entry.key), e)
+        finally:
+            with self.lock:
+                self.inflight.discard(entry.key)
+
+    def fetch(self, request: HttpParser, host: str, port: int) -> HttpParser:
+        response = HttpParser(httpParserTypes.RESPONSE_PARSER)
+        with socket_connection((host, port)) as conn:
+            conn.sendall(request.build())
+            while response.state != httpParserStates.COMPLETE:
+                data = conn.recv(DEFAULT_BUFFER_SIZE)
+                if not data:
+                    break
+                response.parse(data)
+        return response
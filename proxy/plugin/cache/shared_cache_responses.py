@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+"""
+    proxy.py
+    ~~~~~~~~
+    ⚡⚡⚡ Fast, Lightweight, Pluggable, TLS interception capable proxy server focused on
+    Network monitoring, controls & Application development, testing, debugging.
+
+    :copyright: (c) 2013-present by Abhinav Singh and contributors.
+    :license: BSD, see LICENSE for more details.
+"""
+import os
+import socket
+import threading
+from typing import Any, List, Optional, Tuple
+
+from ...common.types import Readables
+
+from .store.memory import InMemoryCacheTier
+from .store.segment import SegmentCacheTier
+from .store.shared import CacheCounters, SharedCache, SharedCacheStore
+from .base import BaseCacheResponsesPlugin
+from .revalidate import Revalidator
+
+
+class SharedCacheResponsesPlugin(BaseCacheResponsesPlugin):
+    """Caches upstream responses following HTTP caching semantics
+    of a shared cache (RFC 9111) and serves fresh responses out of
+    the cache without contacting upstream.
+
+    Cache is shared by all connections of a process.  Entries
+    are kept in an in-memory LRU tier of --cache-memory-size bytes,
+    written through to segment files under --cache-dir, of at most
+    --cache-disk-size bytes, which are shared by all processes.
+
+    Stale entries are revalidated with upstream.  Entries within their
+    stale-while-revalidate window are served right away while being
+    revalidated in background.
+
+    Identical requests for a response being fetched from upstream are
+    collapsed onto that fetch and receive its response as it streams in."""
+
+    # Hit / miss / byte counters across all processes
+    counters = CacheCounters()
+
+    cache: Optional[SharedCache] = None
+    revalidator: Optional[Revalidator] = None
+    lock = threading.Lock()
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        with SharedCacheResponsesPlugin.lock:
+            if SharedCacheResponsesPlugin.cache is None:
+                SharedCacheResponsesPlugin.cache = SharedCache(
+                    InMemoryCacheTier(self.flags.cache_memory_size),
+                    SegmentCacheTier(
+                        os.path.join(self.flags.cache_dir, 'proxy.py-cache'),
+                        max_size=self.flags.cache_disk_size,
+                        segment_size=self.flags.cache_segment_size),
+                    SharedCacheResponsesPlugin.counters)
+                SharedCacheResponsesPlugin.revalidator = Revalidator(
+                    SharedCacheResponsesPlugin.cache)
+        self.set_store(SharedCacheStore(
+            uid=self.uid,
+            cache=SharedCacheResponsesPlugin.cache,
+            max_object_size=self.flags.cache_max_object_size,
+            revalidator=SharedCacheResponsesPlugin.revalidator))
+
+    def get_descriptors(
+            self) -> Tuple[List[socket.socket], List[socket.socket]]:
+        assert isinstance(self.store, SharedCacheStore)
+        if self.store.waiter is None:
+            return [], []
+        return [self.store.waiter.reader], []
+
+    def read_from_descriptors(self, r: Readables) -> bool:
+        assert isinstance(self.store, SharedCacheStore)
+        if self.store.waiter is None or self.store.waiter.reader not in r:
+            return False
+        chunks = self.store.receive()
+        if chunks is None:
+            return True
+        for chunk in chunks:
+            self.client.queue(chunk)
+        return False
+
+    def on_client_connection_close(self) -> None:
+        assert self.store
+        self.store.close()
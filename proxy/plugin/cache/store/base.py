@@ -8,17 +8,62 @@
     :copyright: (c) 2013-present by Abhinav Singh and contributors.
     :license: BSD, see LICENSE for more details.
 """
+import re
 from abc import ABC, abstractmethod
 from typing import Optional
 from uuid import UUID
+
+from ....common.constants import DEFAULT_HTTP_PORT
+from ....http.methods import httpMethods
 from ....http.parser import HttpParser
 
+DEFAULT_PORTS = {b'http': DEFAULT_HTTP_PORT, b'https': 443}
+
+# Percent encoded octets of unreserved characters, see RFC 3986 Section 6.2.2
+PERCENT_ENCODED = re.compile(b'%([0-9a-fA-F]{2})')
+UNRESERVED = frozenset(
+    b'abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789-._~')
+
 
 class CacheStore(ABC):
 
     def __init__(self, uid: UUID) -> None:
         self.uid = uid
 
+    def cache_key(self, request: HttpParser) -> Optional[bytes]:
+        """Returns normalized cache key for request, None if request
+        has no upstream server or is a CONNECT request.
+
+        Scheme and host are lowercased, default port is omitted,
+        fragment is dropped and percent encodings are normalized."""
+        if not request.has_upstream_server() or request.url is None or \
+                request.method == httpMethods.CONNECT:
+            return None
+        assert request.host
+        scheme = (request.url.scheme or b'http').lower()
+        host = request.host.lower()
+        if b':' in host:
+            host = b'[' + host + b']'
+        if request.port and request.port != DEFAULT_PORTS.get(scheme):
+            host += b':%d' % request.port
+        target = request.url.path or b'/'
+        if request.url.query:
+            target += b'?' + request.url.query
+        return scheme + b'://' + host + \
+            PERCENT_ENCODED.sub(CacheStore.normalize_octet, target)
+
+    @staticmethod
+    def normalize_octet(match: 're.Match[bytes]') -> bytes:
+        octet = int(match.group(1), 16)
+        return bytes([octet]) if octet in UNRESERVED else match.group(0).upper()
+
+    def cached_response(self, request: HttpParser) -> Optional[memoryview]:
+        """Returns response to serve for request from the store, if any.
+
+        When a response is returned, upstream connection is not
+        established and the response is queued for the client as-is."""
+        return None
+
     @abstractmethod
     def open(self, request: HttpParser) -> None:
         pass
@@ -8,16 +8,18 @@
     :copyright: (c) 2013-present by Abhinav Singh and contributors.
     :license: BSD, see LICENSE for more details.
 """
+import hashlib
 import logging
 import os
 import tempfile
-from typing import Optional, BinaryIO
+from typing import List, Optional, BinaryIO
 from uuid import UUID
 
 from ....common.flag import flags
 from ....common.utils import text_
 from ....http.parser import HttpParser
 
+from ..policy import CacheEntry
 from .base import CacheStore
 
 logger = logging.getLogger(__name__)
@@ -57,3 +59,46 @@ class OnDiskCacheStore(CacheStore):
         if self.cache_file:
             self.cache_file.close()
             logger.info('Cached response at %s', self.cache_file_path)
+
+
+class OnDiskCacheTier:
+    """Stores all variants of a cache key in a file named
+    after hash of the key, within cache_dir.
+
+    Files are replaced atomically, hence are safe to be
+    read and written concurrently by multiple processes."""
+
+    def __init__(self, cache_dir: str) -> None:
+        self.cache_dir = cache_dir
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def path(self, key: bytes) -> str:
+        return os.path.join(self.cache_dir, hashlib.sha256(key).hexdigest())
+
+    def get(self, key: bytes) -> Optional[List[CacheEntry]]:
+        try:
+            with open(self.path(key), 'rb') as f:
+                entries = CacheEntry.unpack(f.read())
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning('Unable to read cache entry for %s: %r', text_(key), e)
+            return None
+        # Guard against (unlikely) hash collisions
+        return [entry for entry in entries if entry.key == key] or None
+
+    def put(self, key: bytes, entries: List[CacheEntry]) -> None:
+        path = self.path(key)
+        try:
+            with tempfile.NamedTemporaryFile(
+                    dir=self.cache_dir, prefix='.', delete=False) as f:
+                f.write(CacheEntry.pack(entries))
+            os.replace(f.name, path)
+        except OSError as e:
+            logger.warning('Unable to write cache entry for %s: %r', text_(key), e)
+
+    def delete(self, key: bytes) -> None:
+        try:
+            os.unlink(self.path(key))
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+"""
+    proxy.py
+    ~~~~~~~~
+    ⚡⚡⚡ Fast, Lightweight, Pluggable, TLS interception capable proxy server focused on
+    Network monitoring, controls & Application development, testing, debugging.
+
+    :copyright: (c) 2013-present by Abhinav Singh and contributors.
+    :license: BSD, see LICENSE for more details.
+"""
+import threading
+from collections import OrderedDict
+from typing import List, Optional
+
+from ..policy import CacheEntry
+
+
+class InMemoryCacheTier:
+    """Size bounded LRU of cache entries.
+
+    All variants of a key are kept together and accounted
+    for as a whole.  Least recently used keys are evicted
+    once total size grows beyond max_size bytes."""
+
+    def __init__(self, max_size: int) -> None:
+        self.max_size = max_size
+        self.size = 0
+        self.entries: 'OrderedDict[bytes, List[CacheEntry]]' = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key: bytes) -> Optional[List[CacheEntry]]:
+        with self.lock:
+            entries = self.entries.get(key)
+            if entries is not None:
+                self.entries.move_to_end(key)
+            return entries
+
+    def put(self, key: bytes, entries: List[CacheEntry]) -> None:
+        size = sum(entry.size for entry in entries)
+        with self.lock:
+            self._delete(key)
+            if size > self.max_size:
+                return
+            self.entries[key] = entries
+            self.size += size
+            while self.size > self.max_size:
+                _, evicted = self.entries.popitem(last=False)
+                self.size -= sum(entry.size for entry in evicted)
+
+    def delete(self, key: bytes) -> None:
+        with self.lock:
+            self._delete(key)
+
+    def _delete(self, key: bytes) -> None:
+        entries = self.entries.pop(key, None)
+        if entries is not None:
+            self.size -= sum(entry.size for entry in entries)
@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+"""
+    proxy.py
+    ~~~~~~~~
+    ⚡⚡⚡ Fast, Lightweight, Pluggable, TLS interception capable proxy server focused on
+    Network monitoring, controls & Application development, testing, debugging.
+
+    :copyright: (c) 2013-present by Abhinav Singh and contributors.
+    :license: BSD, see LICENSE for more details.
+"""
+import time
+import hashlib
+import logging
+from typing import Optional
+from uuid import UUID
+
+from ....common.constants import CRLF
+from ....common.flag import flags
+from ....common.utils import build_http_response, text_
+from ....http.codes import httpStatusCodes
+from ....http.parser import HttpParser, httpParserStates, httpParserTypes
+
+from ..policy import CacheEntry
+from .base import CacheStore
+from .segment import SegmentCacheTier
+
+logger = logging.getLogger(__name__)
+
+
+flags.add_argument(
+    '--cache-offline',
+    action='store_true',
+    default=False,
+    help='Default: False.  Whether requests without a recorded response '
+    'must fail with 504 Gateway Timeout instead of being recorded.  '
+    'Flag only applicable when cache plugin replays recorded responses.'
+)
+
+
+class ReplayCacheStore(CacheStore):
+    """Records upstream responses into an archive and replays
+    them for identical requests without contacting upstream.
+
+    Responses are archived under method, normalized cache key
+    and digest of request body, if any, irrespective of any
+    caching headers.  When offline, requests without a recorded
+    response are answered with 504 Gateway Timeout."""
+
+    def __init__(self, uid: UUID, archive: SegmentCacheTier, offline: bool = False) -> None:
+        super().__init__(uid)
+        self.archive = archive
+        self.offline = offline
+        self.key: Optional[bytes] = None
+        self.request: Optional[HttpParser] = None
+        self.response: Optional[HttpParser] = None
+        self.request_time = 0.0
+
+    def replay_key(self, request: HttpParser) -> Optional[bytes]:
+        key = self.cache_key(request)
+        if key is None or request.method is None:
+            return None
+        key = request.method + b' ' + key
+        if request.body:
+            key += b' ' + hashlib.sha256(request.body).hexdigest().encode()
+        return key
+
+    def cached_response(self, request: HttpParser) -> Optional[memoryview]:
+        key = self.replay_key(request)
+        if key is None:
+            return None
+        entries = self.archive.get(key)
+        if entries is not None:
+            logger.debug('Replaying response for %s', text_(key))
+            entry = entries[0]
+            return memoryview(entry.line + CRLF + entry.headers + CRLF + entry.body)
+        if self.offline:
+            logger.info('No recorded response for %s', text_(key))
+            return memoryview(build_http_response(
+                httpStatusCodes.GATEWAY_TIMEOUT,
+                reason=b'Gateway Timeout',
+                headers={b'Content-Length': b'0'}))
+        return None
+
+    def open(self, request: HttpParser) -> None:
+        self.close()
+        self.key = self.replay_key(request)
+        if self.key is None:
+            return
+        self.request = request
+        self.response = HttpParser(httpParserTypes.RESPONSE_PARSER)
+        self.request_time = time.time()
+
+    def cache_request(self, request: HttpParser) -> Optional[HttpParser]:
+        return request
+
+    def cache_response_chunk(self, chunk: memoryview) -> memoryview:
+        if self.response is None:
+            return chunk
+        assert self.key
+        try:
+            self.response.parse(chunk.tobytes())
+        except Exception as e:
+            logger.info('Not recording response for %s: %r', text_(self.key), e)
+            self.response = None
+            return chunk
+        if self.response.state == httpParserStates.COMPLETE:
+            self.archive.put(self.key, [CacheEntry.from_response(
+                self.key, self.request, self.response, self.request_time, time.time())])
+            logger.debug('Recorded response for %s', text_(self.key))
+            self.response = None
+        return chunk
+
+    def close(self) -> None:
+        self.key = None
+        self.request = None
+        self.response = None
@@ -0,0 +1,349 @@
+# -*- coding: utf-8 -*-
+"""
+    proxy.py
+    ~~~~~~~~
+    ⚡⚡⚡ Fast, Lightweight, Pluggable, TLS interception capable proxy server focused on
+    Network monitoring, controls & Application development, testing, debugging.
+
+    :copyright: (c) 2013-present by Abhinav Singh and contributors.
+    :license: BSD, see LICENSE for more details.
+"""
+import os
+import mmap
+import time
+import struct
+import hashlib
+import logging
+import threading
+import contextlib
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from ....common.constants import DEFAULT_CACHE_DISK_SIZE, DEFAULT_CACHE_SEGMENT_SIZE
+from ....common.flag import flags
+from ....common.utils import text_
+
+from ..policy import CacheEntry
+
+try:
+    import fcntl
+except ImportError:     # pragma: no cover
+    # Windows, index is then only safe to share between threads
+    fcntl = None    # type: ignore
+
+logger = logging.getLogger(__name__)
+
+
+flags.add_argument(
+    '--cache-disk-size',
+    type=int,
+    default=DEFAULT_CACHE_DISK_SIZE,
+    help='Default: 1 GB.  Maximum size in bytes of on-disk cache segments.  '
+    'Flag only applicable when shared cache plugin is used.'
+)
+
+flags.add_argument(
+    '--cache-segment-size',
+    type=int,
+    default=DEFAULT_CACHE_SEGMENT_SIZE,
+    help='Default: 64 MB.  Size in bytes of on-disk cache segment files.  '
+    'Flag only applicable when shared cache plugin is used.'
+)
+
+MAGIC = b'PPC2'
+
+# magic, slot count, oldest segment, active segment, used slots, tombstones, bytes on disk
+HEADER = struct.Struct('!4sIIIIIQ')
+# key hash, segment, offset, record length, write time, last access time
+SLOT = struct.Struct('!QIIIdd')
+# key length, packed entries length
+RECORD = struct.Struct('!II')
+
+EMPTY = 0
+TOMBSTONE = 1
+
+INDEX_SLOTS = 1 << 16
+# Index is rehashed, or least recently used records dropped,
+# once this fraction of slots is taken
+MAX_LOAD = 0.75
+# Segments with less than this fraction of live bytes are compacted
+COMPACTION_RATIO = 0.5
+
+
+class SegmentCacheTier:
+    """Stores all variants of a cache key as a record appended to
+    memory-mapped segment files within cache_dir.
+
+    Records are located through an open addressing hash index, itself
+    a memory-mapped file, shared by all processes.  Index updates and
+    appends are serialized across processes with an exclusive lock on
+    the index file, lookups take a shared lock.
+
+    Whenever a segment fills up and the next one is started:
+
+    - Segments mostly made up of overwritten or deleted records are
+      compacted, i.e. live records are moved into the active segment
+      and the segment is removed.
+    - While segments take more than max_size bytes, oldest segment is
+      evicted.  Its records which have been used since they were
+      written get a second chance, i.e. are moved into the active
+      segment, the rest are dropped."""
+
+    def __init__(self, cache_dir: str,
+                 max_size: int = DEFAULT_CACHE_DISK_SIZE,
+                 segment_size: int = DEFAULT_CACHE_SEGMENT_SIZE,
+                 slots: int = INDEX_SLOTS) -> None:
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+        self.segment_size = segment_size
+        self.slots = slots
+        self.limit = int(slots * MAX_LOAD)
+        # Descriptor locks are per process, threads need their own lock
+        self.lock = threading.Lock()
+        self.mappings: Dict[int, mmap.mmap] = {}
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self.fd = os.open(os.path.join(cache_dir, 'index'), os.O_RDWR | os.O_CREAT, 0o600)
+        size = HEADER.size + slots * SLOT.size
+        with self.locked(exclusive=True):
+            if os.fstat(self.fd).st_size != size or \
+                    HEADER.unpack(os.pread(self.fd, HEADER.size, 0))[:2] != (MAGIC, slots):
+                self.reset(size)
+            self.index = mmap.mmap(self.fd, size)
+
+    def reset(self, size: int) -> None:
+        """Initializes an empty index, discarding any existing segments."""
+        for name in os.listdir(self.cache_dir):
+            if name.startswith('segment-'):
+                os.unlink(os.path.join(self.cache_dir, name))
+        os.ftruncate(self.fd, 0)
+        os.ftruncate(self.fd, size)
+        os.pwrite(self.fd, HEADER.pack(MAGIC, self.slots, 0, 0, 0, 0, 0), 0)
+
+    @contextlib.contextmanager
+    def locked(self, exclusive: bool) -> Iterator[None]:
+        with self.lock:
+            if fcntl is not None:
+                fcntl.flock(self.fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(self.fd, fcntl.LOCK_UN)
+
+    def get(self, key: bytes) -> Optional[List[CacheEntry]]:
+        with self.locked(exclusive=False):
+            i = self.find(key)
+            if i is None:
+                return None
+            _, segment, offset, length, _, _ = self.slot(i)
+            # Best effort, concurrent lookups may race on access time
+            struct.pack_into('!d', self.index, self.position(i) + SLOT.size - 8, time.time())
+            try:
+                record = self.read(segment, offset, length)
+            except (OSError, ValueError) as e:
+                logger.warning('Unable to read cache entry for %s: %r', text_(key), e)
+                return None
+        klen, _ = RECORD.unpack_from(record)
+        if record[RECORD.size:RECORD.size + klen] != key:
+            return None
+        try:
+            entries = CacheEntry.unpack(record[RECORD.size + klen:])
+        except ValueError as e:
+            logger.warning('Unable to read cache entry for %s: %r', text_(key), e)
+            return None
+        return [entry for entry in entries if entry.key == key] or None
+
+    def put(self, key: bytes, entries: List[CacheEntry]) -> None:
+        payload = CacheEntry.pack(entries)
+        record = RECORD.pack(len(key), len(payload)) + key + payload
+        with self.locked(exclusive=True):
+            i = self.find(key)
+            if i is not None:
+                self.unlink(i)
+            if len(record) > self.segment_size:
+                return
+            try:
+                active = self.header()[3]
+                segment, offset = self.append(record)
+                now = time.time()
+                self.insert(self.hash(key), segment, offset, len(record), now, now)
+                if segment != active:
+                    self.maintain()
+            except OSError as e:
+                logger.warning('Unable to write cache entry for %s: %r', text_(key), e)
+
+    def delete(self, key: bytes) -> None:
+        with self.locked(exclusive=True):
+            i = self.find(key)
+            if i is not None:
+                self.unlink(i)
+
+    @property
+    def size(self) -> int:
+        """Bytes taken by segment files, including dead records."""
+        return int(self.header()[6])
+
+    def __len__(self) -> int:
+        return int(self.header()[4])
+
+    #
+    # Index, callers must hold the lock
+    #
+
+    def header(self) -> Tuple[Any, ...]:
+        return HEADER.unpack_from(self.index)
+
+    def update_header(self, **fields: int) -> None:
+        names = ('magic', 'slots', 'first', 'active', 'used', 'tombstones', 'disk')
+        values = dict(zip(names, self.header()))
+        values.update(fields)
+        HEADER.pack_into(self.index, 0, *[values[name] for name in names])
+
+    def position(self, i: int) -> int:
+        return HEADER.size + i * SLOT.size
+
+    def slot(self, i: int) -> Tuple[Any, ...]:
+        return SLOT.unpack_from(self.index, self.position(i))
+
+    @staticmethod
+    def hash(key: bytes) -> int:
+        return max(
+            int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), 'big'),
+            TOMBSTONE + 1)
+
+    def probe(self, h: int) -> Iterator[int]:
+        start = h % self.slots
+        for n in range(self.slots):
+            yield (start + n) % self.slots
+
+    def find(self, key: bytes) -> Optional[int]:
+        """Returns slot of key, guarding against hash collisions
+        by comparing key of the record."""
+        h = self.hash(key)
+        for i in self.probe(h):
+            slot = self.slot(i)
+            if slot[0] == EMPTY:
+                return None
+            if slot[0] == h and self.record_key(slot[1], slot[2]) == key:
+                return i
+        return None
+
+    def insert(self, h: int, segment: int, offset: int, length: int,
+               written: float, used_at: float) -> None:
+        _, _, _, _, used, tombstones, _ = self.header()
+        if used + tombstones >= self.limit:
+            self.rehash()
+            used, tombstones = self.header()[4:6]
+        if used >= self.limit:
+            self.unlink(min(self.live(), key=lambda i: self.slot(i)[5]))
+            used, tombstones = self.header()[4:6]
+        for i in self.probe(h):
+            kind = self.slot(i)[0]
+            if kind in (EMPTY, TOMBSTONE):
+                SLOT.pack_into(
+                    self.index, self.position(i), h, segment, offset, length, written, used_at)
+                self.update_header(
+                    used=used + 1,
+                    tombstones=tombstones - 1 if kind == TOMBSTONE else tombstones)
+                return
+
+    def unlink(self, i: int) -> None:
+        SLOT.pack_into(self.index, self.position(i), TOMBSTONE, 0, 0, 0, 0.0, 0.0)
+        _, _, _, _, used, tombstones, _ = self.header()
+        self.update_header(used=used - 1, tombstones=tombstones + 1)
+
+    def live(self) -> List[int]:
+        return [i for i in range(self.slots) if self.slot(i)[0] > TOMBSTONE]
+
+    def rehash(self) -> None:
+        """Rebuilds index without tombstones."""
+        slots = [self.slot(i) for i in self.live()]
+        self.index[HEADER.size:] = bytes(self.slots * SLOT.size)
+        self.update_header(used=0, tombstones=0)
+        for slot in slots:
+            self.insert(*slot)
+
+    #
+    # Segments, callers must hold the lock
+    #
+
+    def path(self, segment: int) -> str:
+        return os.path.join(self.cache_dir, 'segment-%08d' % segment)
+
+    def append(self, record: bytes) -> Tuple[int, int]:
+        """Appends record to active segment, starting next segment if full."""
+        _, _, _, active, _, _, disk = self.header()
+        try:
+            offset = os.stat(self.path(active)).st_size
+        except FileNotFoundError:
+            offset = 0
+        if offset > 0 and offset + len(record) > self.segment_size:
+            active, offset = active + 1, 0
+        with open(self.path(active), 'ab') as f:
+            f.write(record)
+        self.update_header(active=active, disk=disk + len(record))
+        return active, offset
+
+    def read(self, segment: int, offset: int, length: int) -> memoryview:
+        mapping = self.mappings.get(segment)
+        if mapping is None or offset + length > len(mapping):
+            # Segment has grown since it was mapped
+            with open(self.path(segment), 'rb') as f:
+                mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self.mappings[segment] = mapping
+        return memoryview(mapping)[offset:offset + length]
+
+    def record_key(self, segment: int, offset: int) -> Optional[bytes]:
+        try:
+            view = self.read(segment, offset, RECORD.size)
+            klen, _ = RECORD.unpack(view)
+            return self.read(segment, offset + RECORD.size, klen).tobytes()
+        except (OSError, ValueError, struct.error):
+            return None
+
+    def remove(self, segment: int) -> None:
+        """Removes segment file, which must no longer be referenced by index."""
+        self.mappings.pop(segment, None)
+        try:
+            size = os.stat(self.path(segment)).st_size
+            os.unlink(self.path(segment))
+        except FileNotFoundError:
+            return
+        self.update_header(disk=self.header()[6] - size)
+
+    def relocate(self, slots: List[int]) -> None:
+        """Moves records of slots into the active segment."""
+        for i in slots:
+            h, segment, offset, length, _, used_at = self.slot(i)
+            record = self.read(segment, offset, length).tobytes()
+            segment, offset = self.append(record)
+            SLOT.pack_into(
+                self.index, self.position(i), h, segment, offset, length, time.time(), used_at)
+
+    def maintain(self) -> None:
+        """Compacts sparse segments and evicts oldest segments beyond max_size."""
+        _, _, first, active, _, _, _ = self.header()
+        by_segment: Dict[int, List[int]] = {}
+        for i in self.live():
+            by_segment.setdefault(self.slot(i)[1], []).append(i)
+        for segment in range(first, active):
+            if not os.path.exists(self.path(segment)):
+                continue
+            slots = by_segment.get(segment, [])
+            live = sum(self.slot(i)[3] for i in slots)
+            if live < os.stat(self.path(segment)).st_size * COMPACTION_RATIO:
+                logger.debug('Compacting cache segment %d', segment)
+                self.relocate(slots)
+                self.remove(segment)
+        while self.header()[6] > self.max_size and first < self.header()[3]:
+            slots = [i for i in self.live() if self.slot(i)[1] == first]
+            recent = [i for i in slots if self.slot(i)[5] > self.slot(i)[4]]
+            dropped = set(slots) - set(recent)
+            logger.debug(
+                'Evicting cache segment %d, keeping %d of %d records',
+                first, len(recent), len(slots))
+            for i in dropped:
+                self.unlink(i)
+            self.relocate(recent)
+            self.remove(first)
+            first += 1
+        self.update_header(first=first)
@@ -0,0 +1,440 @@
+# -*- coding: utf-8 -*-
+"""
+    proxy.py
+    ~~~~~~~~
+    ⚡⚡⚡ Fast, Lightweight, Pluggable, TLS interception capable proxy server focused on
+    Network monitoring, controls & Application development, testing, debugging.
+
+    :copyright: (c) 2013-present by Abhinav Singh and contributors.
+    :license: BSD, see LICENSE for more details.
+"""
+import time
+import logging
+import threading
+import multiprocessing
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Union
+from uuid import UUID
+
+from ....common.constants import DEFAULT_CACHE_MAX_OBJECT_SIZE, DEFAULT_CACHE_MEMORY_SIZE
+from ....common.flag import flags
+from ....common.utils import build_http_response, text_
+from ....http.codes import httpStatusCodes
+from ....http.methods import httpMethods
+from ....http.parser import HttpParser, HttpParserLimits, httpParserStates, httpParserTypes
+
+from ..collapse import CollapsedFetch, Waiter, waiterStates
+from ..policy import ERROR_CODES, CacheEntry, Directives, is_storable, parse_cache_control, \
+    request_directives
+from .base import CacheStore
+from .disk import OnDiskCacheTier
+from .segment import SegmentCacheTier
+from .memory import InMemoryCacheTier
+
+if TYPE_CHECKING:   # pragma: no cover
+    from ..revalidate import Revalidator
+
+logger = logging.getLogger(__name__)
+
+
+flags.add_argument(
+    '--cache-memory-size',
+    type=int,
+    default=DEFAULT_CACHE_MEMORY_SIZE,
+    help='Default: 64 MB.  Maximum size in bytes of in-memory cache tier '
+    'per process.  Flag only applicable when shared cache plugin is used.'
+)
+
+flags.add_argument(
+    '--cache-max-object-size',
+    type=int,
+    default=DEFAULT_CACHE_MAX_OBJECT_SIZE,
+    help='Default: 8 MB.  Responses with a body larger than this '
+    'are not cached.  Flag only applicable when shared cache plugin is used.'
+)
+
+# Methods which invalidate stored responses for target uri, see RFC 9111 Section 4.4
+UNSAFE_METHODS = (
+    httpMethods.POST, httpMethods.PUT, httpMethods.DELETE, httpMethods.PATCH,
+)
+
+# Maximum number of Vary variants kept per cache key
+MAX_VARIANTS = 8
+
+
+class CacheCounters:
+    """Hit, miss and byte counters shared by all worker processes."""
+
+    NAMES = (
+        'hits', 'stale_hits', 'misses', 'stores', 'invalidations',
+        'revalidations', 'not_modified', 'collapsed', 'bytes_served', 'bytes_stored',
+    )
+
+    def __init__(self) -> None:
+        self.values: Dict[str, Any] = {
+            name: multiprocessing.Value('Q', 0) for name in CacheCounters.NAMES
+        }
+
+    def incr(self, name: str, by: int = 1) -> None:
+        value = self.values[name]
+        with value.get_lock():
+            value.value += by
+
+    def snapshot(self) -> Dict[str, int]:
+        return {name: int(value.value) for name, value in self.values.items()}
+
+    def reset(self) -> None:
+        for value in self.values.values():
+            with value.get_lock():
+                value.value = 0
+
+
+class SharedCache:
+    """Shared HTTP cache, an in-memory LRU tier in front of an optional disk tier.
+
+    Entries are written through to both tiers.  Lookups are served
+    from memory when possible, entries found only on disk (e.g. written
+    by another process) are promoted into the memory tier."""
+
+    def __init__(
+            self,
+            memory: InMemoryCacheTier,
+            disk: Optional[Union[OnDiskCacheTier, SegmentCacheTier]] = None,
+            counters: Optional[CacheCounters] = None) -> None:
+        self.memory = memory
+        self.disk = disk
+        self.counters = counters if counters is not None else CacheCounters()
+        # Upstream fetches in flight within this process
+        self.fetches: Dict[bytes, CollapsedFetch] = {}
+        self.lock = threading.Lock()
+
+    def variants(self, key: bytes) -> List[CacheEntry]:
+        entries = self.memory.get(key)
+        if entries is None and self.disk is not None:
+            entries = self.disk.get(key)
+            if entries is not None:
+                self.memory.put(key, entries)
+        return entries or []
+
+    def lookup(self, key: bytes, request: HttpParser) -> Optional[CacheEntry]:
+        """Returns stored response selected by request, fresh or not."""
+        for entry in self.variants(key):
+            if entry.matches(request):
+                return entry
+        return None
+
+    def store(self, entry: CacheEntry) -> None:
+        """Stores entry, replacing variant selected by the same request headers.
+
+        All variants are dropped when response nominates different
+        Vary headers than stored variants."""
+        entries = [
+            e for e in self.variants(entry.key)
+            if list(e.vary) == list(entry.vary) and e.vary != entry.vary
+        ]
+        entries = [entry] + entries[:MAX_VARIANTS - 1]
+        self.memory.put(entry.key, entries)
+        if self.disk is not None:
+            self.disk.put(entry.key, entries)
+        self.counters.incr('stores')
+        self.counters.incr('bytes_stored', entry.size)
+
+    def update(self, key: bytes, stale: Optional[CacheEntry], request: HttpParser, response: HttpParser,
+               request_time: float, response_time: float) -> Optional[CacheEntry]:
+        """Updates cache with a complete upstream response for request.
+
+        A 304 response freshens the stale entry it validated, other
+        responses are stored if permitted.  Returns the updated entry."""
+        if stale is not None and response.code is not None and \
+                response.code.isdigit() and int(response.code) == httpStatusCodes.NOT_MODIFIED:
+            entry = stale.freshen(response, request_time, response_time)
+            self.counters.incr('not_modified')
+        else:
+            directives: Directives = parse_cache_control(
+                response.headers.get_all(b'cache-control'))
+            if not is_storable(request, response, directives):
+                return None
+            entry = CacheEntry.from_response(
+                key, request, response, request_time, response_time)
+        self.store(entry)
+        return entry
+
+    def begin(self, key: bytes, request: HttpParser, max_size: int) -> Optional[CollapsedFetch]:
+        """Registers an upstream fetch for key, which identical requests
+        can attach to.  Returns None if a fetch is already in flight."""
+        with self.lock:
+            fetch = self.fetches.get(key)
+            if fetch is not None and fetch.accepting and not fetch.done:
+                return None
+            fetch = CollapsedFetch(key, request, max_size)
+            self.fetches[key] = fetch
+            return fetch
+
+    def attach(self, key: bytes, request: HttpParser) -> Optional[Waiter]:
+        """Attaches request to upstream fetch in flight for key, if any."""
+        with self.lock:
+            fetch = self.fetches.get(key)
+        if fetch is None:
+            return None
+        waiter = fetch.attach(request)
+        if waiter is not None:
+            self.counters.incr('collapsed')
+        return waiter
+
+    def end(self, fetch: CollapsedFetch) -> None:
+        fetch.finish()
+        with self.lock:
+            if self.fetches.get(fetch.key) is fetch:
+                del self.fetches[fetch.key]
+
+    def invalidate(self, key: bytes) -> None:
+        self.memory.delete(key)
+        if self.disk is not None:
+            self.disk.delete(key)
+        self.counters.incr('invalidations')
+
+
+class SharedCacheStore(CacheStore):
+    """CacheStore which serves fresh responses out of a SharedCache
+    and stores cacheable upstream responses into it.
+
+    Upstream responses are parsed as they stream through, to
+    find out whether they can be stored once complete.
+
+    Stale entries are validated with upstream using a conditional
+    request, a 304 Not Modified response is then turned into the
+    refreshed stored response.  Stale entries are served right away
+    under stale-while-revalidate when a revalidator is available,
+    and in place of upstream errors under stale-if-error.
+
+    Identical requests arriving while an upstream fetch is in flight
+    attach to it as waiters, instead of connecting upstream on their own.
+    Waiters are driven by the event loop via waiter.reader, see receive."""
+
+    def __init__(self, uid: UUID, cache: SharedCache,
+                 max_object_size: int = DEFAULT_CACHE_MAX_OBJECT_SIZE,
+                 revalidator: Optional['Revalidator'] = None) -> None:
+        super().__init__(uid)
+        self.cache = cache
+        self.max_object_size = max_object_size
+        self.revalidator = revalidator
+        self.key: Optional[bytes] = None
+        self.request: Optional[HttpParser] = None
+        self.response: Optional[HttpParser] = None
+        self.request_time: float = 0
+        self.invalidate = False
+        # Stale entry selected by the request, if any
+        self.stale: Optional[CacheEntry] = None
+        # True when conditional request was sent on behalf of the client
+        self.validating = False
+        # Upstream chunks held back until response status is known
+        self.pending: List[bytes] = []
+        # Fetch led by this store and fetch this store is waiting upon
+        self.fetch: Optional[CollapsedFetch] = None
+        self.waiter: Optional[Waiter] = None
+
+    def cached_response(self, request: HttpParser) -> Optional[memoryview]:
+        """Returns an empty response when request has been attached to
+        an in-flight fetch, response is then streamed by receive."""
+        self.stale = None
+        self.detach()
+        if request.method != httpMethods.GET:
+            return None
+        key = self.cache_key(request)
+        if key is None:
+            return None
+        directives = request_directives(request)
+        entry = self.cache.lookup(key, request)
+        now = time.time()
+        if entry is not None:
+            if entry.is_fresh(directives, now):
+                logger.debug('Cache hit for %s', text_(key))
+                return self.serve(entry, request, now, 'hits')
+            if self.revalidator is not None and \
+                    entry.can_serve_stale('stale-while-revalidate', directives, now):
+                logger.debug('Serving stale %s while revalidating', text_(key))
+                self.revalidator.revalidate(entry, request)
+                return self.serve(entry, request, now, 'stale_hits')
+            self.stale = entry
+        if self.collapsible(request):
+            self.waiter = self.cache.attach(key, request)
+            if self.waiter is not None:
+                logger.debug('Collapsed request for %s', text_(key))
+                return memoryview(b'')
+        self.cache.counters.incr('misses')
+        logger.debug('Cache miss for %s', text_(key))
+        if 'only-if-cached' in directives:
+            return memoryview(build_http_response(
+                httpStatusCodes.GATEWAY_TIMEOUT,
+                reason=b'Gateway Timeout',
+                headers={b'Content-Length': b'0'}))
+        return None
+
+    def serve(self, entry: CacheEntry, request: HttpParser,
+              now: float, counter: str) -> memoryview:
+        response = entry.build_not_modified(now) \
+            if entry.not_modified(request) else entry.build(now)
+        self.cache.counters.incr(counter)
+        self.cache.counters.incr('bytes_served', len(response))
+        return memoryview(response)
+
+    def open(self, request: HttpParser) -> None:
+        stale = self.stale
+        self.close()
+        self.key = self.cache_key(request)
+        if self.key is None:
+            return
+        self.request = request
+        if request.method in UNSAFE_METHODS:
+            self.invalidate = True
+        elif request.method != httpMethods.GET or \
+                'no-store' in request_directives(request):
+            return
+        # Parsing is abandoned once body grows beyond max_object_size
+        self.response = HttpParser(
+            httpParserTypes.RESPONSE_PARSER,
+            HttpParserLimits(
+                max_request_line_size=0, max_header_size=0,
+                max_body_size=self.max_object_size,
+                body_buffer_size=0, body_spool_dir=None))
+        self.request_time = time.time()
+        if self.collapsible(request):
+            self.fetch = self.cache.begin(self.key, request, self.max_object_size)
+        self.stale = stale
+        # Validate on behalf of the client, unless client is validating its own copy
+        if stale is not None and \
+                b'if-none-match' not in request.headers and \
+                b'if-modified-since' not in request.headers:
+            conditionals = stale.conditional_headers()
+            if conditionals:
+                request.add_headers(conditionals)
+                self.validating = True
+                self.cache.counters.incr('revalidations')
+
+    def cache_request(self, request: HttpParser) -> Optional[HttpParser]:
+        return request
+
+    def collapsible(self, request: HttpParser) -> bool:
+        """Requests whose response could be private, or is specific
+        to the client e.g. a partial or conditional response, are never collapsed."""
+        return request.method == httpMethods.GET and \
+            'no-store' not in request_directives(request) and \
+            not any(h in request.headers for h in (
+                b'authorization', b'range', b'if-none-match', b'if-modified-since',
+                b'if-match', b'if-unmodified-since', b'if-range'))
+
+    def receive(self) -> Optional[List[memoryview]]:
+        """Returns response chunks received by waiter since last call.
+
+        Returns None when waiter has failed or response ended
+        without framing, client connection must then be closed."""
+        waiter = self.waiter
+        assert waiter
+        chunks = [memoryview(chunk) for chunk in waiter.receive()]
+        if waiter.state == waiterStates.FALLBACK:
+            logger.debug('Fetching %s without collapsing', text_(waiter.fetch.key))
+            waiter.fallback(self.max_object_size)
+        elif waiter.state == waiterStates.FAILED:
+            self.detach()
+            return None
+        elif waiter.state == waiterStates.DONE:
+            unframed = waiter.fetch.unframed
+            self.detach()
+            if unframed:
+                return None
+        return chunks
+
+    def detach(self) -> None:
+        if self.waiter is not None:
+            self.waiter.close()
+            self.waiter = None
+
+    def cache_response_chunk(self, chunk: memoryview) -> memoryview:
+        chunk = self.process_response_chunk(chunk)
+        if self.fetch is not None and chunk:
+            self.fetch.feed(chunk.tobytes())
+        return chunk
+
+    def process_response_chunk(self, chunk: memoryview) -> memoryview:
+        if self.response is None:
+            return chunk
+        try:
+            self.response.parse(chunk.tobytes())
+        except Exception as e:
+            logger.debug('Not caching response: %r', e)
+            self.response = None
+            return self.release(chunk)
+        if self.invalidate:
+            self.on_invalidating_response()
+        elif self.stale is not None:
+            return self.on_stale_response(chunk)
+        elif self.response.state == httpParserStates.COMPLETE:
+            self.on_response_complete()
+        return chunk
+
+    def close(self) -> None:
+        if self.fetch is not None:
+            self.cache.end(self.fetch)
+            self.fetch = None
+        self.detach()
+        self.key = None
+        self.request = None
+        self.response = None
+        self.invalidate = False
+        self.stale = None
+        self.validating = False
+        self.pending = []
+
+    def release(self, chunk: memoryview) -> memoryview:
+        """Returns chunk preceded by any held back chunks."""
+        if not self.pending:
+            return chunk
+        self.pending.append(chunk.tobytes())
+        data, self.pending = b''.join(self.pending), []
+        return memoryview(data)
+
+    def on_stale_response(self, chunk: memoryview) -> memoryview:
+        assert self.request and self.response and self.stale
+        if self.response.state < httpParserStates.HEADERS_COMPLETE:
+            self.pending.append(chunk.tobytes())
+            return memoryview(b'')
+        stale, self.stale = self.stale, None
+        now = time.time()
+        assert self.response.code
+        code = int(self.response.code) if self.response.code.isdigit() else 0
+        if code == httpStatusCodes.NOT_MODIFIED:
+            entry = self.cache.update(
+                stale.key, stale, self.request, self.response, self.request_time, now)
+            self.response = None
+            if self.validating:
+                assert entry
+                self.pending = []
+                logger.debug('Revalidated %s', text_(stale.key))
+                return memoryview(entry.build(now))
+        elif code in ERROR_CODES and stale.can_serve_stale(
+                'stale-if-error', request_directives(self.request), now):
+            logger.debug('Serving stale %s on upstream error %d', text_(stale.key), code)
+            self.response = None
+            self.pending = []
+            self.cache.counters.incr('stale_hits')
+            served = stale.build(now)
+            self.cache.counters.incr('bytes_served', len(served))
+            return memoryview(served)
+        elif self.response.state == httpParserStates.COMPLETE:
+            self.on_response_complete()
+        return self.release(chunk)
+
+    def on_invalidating_response(self) -> None:
+        assert self.response and self.key
+        if self.response.code is None:
+            return
+        # Successful responses to unsafe methods invalidate stored responses
+        if self.response.code.isdigit() and int(self.response.code) < 400:
+            self.cache.invalidate(self.key)
+        self.response = None
+
+    def on_response_complete(self) -> None:
+        assert self.request and self.response and self.key
+        request, response, key = self.request, self.response, self.key
+        self.response = None
+        if self.cache.update(key, None, request, response, self.request_time, time.time()):
+            logger.debug('Cached response for %s', text_(key))
@@ -10,12 +10,19 @@
 """
 from typing import Optional, Any
 
+from ..common.utils import build_http_response
+from ..http.chunk_parser import ChunkParser
 from ..http.parser import HttpParser, httpParserTypes, httpParserStates
 from ..http.proxy import HttpProxyBasePlugin
 
 
 class ModifyChunkResponsePlugin(HttpProxyBasePlugin):
-    """Accumulate & modify chunk responses as received from upstream."""
+    """Modify chunk responses as received from upstream.
+
+    Decoded chunks are streamed to this plugin as they arrive, hence
+    upstream response is never buffered.  Each received chunk is replaced
+    by the next hardcoded chunk, remaining ones are sent once upstream
+    response completes."""
 
     DEFAULT_CHUNKS = [
         b'modify',
@@ -28,6 +35,9 @@ class ModifyChunkResponsePlugin(HttpProxyBasePlugin):
         super().__init__(*args, **kwargs)
         # Create a new http protocol parser for response payloads
         self.response = HttpParser(httpParserTypes.RESPONSE_PARSER)
+        self.response.on_chunk = self.on_chunk
+        self.head_sent = False
+        self.chunks = list(self.DEFAULT_CHUNKS)
 
     def before_upstream_connection(
             self, request: HttpParser) -> Optional[HttpParser]:
@@ -41,11 +51,33 @@ class ModifyChunkResponsePlugin(HttpProxyBasePlugin):
         # Parse the response.
         # Note that these chunks also include headers
         self.response.parse(chunk.tobytes())
-        # If response is complete, modify and dispatch to client
         if self.response.state == httpParserStates.COMPLETE:
-            self.response.body = b'\n'.join(self.DEFAULT_CHUNKS) + b'\n'
-            self.client.queue(memoryview(self.response.build_response()))
+            self.send_head()
+            if self.response.is_chunked_encoded():
+                self.client.queue(memoryview(b''.join(
+                    ChunkParser.to_chunk(c + b'\n') for c in self.chunks) +
+                    ChunkParser.to_chunk(b'')))
+                self.chunks = []
+            else:
+                self.client.queue(memoryview(self.response.body or b''))
         return memoryview(b'')
 
+    def on_chunk(self, data: bytes) -> None:
+        self.send_head()
+        if self.chunks:
+            self.client.queue(memoryview(
+                ChunkParser.to_chunk(self.chunks.pop(0) + b'\n')))
+
+    def send_head(self) -> None:
+        if self.head_sent:
+            return
+        assert self.response.code and self.response.version
+        self.client.queue(memoryview(build_http_response(
+            int(self.response.code),
+            protocol_version=self.response.version,
+            reason=self.response.reason,
+            headers=self.response.headers)))
+        self.head_sent = True
+
     def on_upstream_connection_close(self) -> None:
         pass
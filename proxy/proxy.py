@@ -31,6 +31,11 @@ from .common.types import IpAddress
 from .common.version import __version__
 from .core.acceptor import AcceptorPool
 from .http.handler import HttpProtocolHandler
+from .http.proxy.minter import CertificateMinter, CertificateQueue
+from .http.proxy.parent import parse_proxy_pool
+from .http.parser import HttpParserLimits
+from .http.parser_backend import get_http_parser_klass
+from .common.pki import get_pki_backend
 from .common.flag import flags
 from .common.constants import COMMA, DEFAULT_DATA_DIRECTORY_PATH, PLUGIN_PROXY_AUTH
 from .common.constants import DEFAULT_DEVTOOLS_WS_PATH, DEFAULT_DISABLE_HEADERS
@@ -131,6 +136,7 @@ class Proxy:
     def __init__(self, input_args: Optional[List[str]], **opts: Any) -> None:
         self.flags = Proxy.initialize(input_args, **opts)
         self.acceptors: Optional[AcceptorPool] = None
+        self.minter: Optional[CertificateMinter] = None
 
     def write_pid_file(self) -> None:
         if self.flags.pid_file is not None:
@@ -142,6 +148,12 @@ class Proxy:
             os.remove(self.flags.pid_file)
 
     def __enter__(self) -> 'Proxy':
+        if CertificateMinter.enabled(self.flags):
+            # Started before acceptors so that workers inherit the queue
+            self.flags.certificate_queue = CertificateQueue()
+            self.minter = CertificateMinter(
+                self.flags, self.flags.certificate_queue)
+            self.minter.start()
         self.acceptors = AcceptorPool(
             flags=self.flags,
             work_klass=HttpProtocolHandler
@@ -157,6 +169,9 @@ class Proxy:
             exc_tb: Optional[TracebackType]) -> None:
         assert self.acceptors
         self.acceptors.shutdown()
+        if self.minter:
+            self.minter.running.set()
+            self.minter.join()
         self.delete_pid_file()
 
     @staticmethod
@@ -295,6 +310,33 @@ class Proxy:
         args.pid_file = cast(
             Optional[str], opts.get(
                 'pid_file', args.pid_file))
+        args.conn_pool_max_per_host = cast(int, opts.get(
+            'conn_pool_max_per_host', args.conn_pool_max_per_host))
+        args.conn_pool_idle_timeout = cast(int, opts.get(
+            'conn_pool_idle_timeout', args.conn_pool_idle_timeout))
+        args.http_parser_klass = get_http_parser_klass(
+            opts.get('http_parser', args.http_parser))
+        args.pki_backend = get_pki_backend(
+            opts.get('pki_backend', args.pki_backend))
+        args.ca_cert_prewarm = cast(str, opts.get(
+            'ca_cert_prewarm', args.ca_cert_prewarm))
+        args.ca_cert_renew_before = cast(int, opts.get(
+            'ca_cert_renew_before', args.ca_cert_renew_before))
+        args.certificate_queue = None
+        args.proxy_pool = parse_proxy_pool(
+            cast(Optional[str], opts.get('proxy_pool', args.proxy_pool)))
+        args.http_parser_limits = HttpParserLimits(
+            max_request_line_size=cast(int, opts.get(
+                'max_request_line_size', args.max_request_line_size)),
+            max_header_size=cast(int, opts.get(
+                'max_header_size', args.max_header_size)),
+            max_body_size=cast(int, opts.get(
+                'max_body_size', args.max_body_size)),
+            body_buffer_size=cast(int, opts.get(
+                'body_buffer_size', args.body_buffer_size)),
+            body_spool_dir=cast(Optional[str], opts.get(
+                'body_spool_dir', args.body_spool_dir)),
+        )
 
         args.proxy_py_data_dir = DEFAULT_DATA_DIRECTORY_PATH
         os.makedirs(args.proxy_py_data_dir, exist_ok=True)
@@ -78,6 +78,10 @@ class TestCase(unittest.TestCase):
 
     @contextlib.contextmanager
     def vcr(self) -> Generator[None, None, None]:
+        """Records responses for requests made via proxy.py within the context
+        and replays them, without contacting upstream, when requests repeat,
+        including in later runs.  Start proxy.py with --cache-offline
+        to fail requests without a recorded response instead."""
         try:
             CacheResponsesPlugin.ENABLED.set()
             yield
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+"""
+    proxy.py
+    ~~~~~~~~
+    ⚡⚡⚡ Fast, Lightweight, Pluggable, TLS interception capable proxy server focused on
+    Network monitoring, controls & Application development, testing, debugging.
+
+    :copyright: (c) 2013-present by Abhinav Singh and contributors.
+    :license: BSD, see LICENSE for more details.
+
+    Compares throughput of available HttpParser backends.
+
+    Usage:
+        python -m tests.benchmark.http_parser [iterations]
+"""
+import sys
+import time
+
+from typing import List, Tuple, Type
+
+from proxy.common.constants import CRLF
+from proxy.http.parser import HttpParser, httpParserTypes
+from proxy.http.parser_backend import httpParserBackends, get_http_parser_klass
+
+REQUEST = CRLF.join([
+    b'GET http://example.com/some/path?with=query HTTP/1.1',
+    b'Host: example.com',
+    b'User-Agent: Mozilla/5.0 (X11; Linux x86_64; rv:84.0) Gecko/20100101 Firefox/84.0',
+    b'Accept: text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+    b'Accept-Language: en-US,en;q=0.5',
+    b'Accept-Encoding: gzip, deflate, br',
+    b'Cookie: a=1; b=2; c=3',
+    b'Connection: keep-alive',
+    b'Upgrade-Insecure-Requests: 1',
+    CRLF
+])
+
+RESPONSE = CRLF.join([
+    b'HTTP/1.1 200 OK',
+    b'Server: nginx',
+    b'Date: Mon, 04 Jan 2021 00:00:00 GMT',
+    b'Content-Type: text/html; charset=utf-8',
+    b'Set-Cookie: a=1',
+    b'Set-Cookie: b=2',
+    b'Cache-Control: max-age=60',
+    b'Content-Length: 16',
+    b'',
+    b'<html>ok</html>\n',
+])
+
+CASES: List[Tuple[str, int, bytes]] = [
+    ('request', httpParserTypes.REQUEST_PARSER, REQUEST),
+    ('response', httpParserTypes.RESPONSE_PARSER, RESPONSE),
+]
+
+
+def run(klass: Type[HttpParser], parser_type: int, raw: bytes, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        klass(parser_type).parse(raw)
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    for backend in httpParserBackends:
+        klass = get_http_parser_klass(backend)
+        if backend != httpParserBackends.PYTHON and klass is HttpParser:
+            print('%-10s not available' % backend)
+            continue
+        for name, parser_type, raw in CASES:
+            elapsed = run(klass, parser_type, raw, iterations)
+            print('%-10s %-9s %8.0f msgs/sec' % (backend, name, iterations / elapsed))
+
+
+if __name__ == '__main__':
+    main()
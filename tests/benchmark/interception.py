@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+"""
+    proxy.py
+    ~~~~~~~~
+    ⚡⚡⚡ Fast, Lightweight, Pluggable, TLS interception capable proxy server focused on
+    Network monitoring, controls & Application development, testing, debugging.
+
+    :copyright: (c) 2013-present by Abhinav Singh and contributors.
+    :license: BSD, see LICENSE for more details.
+
+    Compares throughput of parsing responses received through an
+    intercepted TLS tunnel, against passing them through opaquely.
+
+    Usage:
+        python -m tests.benchmark.interception [responses] [body size]
+"""
+import sys
+import time
+import uuid
+import logging
+from unittest import mock
+from typing import Callable, List
+
+from proxy.proxy import Proxy
+from proxy.common.utils import build_http_request, build_http_response
+from proxy.core.connection import TcpClientConnection
+from proxy.http.methods import httpMethods
+from proxy.http.parser import HttpParser
+from proxy.http.proxy import HttpProxyPlugin
+
+RECVBUF_SIZE = 16 * 1024
+
+
+def stream(responses: int, body_size: int, chunked: bool) -> List[memoryview]:
+    body = b'x' * body_size
+    if chunked:
+        response = build_http_response(
+            200, reason=b'OK', headers={b'Transfer-Encoding': b'chunked'},
+            body=b'%x\r\n%s\r\n0\r\n\r\n' % (body_size, body))
+    else:
+        response = build_http_response(
+            200, reason=b'OK', headers={b'Content-Length': b'%d' % body_size},
+            body=body)
+    raw = response * responses
+    return [memoryview(raw[i:i + RECVBUF_SIZE]) for i in range(0, len(raw), RECVBUF_SIZE)]
+
+
+def measure(name: str, chunks: List[memoryview], consume: Callable[[memoryview], None]) -> float:
+    size = sum(len(c) for c in chunks)
+    start = time.perf_counter()
+    for chunk in chunks:
+        consume(chunk)
+    elapsed = time.perf_counter() - start
+    print('%-24s %10.1f MB/sec' % (name, size / elapsed / 1024 / 1024))
+    return elapsed
+
+
+def main() -> None:
+    responses = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    body_size = int(sys.argv[2]) if len(sys.argv) > 2 else 64 * 1024
+    logging.disable(logging.INFO)
+    flags = Proxy.initialize(
+        ca_cert_file='ca-cert.pem',
+        ca_key_file='ca-key.pem',
+        ca_signing_key_file='ca-signing-key.pem')
+    flags.plugins = {}
+    for chunked in (False, True):
+        chunks = stream(responses, body_size, chunked)
+        plugin = HttpProxyPlugin(
+            uuid.uuid4(), flags,
+            TcpClientConnection(mock.MagicMock(), ('127.0.0.1', 0)),
+            HttpParser.request(build_http_request(httpMethods.CONNECT, b'example.com:443')),
+            mock.MagicMock())
+
+        def opaque(raw: memoryview) -> None:
+            plugin.response.total_size += len(raw)
+
+        def parsed(raw: memoryview) -> None:
+            if not plugin.intercepted_requests:
+                request = HttpParser.request(build_http_request(httpMethods.GET, b'/'))
+                plugin.intercepted_requests.extend(
+                    [(request, time.time())] * responses)
+            plugin.handle_intercepted_response(raw)
+
+        kind = 'chunked' if chunked else 'content-length'
+        baseline = measure('opaque %s' % kind, chunks, opaque)
+        elapsed = measure('parsed %s' % kind, chunks, parsed)
+        print('%-24s %10.1f us/response' % (
+            'overhead', (elapsed - baseline) / responses * 1000000))
+
+
+if __name__ == '__main__':
+    main()
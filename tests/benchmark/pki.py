@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+"""
+    proxy.py
+    ~~~~~~~~
+    ⚡⚡⚡ Fast, Lightweight, Pluggable, TLS interception capable proxy server focused on
+    Network monitoring, controls & Application development, testing, debugging.
+
+    :copyright: (c) 2013-present by Abhinav Singh and contributors.
+    :license: BSD, see LICENSE for more details.
+
+    Compares certificates generated per second by available PKI backends,
+    as done by HttpProxyPlugin for first seen hostnames.
+
+    Usage:
+        python -m tests.benchmark.pki [certificates]
+"""
+import os
+import sys
+import time
+import shutil
+import tempfile
+
+from proxy.common import pki
+
+
+def openssl(cert_dir: str, key_path: str, ca_key_path: str, ca_crt_path: str, host: str) -> bool:
+    public_key_path = os.path.join(cert_dir, '%s.pub' % host)
+    csr_path = os.path.join(cert_dir, '%s.csr' % host)
+    return pki.gen_public_key(public_key_path, key_path, '', '/CN=%s' % host, alt_subj_names=[host]) and \
+        pki.gen_csr(csr_path, key_path, '', public_key_path) and \
+        pki.sign_csr(csr_path, os.path.join(cert_dir, '%s.pem' % host), ca_key_path, '',
+                     ca_crt_path, str(int(time.time())), alt_subj_names=[host])
+
+
+def cryptography(cert_dir: str, key_path: str, ca_key_path: str, ca_crt_path: str, host: str) -> bool:
+    return pki.sign_certificate(
+        os.path.join(cert_dir, '%s.pem' % host), key_path, '', ca_key_path, '',
+        ca_crt_path, '/CN=%s' % host, int(time.time() * 1000000), alt_subj_names=[host])
+
+
+def main() -> None:
+    certificates = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    cert_dir = tempfile.mkdtemp()
+    try:
+        # CA key and certificate, plus signing key reused for all certificates
+        ca_key_path = os.path.join(cert_dir, 'ca-key.pem')
+        ca_crt_path = os.path.join(cert_dir, 'ca-cert.pem')
+        key_path = os.path.join(cert_dir, 'ca-signing-key.pem')
+        for path in (ca_key_path, key_path):
+            pki.gen_private_key(path, 'proxy.py')
+            pki.remove_passphrase(path, 'proxy.py', path)
+        pki.gen_public_key(ca_crt_path, ca_key_path, '', '/CN=proxy.py CA')
+        for name, generate in (('openssl', openssl), ('cryptography', cryptography)):
+            if pki.get_pki_backend(name) != name:
+                print('%-12s not available' % name)
+                continue
+            start = time.perf_counter()
+            for n in range(certificates):
+                assert generate(cert_dir, key_path, ca_key_path, ca_crt_path,
+                                '%s-%d.example.com' % (name, n))
+            elapsed = time.perf_counter() - start
+            print('%-12s %8.1f certs/sec' % (name, certificates / elapsed))
+    finally:
+        shutil.rmtree(cert_dir)
+
+
+if __name__ == '__main__':
+    main()
@@ -17,6 +17,11 @@ from typing import Tuple
 
 from proxy.common import pki
 
+try:
+    from cryptography import x509
+except ImportError:     # pragma: no cover
+    x509 = None
+
 
 class TestPki(unittest.TestCase):
 
@@ -104,6 +109,33 @@ class TestPki(unittest.TestCase):
     def test_sign_csr(self) -> None:
         pass
 
+    @mock.patch('proxy.common.pki.x509', None)
+    def test_pki_backend_falls_back_to_openssl(self) -> None:
+        self.assertEqual(
+            pki.get_pki_backend(pki.pkiBackends.CRYPTOGRAPHY), pki.pkiBackends.OPENSSL)
+        self.assertEqual(
+            pki.get_pki_backend(pki.pkiBackends.OPENSSL), pki.pkiBackends.OPENSSL)
+
+    @unittest.skipIf(x509 is None, 'cryptography is not installed')
+    def test_sign_certificate(self) -> None:
+        key_path, nopass_key_path, ca_crt_path = self._gen_public_private_key()
+        crt_path = os.path.join(tempfile.gettempdir(), 'test_sign_certificate.pem')
+        self.assertTrue(pki.sign_certificate(
+            crt_path, nopass_key_path, '', key_path, 'password', ca_crt_path,
+            '/CN=proxy.py/O=proxy.py', 1234, alt_subj_names=['proxy.py'],
+            extended_key_usage='serverAuth'))
+        crt = pki.load_certificate(crt_path, 0)
+        ca_crt = pki.load_certificate(ca_crt_path, 0)
+        self.assertEqual(crt.serial_number, 1234)
+        self.assertEqual(crt.issuer, ca_crt.subject)
+        self.assertEqual(crt.subject.rfc4514_string(), 'O=proxy.py,CN=proxy.py')
+        san = crt.extensions.get_extension_for_class(x509.SubjectAlternativeName)
+        self.assertEqual(san.value.get_values_for_type(x509.DNSName), ['proxy.py'])
+        os.remove(crt_path)
+        os.remove(ca_crt_path)
+        os.remove(key_path)
+        os.remove(nopass_key_path)
+
     def _gen_public_private_key(self) -> Tuple[str, str, str]:
         key_path, nopass_key_path = self._gen_private_key()
         crt_path = os.path.join(tempfile.gettempdir(), 'test_gen_public.crt')
@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+"""
+    proxy.py
+    ~~~~~~~~
+    ⚡⚡⚡ Fast, Lightweight, Pluggable, TLS interception capable proxy server focused on
+    Network monitoring, controls & Application development, testing, debugging.
+
+    :copyright: (c) 2013-present by Abhinav Singh and contributors.
+    :license: BSD, see LICENSE for more details.
+"""
+import os
+import ssl
+import time
+import shutil
+import socket
+import tempfile
+import threading
+import unittest
+import selectors
+
+from proxy.common import pki, tls
+from proxy.core.connection import TcpClientConnection, TcpServerConnection
+
+
+class TestTlsContexts(unittest.TestCase):
+
+    cert_dir: str
+    key_path: str
+    crt_path: str
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.cert_dir = tempfile.mkdtemp()
+        key_path = os.path.join(cls.cert_dir, 'key.pem')
+        cls.key_path = os.path.join(cls.cert_dir, 'nopass-key.pem')
+        cls.crt_path = os.path.join(cls.cert_dir, 'crt.pem')
+        pki.gen_private_key(key_path, 'password')
+        pki.remove_passphrase(key_path, 'password', cls.key_path)
+        pki.gen_public_key(cls.crt_path, key_path, 'password',
+                           '/CN=example.com', alt_subj_names=['example.com'])
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        shutil.rmtree(cls.cert_dir)
+
+    def setUp(self) -> None:
+        tls.clear()
+
+    def test_server_context_is_cached_until_modified(self) -> None:
+        ctx = tls.server_context(self.crt_path, self.key_path)
+        self.assertIs(tls.server_context(self.crt_path, self.key_path), ctx)
+        modified = time.time() + 10
+        os.utime(self.crt_path, (modified, modified))
+        self.assertIsNot(tls.server_context(self.crt_path, self.key_path), ctx)
+
+    def test_client_context_is_cached(self) -> None:
+        ctx = tls.client_context(self.crt_path)
+        self.assertIs(tls.client_context(self.crt_path), ctx)
+        self.assertTrue(ctx.check_hostname)
+
+    def test_upstream_session_is_resumed(self) -> None:
+        ctx = tls.client_context(self.crt_path)
+        key = ('example.com', 443, id(ctx))
+        self.assertFalse(self.handshake(ctx, key))
+        self.assertIsNotNone(tls.get_session(key))
+        self.assertTrue(self.handshake(ctx, key))
+
+    def test_non_blocking_handshake(self) -> None:
+        """Both sides of a handshake are driven from a single thread."""
+        client_sock, server_sock = socket.socketpair()
+        client_sock.setblocking(False)
+        server_sock.setblocking(False)
+        client = TcpClientConnection(server_sock, ('127.0.0.1', 0))
+        upstream = TcpServerConnection('example.com', 443)
+        upstream._conn = client_sock
+        upstream.wrap('example.com', self.crt_path)
+        client.wrap(self.key_path, self.crt_path)
+        selector = selectors.DefaultSelector()
+        try:
+            for _ in range(10):
+                pending = [c for c in (upstream, client) if c.handshaking]
+                if not pending:
+                    break
+                for conn in pending:
+                    selector.register(conn.connection, conn.want, conn)
+                for key, _ in selector.select(timeout=1):
+                    key.data.do_handshake()
+                for conn in pending:
+                    selector.unregister(conn.connection)
+            self.assertFalse(upstream.handshaking)
+            self.assertFalse(client.handshaking)
+            self.assertIsNotNone(tls.get_session(
+                ('example.com', 443, id(tls.client_context(self.crt_path)))))
+        finally:
+            selector.close()
+            client.close()
+            upstream.close()
+
+    def handshake(self, ctx: ssl.SSLContext, key: tls.SessionKey) -> bool:
+        """Performs a handshake with server context over a socket pair,
+        returns whether the client resumed a previous session."""
+        client, server = socket.socketpair()
+
+        def serve() -> None:
+            with tls.server_context(self.crt_path, self.key_path).wrap_socket(
+                    server, server_side=True) as conn:
+                conn.sendall(b'x')
+                conn.recv(1)
+        thread = threading.Thread(target=serve)
+        thread.start()
+        with ctx.wrap_socket(client, server_hostname='example.com',
+                             session=tls.get_session(key)) as conn:
+            # TLSv1.3 session tickets arrive after the handshake
+            self.assertEqual(conn.recv(1), b'x')
+            tls.save_session(key, conn)
+            reused = bool(conn.session_reused)
+            conn.sendall(b'x')
+        thread.join()
+        return reused
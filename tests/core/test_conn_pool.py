@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+"""
+    proxy.py
+    ~~~~~~~~
+    ⚡⚡⚡ Fast, Lightweight, Pluggable, TLS interception capable proxy server focused on
+    Network monitoring, controls & Application development, testing, debugging.
+
+    :copyright: (c) 2013-present by Abhinav Singh and contributors.
+    :license: BSD, see LICENSE for more details.
+"""
+import socket
+import unittest
+
+from typing import List, Tuple
+from unittest import mock
+
+from proxy.core.connection import TcpServerConnection, UpstreamConnectionPool
+
+
+class TestUpstreamConnectionPool(unittest.TestCase):
+
+    KEY = ('example.com', 80, False)
+
+    def setUp(self) -> None:
+        self.pool = UpstreamConnectionPool(max_per_host=2, idle_timeout=30)
+        self.sockets: List[socket.socket] = []
+
+    def tearDown(self) -> None:
+        for sock in self.sockets:
+            sock.close()
+
+    def connection(self) -> Tuple[TcpServerConnection, socket.socket]:
+        """Returns a connected TcpServerConnection and its upstream end."""
+        local, remote = socket.socketpair()
+        local.setblocking(False)
+        self.sockets.extend([local, remote])
+        conn = TcpServerConnection(*self.KEY[:2])
+        conn._conn = local
+        return conn, remote
+
+    def test_acquire_returns_released_connection(self) -> None:
+        conn, _ = self.connection()
+        self.assertEqual(self.pool.acquire(self.KEY), None)
+        self.assertTrue(self.pool.release(self.KEY, conn))
+        self.assertEqual(self.pool.acquire(('example.com', 443, True)), None)
+        self.assertEqual(self.pool.acquire(self.KEY), conn)
+        self.assertEqual(self.pool.acquire(self.KEY), None)
+
+    def test_max_per_host(self) -> None:
+        conns = [self.connection()[0] for _ in range(3)]
+        self.assertTrue(self.pool.release(self.KEY, conns[0]))
+        self.assertTrue(self.pool.release(self.KEY, conns[1]))
+        self.assertFalse(self.pool.release(self.KEY, conns[2]))
+
+    def test_does_not_pool_busy_or_closed_connections(self) -> None:
+        conn, _ = self.connection()
+        conn.queue(memoryview(b'GET / HTTP/1.1\r\n\r\n'))
+        self.assertFalse(self.pool.release(self.KEY, conn))
+        conn.buffer = []
+        conn.closed = True
+        self.assertFalse(self.pool.release(self.KEY, conn))
+
+    def test_acquire_skips_connections_closed_by_upstream(self) -> None:
+        closed, remote = self.connection()
+        alive, _ = self.connection()
+        self.pool.release(self.KEY, alive)
+        self.pool.release(self.KEY, closed)
+        remote.close()
+        self.assertEqual(self.pool.acquire(self.KEY), alive)
+        self.assertTrue(closed.closed)
+
+    def test_acquire_skips_connections_with_unsolicited_data(self) -> None:
+        conn, remote = self.connection()
+        self.pool.release(self.KEY, conn)
+        remote.send(b'HTTP/1.1 408 Request Timeout\r\n\r\n')
+        self.assertEqual(self.pool.acquire(self.KEY), None)
+        self.assertTrue(conn.closed)
+
+    @mock.patch('time.time')
+    def test_idle_timeout(self, mock_time: mock.Mock) -> None:
+        conn, _ = self.connection()
+        mock_time.return_value = 100
+        self.pool.release(self.KEY, conn)
+        mock_time.return_value = 130
+        self.pool.cleanup()
+        self.assertTrue(conn.closed)
+        self.assertEqual(self.pool.acquire(self.KEY), None)
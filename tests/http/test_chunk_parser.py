@@ -88,3 +88,47 @@ class TestChunkParser(unittest.TestCase):
         self.assertEqual(
             b'f\r\n{"key":"value"}\r\n0\r\n\r\n',
             ChunkParser.to_chunks(b'{"key":"value"}'))
+
+    def test_to_chunk(self) -> None:
+        self.assertEqual(ChunkParser.to_chunk(b'Wiki'), b'4\r\nWiki\r\n')
+        self.assertEqual(ChunkParser.to_chunk(b''), b'0\r\n\r\n')
+
+    def test_chunk_parse_drained_body(self) -> None:
+        self.parser.parse(b'4\r\nWi')
+        self.assertEqual(self.parser.body, b'Wi')
+        self.parser.body = b''
+        self.parser.parse(b'ki\r\n3\r\nped')
+        self.assertEqual(self.parser.body, b'kiped')
+        self.assertEqual(self.parser.size, None)
+        self.assertEqual(
+            self.parser.state,
+            chunkParserStates.WAITING_FOR_SIZE)
+
+    def test_chunk_parse_extensions_and_trailers(self) -> None:
+        leftover = self.parser.parse(b''.join([
+            b'4;name=value\r\n',
+            b'Wiki\r\n',
+            b'0\r\n',
+            b'Expires: never\r\n',
+            b'\r\n',
+            b'HTTP/1.1 200 OK\r\n',
+        ]))
+        self.assertEqual(self.parser.body, b'Wiki')
+        self.assertEqual(self.parser.state, chunkParserStates.COMPLETE)
+        self.assertEqual(leftover, b'HTTP/1.1 200 OK\r\n')
+
+    def test_build_preserves_framing(self) -> None:
+        raw = b''.join([
+            b'4\r\n',
+            b'Wiki\r\n',
+            b'E;ext\r\n',
+            b' in\r\n\r\nchunks.\r\n',
+            b'0\r\n',
+            b'\r\n'
+        ])
+        self.parser.parse(raw)
+        self.assertEqual(self.parser.build(self.parser.body), raw)
+        # Falls back to to_chunks once body size changes
+        self.assertEqual(
+            self.parser.build(b'modified'),
+            ChunkParser.to_chunks(b'modified'))
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+"""
+    proxy.py
+    ~~~~~~~~
+    ⚡⚡⚡ Fast, Lightweight, Pluggable, TLS interception capable proxy server focused on
+    Network monitoring, controls & Application development, testing, debugging.
+
+    :copyright: (c) 2013-present by Abhinav Singh and contributors.
+    :license: BSD, see LICENSE for more details.
+"""
+import unittest
+
+from proxy.common.constants import CRLF
+from proxy.http.headers import HttpHeaders
+
+
+class TestHttpHeaders(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.headers = HttpHeaders()
+        self.headers.parse_line(b'Host:  example.com ')
+        self.headers.parse_line(b'Set-Cookie: a=1')
+        self.headers.parse_line(b'set-cookie: b=2')
+        self.headers.parse_line(b'Accept: */*')
+
+    def test_parse_line(self) -> None:
+        self.assertEqual(len(self.headers), 4)
+        self.assertEqual(self.headers[b'host'], (b'Host', b'example.com'))
+        self.assertEqual(self.headers.get(b'HOST'), b'example.com')
+        self.assertEqual(self.headers.get(b'not-found'), None)
+        self.assertNotIn(b'not-found', self.headers)
+
+    def test_duplicates_and_order(self) -> None:
+        self.assertEqual(
+            self.headers.get_all(b'set-cookie'), [b'a=1', b'b=2'])
+        self.assertEqual(self.headers.items(), [
+            (b'Host', b'example.com'),
+            (b'Set-Cookie', b'a=1'),
+            (b'set-cookie', b'b=2'),
+            (b'Accept', b'*/*'),
+        ])
+        self.assertEqual(self.headers.fold(), [
+            (b'host', b'example.com'),
+            (b'set-cookie', b'a=1, b=2'),
+            (b'accept', b'*/*'),
+        ])
+
+    def test_build_splices_raw_lines(self) -> None:
+        self.assertEqual(
+            self.headers.build(),
+            CRLF.join([
+                b'Host:  example.com ',
+                b'Set-Cookie: a=1',
+                b'set-cookie: b=2',
+                b'Accept: */*',
+                b'',
+            ]))
+
+    def test_set_replaces_in_place_and_drops_duplicates(self) -> None:
+        self.headers.set(b'Set-Cookie', b'c=3')
+        self.assertEqual(
+            self.headers.build(),
+            CRLF.join([
+                b'Host:  example.com ',
+                b'Set-Cookie: c=3',
+                b'Accept: */*',
+                b'',
+            ]))
+        self.assertEqual(self.headers.get_all(b'set-cookie'), [b'c=3'])
+
+    def test_remove_and_add(self) -> None:
+        self.assertTrue(self.headers.remove(b'Host'))
+        self.assertFalse(self.headers.remove(b'Host'))
+        self.headers.add(b'Via', b'1.1 proxy.py')
+        self.assertEqual(
+            self.headers.build(),
+            CRLF.join([
+                b'Set-Cookie: a=1',
+                b'set-cookie: b=2',
+                b'Accept: */*',
+                b'Via: 1.1 proxy.py',
+                b'',
+            ]))
+        self.assertEqual(self.headers.get(b'via'), b'1.1 proxy.py')
+
+    def test_copy_is_independent(self) -> None:
+        headers = self.headers.copy()
+        headers.remove(b'accept')
+        self.assertIn(b'accept', self.headers)
+        self.assertNotIn(b'accept', headers)
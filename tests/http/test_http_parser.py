@@ -8,13 +8,18 @@
     :copyright: (c) 2013-present by Abhinav Singh and contributors.
     :license: BSD, see LICENSE for more details.
 """
+import os
+import tempfile
 import unittest
 
+from typing import List
+
 from proxy.common.constants import CRLF
 from proxy.common.utils import build_http_request, find_http_line, build_http_response, build_http_header, bytes_
 from proxy.http.methods import httpMethods
 from proxy.http.codes import httpStatusCodes
-from proxy.http.parser import HttpParser, httpParserTypes, httpParserStates
+from proxy.http.parser import HttpParser, HttpParserLimits, httpParserTypes, httpParserStates
+from proxy.http.exception import HttpRequestRejected
 
 
 class TestHttpParser(unittest.TestCase):
@@ -187,7 +192,7 @@ class TestHttpParser(unittest.TestCase):
         self.parser.parse(host_hdr)
         self.assertEqual(self.parser.total_size,
                          len(pkt) + len(CRLF) + len(host_hdr))
-        self.assertDictEqual(self.parser.headers, dict())
+        self.assertEqual(len(self.parser.headers), 0)
         self.assertEqual(self.parser.buffer, b'Host: localhost:8080')
         self.assertEqual(self.parser.state, httpParserStates.LINE_RCVD)
 
@@ -536,3 +541,234 @@ class TestHttpParser(unittest.TestCase):
         self.parser = HttpParser(httpParserTypes.RESPONSE_PARSER)
         self.parser.parse(response)
         self.assertEqual(self.parser.state, httpParserStates.COMPLETE)
+
+    def test_build_splices_raw_headers(self) -> None:
+        self.parser.parse(CRLF.join([
+            b'GET http://example.com/path HTTP/1.1',
+            b'host:example.com',
+            b'Proxy-Connection: Keep-Alive',
+            b'X-Custom:   spaced value',
+            CRLF
+        ]))
+        self.parser.del_headers([b'proxy-authorization', b'proxy-connection'])
+        self.parser.add_headers([(b'Via', b'1.1 proxy.py')])
+        self.assertEqual(
+            self.parser.build(),
+            CRLF.join([
+                b'GET /path HTTP/1.1',
+                b'host:example.com',
+                b'X-Custom:   spaced value',
+                b'Via: 1.1 proxy.py',
+                CRLF
+            ]))
+
+    def test_build_for_proxy(self) -> None:
+        self.parser.parse(CRLF.join([
+            b'GET http://example.com:8080/path?q=1 HTTP/1.1',
+            b'Host: example.com:8080',
+            CRLF
+        ]))
+        self.assertEqual(
+            self.parser.build(for_proxy=True),
+            CRLF.join([
+                b'GET http://example.com:8080/path?q=1 HTTP/1.1',
+                b'Host: example.com:8080',
+                CRLF
+            ]))
+
+    def test_build_splice_respects_disable_headers(self) -> None:
+        self.parser.parse(CRLF.join([
+            b'GET http://example.com/ HTTP/1.1',
+            b'Host: example.com',
+            b'Accept: */*',
+            CRLF
+        ]))
+        self.assertEqual(
+            self.parser.build(disable_headers=[b'accept']),
+            CRLF.join([
+                b'GET / HTTP/1.1',
+                b'Host: example.com',
+                CRLF
+            ]))
+
+    def test_build_replaces_modified_header_in_place(self) -> None:
+        self.parser.parse(CRLF.join([
+            b'GET http://example.com/ HTTP/1.1',
+            b'host:example.com',
+            b'Accept: */*',
+            b'X-Custom:value',
+            CRLF
+        ]))
+        self.parser.add_header(b'Accept', b'text/html')
+        self.assertEqual(
+            self.parser.build(),
+            CRLF.join([
+                b'GET / HTTP/1.1',
+                b'host:example.com',
+                b'Accept: text/html',
+                b'X-Custom:value',
+                CRLF
+            ]))
+
+    def test_duplicate_headers_are_preserved(self) -> None:
+        self.parser.type = httpParserTypes.RESPONSE_PARSER
+        self.parser.parse(CRLF.join([
+            b'HTTP/1.1 200 OK',
+            b'Set-Cookie: a=1',
+            b'Content-Length: 2',
+            b'Set-Cookie: b=2',
+            CRLF
+        ]) + b'ok')
+        self.assertEqual(self.parser.state, httpParserStates.COMPLETE)
+        self.assertEqual(self.parser.header(b'set-cookie'), b'a=1')
+        self.assertEqual(
+            self.parser.headers.get_all(b'Set-Cookie'), [b'a=1', b'b=2'])
+        self.assertEqual(
+            self.parser.build_response(),
+            CRLF.join([
+                b'HTTP/1.1 200 OK',
+                b'Set-Cookie: a=1',
+                b'Content-Length: 2',
+                b'Set-Cookie: b=2',
+                CRLF
+            ]) + b'ok')
+
+    def test_rejects_long_request_line(self) -> None:
+        self.parser.limits = HttpParserLimits(16, 0, 0, 0, None)
+        with self.assertRaises(HttpRequestRejected) as ctx:
+            self.parser.parse(b'GET http://example.com/' + b'a' * 16)
+        self.assertEqual(ctx.exception.status_code,
+                         httpStatusCodes.URI_TOO_LONG)
+
+    def test_rejects_large_headers(self) -> None:
+        self.parser.limits = HttpParserLimits(0, 32, 0, 0, None)
+        self.parser.parse(CRLF.join([
+            b'GET http://example.com/ HTTP/1.1',
+            b'Host: example.com',
+            b'',
+        ]))
+        with self.assertRaises(HttpRequestRejected) as ctx:
+            # Never ending header line without any CRLF
+            self.parser.parse(b'X-Large: ' + b'a' * 32)
+        self.assertEqual(ctx.exception.status_code,
+                         httpStatusCodes.REQUEST_HEADER_FIELDS_TOO_LARGE)
+
+    def test_rejects_large_content_length_before_body(self) -> None:
+        self.parser.limits = HttpParserLimits(0, 0, 8, 0, None)
+        with self.assertRaises(HttpRequestRejected) as ctx:
+            self.parser.parse(CRLF.join([
+                b'POST http://example.com/ HTTP/1.1',
+                b'Host: example.com',
+                b'Content-Length: 9',
+                CRLF
+            ]))
+        self.assertEqual(ctx.exception.status_code,
+                         httpStatusCodes.PAYLOAD_TOO_LARGE)
+        self.assertEqual(self.parser.body, None)
+
+    def test_rejects_large_chunked_body(self) -> None:
+        self.parser.limits = HttpParserLimits(0, 0, 8, 0, None)
+        self.parser.parse(CRLF.join([
+            b'POST http://example.com/ HTTP/1.1',
+            b'Host: example.com',
+            b'Transfer-Encoding: chunked',
+            b'',
+            b'4',
+            b'abcd',
+            b'',
+        ]))
+        with self.assertRaises(HttpRequestRejected) as ctx:
+            self.parser.parse(b'5\r\n')
+        self.assertEqual(ctx.exception.status_code,
+                         httpStatusCodes.PAYLOAD_TOO_LARGE)
+
+    def test_spools_large_body_to_disk(self) -> None:
+        with tempfile.TemporaryDirectory() as spool_dir:
+            self.parser.limits = HttpParserLimits(0, 0, 0, 4, spool_dir)
+            self.parser.parse(CRLF.join([
+                b'POST http://example.com/ HTTP/1.1',
+                b'Host: example.com',
+                b'Content-Length: 10',
+                CRLF
+            ]) + b'abc')
+            self.assertEqual(self.parser.body_file, None)
+            self.parser.parse(b'defghij')
+            self.assertEqual(self.parser.state, httpParserStates.COMPLETE)
+            self.assertNotEqual(self.parser.body_file, None)
+            self.assertEqual(self.parser.body_size, 10)
+            self.assertEqual(self.parser.body, b'abcdefghij')
+            self.assertTrue(self.parser.build().endswith(CRLF * 2 + b'abcdefghij'))
+            # Setting body discards spooled file
+            self.parser.body = b'modified'
+            self.assertEqual(self.parser.body_file, None)
+            self.assertEqual(self.parser.body, b'modified')
+            self.assertEqual(len(os.listdir(spool_dir)), 0)
+
+    def test_chunked_response_streaming(self) -> None:
+        chunks: List[bytes] = []
+        self.parser.type = httpParserTypes.RESPONSE_PARSER
+        self.parser.on_chunk = chunks.append
+        self.parser.parse(CRLF.join([
+            b'HTTP/1.1 200 OK',
+            b'Transfer-Encoding: chunked',
+            b'',
+            b'4',
+            b'Wi',
+        ]))
+        self.assertEqual(chunks, [b'Wi'])
+        self.parser.parse(b'ki\r\n5\r\npedia\r\n0\r\n\r\n')
+        self.assertEqual(chunks, [b'Wi', b'kipedia'])
+        self.assertEqual(self.parser.state, httpParserStates.COMPLETE)
+        self.assertEqual(self.parser.body, None)
+        self.assertEqual(self.parser.body_size, 9)
+
+    def test_chunked_response_preserves_framing(self) -> None:
+        raw = CRLF.join([
+            b'HTTP/1.1 200 OK',
+            b'Transfer-Encoding: chunked',
+            b'',
+            b'a;name=value',
+            b'0123456789',
+            b'2',
+            b'ab',
+            b'0',
+            CRLF
+        ])
+        self.parser.type = httpParserTypes.RESPONSE_PARSER
+        self.parser.parse(raw)
+        self.assertEqual(self.parser.body, b'0123456789ab')
+        self.assertEqual(self.parser.build_response(), raw)
+
+    def test_response_to_head_has_no_body(self) -> None:
+        self.parser.type = httpParserTypes.RESPONSE_PARSER
+        self.parser.request_method = httpMethods.HEAD
+        self.parser.parse(build_http_response(
+            httpStatusCodes.OK, reason=b'OK',
+            headers={b'Content-Length': b'10'}) + b'HTTP/1.1')
+        self.assertEqual(self.parser.state, httpParserStates.COMPLETE)
+        self.assertEqual(self.parser.buffer, b'HTTP/1.1')
+
+    def test_successful_response_to_connect_has_no_body(self) -> None:
+        self.parser.type = httpParserTypes.RESPONSE_PARSER
+        self.parser.request_method = httpMethods.CONNECT
+        self.parser.parse(build_http_response(
+            httpStatusCodes.OK, reason=b'Connection established',
+            headers={b'Content-Length': b'10'}))
+        self.assertEqual(self.parser.state, httpParserStates.COMPLETE)
+
+    def test_not_modified_response_has_no_body(self) -> None:
+        self.parser.type = httpParserTypes.RESPONSE_PARSER
+        self.parser.parse(build_http_response(
+            httpStatusCodes.NOT_MODIFIED, reason=b'Not Modified',
+            headers={b'Content-Length': b'10'}))
+        self.assertEqual(self.parser.state, httpParserStates.COMPLETE)
+
+    def test_body_not_retained(self) -> None:
+        self.parser.type = httpParserTypes.RESPONSE_PARSER
+        self.parser.retain_body = False
+        self.parser.parse(build_http_response(
+            httpStatusCodes.OK, reason=b'OK',
+            headers={b'Content-Length': b'10'}, body=b'0123456789'))
+        self.assertEqual(self.parser.state, httpParserStates.COMPLETE)
+        self.assertEqual(self.parser.body, None)
+        self.assertEqual(self.parser.body_size, 10)
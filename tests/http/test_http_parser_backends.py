@@ -0,0 +1,230 @@
+# -*- coding: utf-8 -*-
+"""
+    proxy.py
+    ~~~~~~~~
+    ⚡⚡⚡ Fast, Lightweight, Pluggable, TLS interception capable proxy server focused on
+    Network monitoring, controls & Application development, testing, debugging.
+
+    :copyright: (c) 2013-present by Abhinav Singh and contributors.
+    :license: BSD, see LICENSE for more details.
+"""
+import unittest
+
+from typing import Type
+
+from proxy.common.constants import CRLF
+from proxy.http.methods import httpMethods
+from proxy.http.codes import httpStatusCodes
+from proxy.http.exception import HttpRequestRejected
+from proxy.http.parser import HttpParser, HttpParserLimits, httpParserTypes, httpParserStates
+from proxy.http.parser_backend import HttptoolsHttpParser, get_http_parser_klass
+from proxy.http.parser_backend import httpParserBackends, httptools
+
+
+class TestHttpParserConformance(unittest.TestCase):
+    """Conformance tests which every HttpParser backend must pass.
+
+    Runs against pure Python parser, subclasses override parser_klass."""
+
+    parser_klass: Type[HttpParser] = HttpParser
+
+    def request(self) -> HttpParser:
+        return self.parser_klass(httpParserTypes.REQUEST_PARSER)
+
+    def response(self) -> HttpParser:
+        return self.parser_klass(httpParserTypes.RESPONSE_PARSER)
+
+    def test_get_request(self) -> None:
+        p = self.request()
+        p.parse(CRLF.join([
+            b'GET http://example.com/path?q=1 HTTP/1.1',
+            b'Host: example.com',
+            b'User-Agent: proxy.py',
+            CRLF
+        ]))
+        self.assertEqual(p.state, httpParserStates.COMPLETE)
+        self.assertEqual(p.method, b'GET')
+        self.assertEqual(p.version, b'HTTP/1.1')
+        self.assertEqual(p.host, b'example.com')
+        self.assertEqual(p.port, 80)
+        self.assertEqual(p.path, b'/path?q=1')
+        self.assertEqual(p.header(b'user-agent'), b'proxy.py')
+        self.assertEqual(p.buffer, b'')
+
+    def test_post_request_with_content_length(self) -> None:
+        p = self.request()
+        p.parse(CRLF.join([
+            b'POST http://example.com/ HTTP/1.1',
+            b'Host: example.com',
+            b'Content-Length: 7',
+            CRLF
+        ]))
+        self.assertEqual(p.state, httpParserStates.HEADERS_COMPLETE)
+        p.parse(b'a=b')
+        self.assertEqual(p.state, httpParserStates.RCVING_BODY)
+        p.parse(b'&c=d')
+        self.assertEqual(p.state, httpParserStates.COMPLETE)
+        self.assertEqual(p.body, b'a=b&c=d')
+
+    def test_chunked_request(self) -> None:
+        p = self.request()
+        p.parse(CRLF.join([
+            b'POST http://example.com/ HTTP/1.1',
+            b'Host: example.com',
+            b'Transfer-Encoding: chunked',
+            b'',
+            b'3',
+            b'abc',
+            b'2',
+            b'de',
+            b'0',
+            CRLF
+        ]))
+        self.assertEqual(p.state, httpParserStates.COMPLETE)
+        self.assertTrue(p.is_chunked_encoded())
+        self.assertEqual(p.body, b'abcde')
+
+    def test_chunked_response(self) -> None:
+        p = self.response()
+        p.parse(CRLF.join([
+            b'HTTP/1.1 200 OK',
+            b'Transfer-Encoding: chunked',
+            b'',
+            b'4',
+            b'Wiki',
+            b'0',
+            CRLF
+        ]))
+        self.assertEqual(p.state, httpParserStates.COMPLETE)
+        self.assertEqual(p.code, b'200')
+        self.assertEqual(p.reason, b'OK')
+        self.assertEqual(p.body, b'Wiki')
+
+    def test_byte_by_byte(self) -> None:
+        raw = CRLF.join([
+            b'HTTP/1.1 404 Not Found',
+            b'Content-Length: 5',
+            b'Server: proxy.py',
+            b'',
+            b'oops!',
+        ])
+        p = self.response()
+        for i in range(len(raw)):
+            p.parse(raw[i:i + 1])
+        self.assertEqual(p.state, httpParserStates.COMPLETE)
+        self.assertEqual(p.code, b'404')
+        self.assertEqual(p.reason, b'Not Found')
+        self.assertEqual(p.header(b'server'), b'proxy.py')
+        self.assertEqual(p.body, b'oops!')
+        self.assertEqual(p.total_size, len(raw))
+
+    def test_connect_request(self) -> None:
+        p = self.request()
+        p.parse(CRLF.join([
+            b'CONNECT example.com:443 HTTP/1.1',
+            b'Host: example.com:443',
+            CRLF
+        ]))
+        self.assertEqual(p.state, httpParserStates.COMPLETE)
+        self.assertEqual(p.method, httpMethods.CONNECT)
+        self.assertEqual(p.host, b'example.com')
+        self.assertEqual(p.port, 443)
+
+    def test_response_without_content_length(self) -> None:
+        p = self.response()
+        p.parse(CRLF.join([
+            b'HTTP/1.1 200 Connection established',
+            CRLF
+        ]))
+        self.assertEqual(p.state, httpParserStates.COMPLETE)
+        self.assertEqual(p.code, b'200')
+        self.assertEqual(p.reason, b'Connection established')
+
+    def test_response_without_reason(self) -> None:
+        p = self.response()
+        p.parse(b'HTTP/1.1 204\r\n\r\n')
+        self.assertEqual(p.code, b'204')
+        self.assertEqual(p.reason, b'')
+
+    def test_pipelined_leftover(self) -> None:
+        second = CRLF.join([
+            b'GET /second HTTP/1.1',
+            b'Host: example.com',
+            CRLF
+        ])
+        p = self.request()
+        p.parse(CRLF.join([
+            b'GET /first HTTP/1.1',
+            b'Host: example.com',
+            CRLF
+        ]) + second)
+        self.assertEqual(p.state, httpParserStates.COMPLETE)
+        self.assertEqual(p.path, b'/first')
+        self.assertEqual(p.buffer, second)
+
+    def test_duplicate_headers(self) -> None:
+        p = self.response()
+        p.parse(CRLF.join([
+            b'HTTP/1.1 200 OK',
+            b'Set-Cookie: a=1',
+            b'Set-Cookie: b=2',
+            b'Content-Length: 0',
+            CRLF
+        ]))
+        self.assertEqual(p.headers.get_all(b'set-cookie'), [b'a=1', b'b=2'])
+
+    def test_build_preserves_raw_headers(self) -> None:
+        raw = CRLF.join([
+            b'GET http://example.com/ HTTP/1.1',
+            b'host:   example.com',
+            b'X-Custom-Header:value ',
+            CRLF
+        ])
+        p = self.request()
+        p.parse(raw)
+        self.assertEqual(p.header(b'x-custom-header'), b'value')
+        self.assertEqual(p.build(), CRLF.join([
+            b'GET / HTTP/1.1',
+            b'host:   example.com',
+            b'X-Custom-Header:value ',
+            CRLF
+        ]))
+
+    def test_header_limits(self) -> None:
+        limits = HttpParserLimits(24, 24, 0, 0, None)
+        p = self.parser_klass(httpParserTypes.REQUEST_PARSER, limits)
+        p.parse(b'GET / HTTP/1.1\r\nHost: a\r\n\r\n')
+        self.assertEqual(p.state, httpParserStates.COMPLETE)
+        p = self.parser_klass(httpParserTypes.REQUEST_PARSER, limits)
+        with self.assertRaises(HttpRequestRejected) as ctx:
+            p.parse(b'GET /' + b'a' * 24)
+        self.assertEqual(ctx.exception.status_code, httpStatusCodes.URI_TOO_LONG)
+        p = self.parser_klass(httpParserTypes.REQUEST_PARSER, limits)
+        with self.assertRaises(HttpRequestRejected) as ctx:
+            p.parse(b'GET / HTTP/1.1\r\nX-Large: ' + b'a' * 24)
+        self.assertEqual(ctx.exception.status_code,
+                         httpStatusCodes.REQUEST_HEADER_FIELDS_TOO_LARGE)
+
+    def test_http_1_0_is_not_keep_alive(self) -> None:
+        p = self.request()
+        p.parse(b'GET / HTTP/1.0\r\nConnection: keep-alive\r\n\r\n')
+        self.assertEqual(p.version, b'HTTP/1.0')
+        self.assertFalse(p.is_http_1_1_keep_alive())
+
+
+@unittest.skipIf(httptools is None, 'httptools is not installed')
+class TestHttptoolsHttpParserConformance(TestHttpParserConformance):
+
+    parser_klass = HttptoolsHttpParser
+
+
+class TestGetHttpParserKlass(unittest.TestCase):
+
+    def test_python_backend(self) -> None:
+        self.assertEqual(
+            get_http_parser_klass(httpParserBackends.PYTHON), HttpParser)
+
+    @unittest.skipIf(httptools is None, 'httptools is not installed')
+    def test_httptools_backend(self) -> None:
+        self.assertEqual(
+            get_http_parser_klass(httpParserBackends.HTTPTOOLS), HttptoolsHttpParser)
@@ -14,11 +14,12 @@ from unittest import mock
 
 from proxy.common.constants import DEFAULT_HTTP_PORT
 from proxy.proxy import Proxy
-from proxy.core.connection import TcpClientConnection
+from proxy.core.connection import TcpClientConnection, UpstreamConnectionPool
 from proxy.http.proxy import HttpProxyPlugin
+from proxy.http.proxy.parent import ParentProxy, ParentProxyPool, parse_proxy_pool
 from proxy.http.handler import HttpProtocolHandler
 from proxy.http.exception import HttpProtocolException
-from proxy.common.utils import build_http_request
+from proxy.common.utils import build_http_request, build_http_response
 
 
 class TestHttpProxyPlugin(unittest.TestCase):
@@ -35,6 +36,9 @@ class TestHttpProxyPlugin(unittest.TestCase):
         self._addr = ('127.0.0.1', 54382)
         self.flags = Proxy.initialize()
         self.plugin = mock.MagicMock()
+        self.plugin.return_value.get_descriptors.return_value = ([], [])
+        self.plugin.return_value.write_to_descriptors.return_value = False
+        self.plugin.return_value.read_from_descriptors.return_value = False
         self.flags.plugins = {
             b'HttpProtocolHandlerPlugin': [HttpProxyPlugin],
             b'HttpProxyBasePlugin': [self.plugin]
@@ -93,3 +97,227 @@ class TestHttpProxyPlugin(unittest.TestCase):
         self.protocol_handler.run_once()
         self.plugin.return_value.before_upstream_connection.assert_called()
         mock_server_conn.assert_not_called()
+
+    @mock.patch('proxy.core.connection.UpstreamConnectionPool.is_alive')
+    @mock.patch('proxy.http.proxy.server.TcpServerConnection')
+    def test_upstream_connection_is_pooled(
+            self,
+            mock_server_conn: mock.Mock,
+            mock_is_alive: mock.Mock) -> None:
+        HttpProxyPlugin.pool = UpstreamConnectionPool(
+            self.flags.conn_pool_max_per_host, self.flags.conn_pool_idle_timeout)
+        mock_is_alive.return_value = True
+        self.plugin.return_value.before_upstream_connection.side_effect = lambda r: r
+        self.plugin.return_value.handle_client_request.side_effect = lambda r: r
+        self.plugin.return_value.handle_upstream_chunk.side_effect = lambda c: c
+
+        server = mock_server_conn.return_value
+        server.closed = False
+        server.has_buffer.return_value = False
+        server.addr = ('upstream.host', DEFAULT_HTTP_PORT)
+        server.recv.return_value = memoryview(build_http_response(
+            200, reason=b'OK', body=b'ok'))
+        self._conn.recv.return_value = build_http_request(
+            b'GET', b'http://upstream.host/',
+            headers={
+                b'Host': b'upstream.host'
+            })
+        self.mock_selector.return_value.select.side_effect = [
+            [(selectors.SelectorKey(
+                fileobj=self._conn,
+                fd=self._conn.fileno,
+                events=selectors.EVENT_READ,
+                data=None), selectors.EVENT_READ)],
+            [(selectors.SelectorKey(
+                fileobj=server.connection,
+                fd=server.connection.fileno,
+                events=selectors.EVENT_READ,
+                data=None), selectors.EVENT_READ)], ]
+
+        self.protocol_handler.run_once()
+        self.protocol_handler.run_once()
+        proxy_plugin = self.protocol_handler.plugins['HttpProxyPlugin']
+        assert isinstance(proxy_plugin, HttpProxyPlugin)
+        self.assertEqual(proxy_plugin.server, None)
+        self.assertEqual(
+            HttpProxyPlugin.pool.acquire(('upstream.host', DEFAULT_HTTP_PORT, False)),
+            server)
+
+    @mock.patch('proxy.http.proxy.server.logger')
+    @mock.patch('proxy.http.proxy.server.TcpServerConnection')
+    def test_keep_alive_requests_are_retargeted(
+            self,
+            mock_server_conn: mock.Mock,
+            mock_logger: mock.Mock) -> None:
+        HttpProxyPlugin.pool = UpstreamConnectionPool(
+            self.flags.conn_pool_max_per_host, self.flags.conn_pool_idle_timeout)
+        self.plugin.return_value.before_upstream_connection.side_effect = lambda r: r
+        self.plugin.return_value.handle_client_request.side_effect = lambda r: r
+        self.plugin.return_value.handle_upstream_chunk.side_effect = lambda c: c
+
+        first, second = mock.MagicMock(), mock.MagicMock()
+        for server, host in ((first, 'first.host'), (second, 'second.host')):
+            server.closed = False
+            server.has_buffer.return_value = False
+            server.addr = (host, DEFAULT_HTTP_PORT)
+        first.recv.return_value = memoryview(build_http_response(
+            200, reason=b'OK', body=b'ok'))
+        mock_server_conn.side_effect = [first, second]
+
+        self._conn.recv.side_effect = [
+            build_http_request(
+                b'GET', b'http://first.host/',
+                headers={b'Host': b'first.host'}),
+            build_http_request(
+                b'GET', b'http://second.host/path',
+                headers={b'Host': b'second.host'}),
+        ]
+        client_read = [(selectors.SelectorKey(
+            fileobj=self._conn,
+            fd=self._conn.fileno,
+            events=selectors.EVENT_READ,
+            data=None), selectors.EVENT_READ)]
+        self.mock_selector.return_value.select.side_effect = [
+            client_read,
+            [(selectors.SelectorKey(
+                fileobj=first.connection,
+                fd=first.connection.fileno,
+                events=selectors.EVENT_READ,
+                data=None), selectors.EVENT_READ)],
+            client_read, ]
+
+        self.protocol_handler.run_once()
+        self.protocol_handler.run_once()
+        self.protocol_handler.run_once()
+
+        self.assertEqual(mock_server_conn.call_args_list, [
+            mock.call('first.host', DEFAULT_HTTP_PORT),
+            mock.call('second.host', DEFAULT_HTTP_PORT),
+        ])
+        second.queue.assert_called_once()
+        self.assertTrue(second.queue.call_args[0][0].tobytes().startswith(
+            b'GET /path HTTP/1.1'))
+        # Access log line for first request
+        self.assertEqual(mock_logger.info.call_count, 1)
+        proxy_plugin = self.protocol_handler.plugins['HttpProxyPlugin']
+        assert isinstance(proxy_plugin, HttpProxyPlugin)
+        self.assertEqual(proxy_plugin.request.host, b'second.host')
+        self.assertEqual(proxy_plugin.server, second)
+
+    @mock.patch('proxy.http.proxy.server.TcpServerConnection')
+    def test_requests_are_chained_through_parent_proxy(
+            self,
+            mock_server_conn: mock.Mock) -> None:
+        self.flags.proxy_pool = parse_proxy_pool('user:pass@parent.host:3128')
+        self.plugin.return_value.before_upstream_connection.side_effect = lambda r: r
+        self.plugin.return_value.handle_client_request.side_effect = lambda r: r
+
+        self._conn.recv.return_value = build_http_request(
+            b'GET', b'http://upstream.host:8080/path',
+            headers={
+                b'Host': b'upstream.host:8080'
+            })
+        self.mock_selector.return_value.select.side_effect = [
+            [(selectors.SelectorKey(
+                fileobj=self._conn,
+                fd=self._conn.fileno,
+                events=selectors.EVENT_READ,
+                data=None), selectors.EVENT_READ)], ]
+
+        self.protocol_handler.run_once()
+        mock_server_conn.assert_called_with('parent.host', 3128)
+        request = mock_server_conn.return_value.queue.call_args[0][0].tobytes()
+        self.assertTrue(request.startswith(
+            b'GET http://upstream.host:8080/path HTTP/1.1\r\n'))
+        self.assertIn(b'\r\nProxy-Authorization: Basic dXNlcjpwYXNz\r\n', request)
+
+    @mock.patch('proxy.http.proxy.server.TcpServerConnection')
+    def test_connect_is_tunneled_through_parent_proxy(
+            self,
+            mock_server_conn: mock.Mock) -> None:
+        self.flags.proxy_pool = parse_proxy_pool('parent.host:3128')
+        self.plugin.return_value.before_upstream_connection.side_effect = lambda r: r
+        self.plugin.return_value.handle_client_request.side_effect = lambda r: r
+        self.plugin.return_value.handle_upstream_chunk.side_effect = lambda c: c
+
+        server = mock_server_conn.return_value
+        server.closed = False
+        server.recv.return_value = memoryview(
+            b'HTTP/1.1 200 Connection established\r\n\r\n')
+        self._conn.recv.return_value = build_http_request(
+            b'CONNECT', b'upstream.host:443')
+        self.mock_selector.return_value.select.side_effect = [
+            [(selectors.SelectorKey(
+                fileobj=self._conn,
+                fd=self._conn.fileno,
+                events=selectors.EVENT_READ,
+                data=None), selectors.EVENT_READ)],
+            [(selectors.SelectorKey(
+                fileobj=server.connection,
+                fd=server.connection.fileno,
+                events=selectors.EVENT_READ,
+                data=None), selectors.EVENT_READ)], ]
+
+        self.protocol_handler.run_once()
+        mock_server_conn.assert_called_with('parent.host', 3128)
+        self.assertEqual(
+            server.queue.call_args[0][0].tobytes(),
+            build_http_request(
+                b'CONNECT', b'upstream.host:443',
+                headers={b'Host': b'upstream.host:443'}))
+        # Client is only responded once parent has established the tunnel
+        self.assertFalse(self.protocol_handler.client.has_buffer())
+
+        self.assertFalse(self.protocol_handler.run_once())
+        self.assertEqual(
+            self.protocol_handler.client.buffer,
+            [HttpProxyPlugin.PROXY_TUNNEL_ESTABLISHED_RESPONSE_PKT])
+        # Response of parent is never considered part of the tunnel
+        self.plugin.return_value.handle_upstream_chunk.assert_not_called()
+
+    @mock.patch('proxy.http.proxy.server.TcpServerConnection')
+    def test_connect_refused_by_parent_proxy_is_relayed(
+            self,
+            mock_server_conn: mock.Mock) -> None:
+        self.flags.proxy_pool = parse_proxy_pool('parent.host:3128')
+        self.plugin.return_value.before_upstream_connection.side_effect = lambda r: r
+        self.plugin.return_value.handle_client_request.side_effect = lambda r: r
+
+        refused = build_http_response(
+            403, reason=b'Forbidden', headers={b'Content-Length': b'0'})
+        server = mock_server_conn.return_value
+        server.closed = False
+        server.recv.return_value = memoryview(refused)
+        self._conn.recv.return_value = build_http_request(
+            b'CONNECT', b'upstream.host:443')
+        self.mock_selector.return_value.select.side_effect = [
+            [(selectors.SelectorKey(
+                fileobj=self._conn,
+                fd=self._conn.fileno,
+                events=selectors.EVENT_READ,
+                data=None), selectors.EVENT_READ)],
+            [(selectors.SelectorKey(
+                fileobj=server.connection,
+                fd=server.connection.fileno,
+                events=selectors.EVENT_READ,
+                data=None), selectors.EVENT_READ)], ]
+
+        self.protocol_handler.run_once()
+        self.assertTrue(self.protocol_handler.run_once())
+        self.assertEqual(
+            [b.tobytes() for b in self.protocol_handler.client.buffer], [refused])
+
+
+class TestParentProxyPool(unittest.TestCase):
+
+    def test_parse_proxy_pool(self) -> None:
+        self.assertEqual(parse_proxy_pool(''), ())
+        self.assertEqual(parse_proxy_pool('localhost:9000, user:pass@[::1]:9001'), (
+            ParentProxy('localhost', 9000, None),
+            ParentProxy('::1', 9001, b'dXNlcjpwYXNz'),
+        ))
+
+    def test_round_robin(self) -> None:
+        pool = ParentProxyPool(parse_proxy_pool('localhost:9000,localhost:9001'))
+        self.assertEqual(
+            [pool.choose().port for _ in range(3)], [9000, 9001, 9000])
@@ -8,31 +8,35 @@
     :copyright: (c) 2013-present by Abhinav Singh and contributors.
     :license: BSD, see LICENSE for more details.
 """
+import time
 import uuid
 import unittest
 import socket
 import ssl
 import selectors
 
-from typing import Any
+from typing import Any, List, Tuple
 from unittest import mock
 
-from proxy.core.connection import TcpClientConnection, TcpServerConnection
+from proxy.core.connection import TcpClientConnection, TcpConnection, TcpServerConnection
 from proxy.http.handler import HttpProtocolHandler
 from proxy.http.proxy import HttpProxyPlugin
+from proxy.http.codes import httpStatusCodes
 from proxy.http.methods import httpMethods
-from proxy.common.utils import build_http_request, bytes_
+from proxy.http.parser import HttpParser
+from proxy.common.utils import build_http_request, build_http_response, bytes_
 from proxy.proxy import Proxy
+from proxy.common import tls
 
 
 class TestHttpProxyTlsInterception(unittest.TestCase):
 
-    @mock.patch('ssl.wrap_socket')
+    @mock.patch('proxy.core.connection.client.server_context')
     @mock.patch('ssl.create_default_context')
     @mock.patch('proxy.http.proxy.server.TcpServerConnection')
-    @mock.patch('proxy.http.proxy.server.gen_public_key')
-    @mock.patch('proxy.http.proxy.server.gen_csr')
-    @mock.patch('proxy.http.proxy.server.sign_csr')
+    @mock.patch('proxy.http.proxy.minter.gen_public_key')
+    @mock.patch('proxy.http.proxy.minter.gen_csr')
+    @mock.patch('proxy.http.proxy.minter.sign_csr')
     @mock.patch('selectors.DefaultSelector')
     @mock.patch('socket.fromfd')
     def test_e2e(
@@ -44,7 +48,7 @@ class TestHttpProxyTlsInterception(unittest.TestCase):
             mock_gen_public_key: mock.Mock,
             mock_server_conn: mock.Mock,
             mock_ssl_context: mock.Mock,
-            mock_ssl_wrap: mock.Mock) -> None:
+            mock_server_context: mock.Mock) -> None:
         host, port = uuid.uuid4().hex, 443
         netloc = '{0}:{1}'.format(host, port)
 
@@ -55,7 +59,10 @@ class TestHttpProxyTlsInterception(unittest.TestCase):
         self.mock_gen_public_key = mock_gen_public_key
         self.mock_server_conn = mock_server_conn
         self.mock_ssl_context = mock_ssl_context
-        self.mock_ssl_wrap = mock_ssl_wrap
+        self.mock_server_context = mock_server_context
+        self.mock_ssl_wrap = mock_server_context.return_value.wrap_socket
+        # Contexts are cached per process
+        tls.clear()
 
         self.mock_sign_csr.return_value = True
         self.mock_gen_csr.return_value = True
@@ -71,6 +78,10 @@ class TestHttpProxyTlsInterception(unittest.TestCase):
                 return ssl_connection
             return plain_connection
 
+        # Do not mock the original do_handshake method
+        self.mock_server_conn.return_value.do_handshake.side_effect = \
+            lambda: TcpConnection.do_handshake(self.mock_server_conn.return_value)
+
         # Do not mock the original wrap method
         self.mock_server_conn.return_value.wrap.side_effect = \
             lambda x, y: TcpServerConnection.wrap(
@@ -88,6 +99,9 @@ class TestHttpProxyTlsInterception(unittest.TestCase):
         )
         self.plugin = mock.MagicMock()
         self.proxy_plugin = mock.MagicMock()
+        self.proxy_plugin.return_value.get_descriptors.return_value = ([], [])
+        self.proxy_plugin.return_value.write_to_descriptors.return_value = False
+        self.proxy_plugin.return_value.read_from_descriptors.return_value = False
         self.flags.plugins = {
             b'HttpProtocolHandlerPlugin': [self.plugin, HttpProxyPlugin],
             b'HttpProxyBasePlugin': [self.proxy_plugin],
@@ -113,6 +127,7 @@ class TestHttpProxyTlsInterception(unittest.TestCase):
                 b'Host': bytes_(netloc),
             })
         self._conn.recv.return_value = connect_request
+        self._conn.send.side_effect = lambda raw: len(raw)
 
         # Prepare mocked HttpProtocolHandlerPlugin
         self.plugin.return_value.get_descriptors.return_value = ([], [])
@@ -148,36 +163,38 @@ class TestHttpProxyTlsInterception(unittest.TestCase):
         self.proxy_plugin.return_value.handle_client_request.assert_called()
 
         self.mock_server_conn.assert_called_with(host, port)
-        self.mock_server_conn.return_value.connection.setblocking.assert_called_with(
-            False)
-
         self.mock_ssl_context.assert_called_with(
             ssl.Purpose.SERVER_AUTH, cafile=None)
         # self.assertEqual(self.mock_ssl_context.return_value.options,
         # ssl.OP_NO_SSLv2 | ssl.OP_NO_SSLv3 | ssl.OP_NO_TLSv1 |
         # ssl.OP_NO_TLSv1_1)
-        self.assertEqual(plain_connection.setblocking.call_count, 2)
+        # Upstream connection is left non-blocking, handshakes
+        # are performed within the event loop
+        plain_connection.setblocking.assert_called_once_with(False)
         self.mock_ssl_context.return_value.wrap_socket.assert_called_with(
-            plain_connection, server_hostname=host)
+            plain_connection, server_hostname=host, session=None,
+            do_handshake_on_connect=False)
+        ssl_connection.do_handshake.assert_called_once()
         self.assertEqual(self.mock_sign_csr.call_count, 1)
         self.assertEqual(self.mock_gen_csr.call_count, 1)
         self.assertEqual(self.mock_gen_public_key.call_count, 1)
-        self.assertEqual(ssl_connection.setblocking.call_count, 1)
+        ssl_connection.setblocking.assert_not_called()
         self.assertEqual(
             self.mock_server_conn.return_value._conn,
             ssl_connection)
         self._conn.send.assert_called_with(
             HttpProxyPlugin.PROXY_TUNNEL_ESTABLISHED_RESPONSE_PKT)
         assert self.flags.ca_cert_dir is not None
+        self.mock_server_context.assert_called_with(
+            HttpProxyPlugin.generated_cert_file_path(
+                self.flags.ca_cert_dir, host),
+            self.flags.ca_signing_key_file)
         self.mock_ssl_wrap.assert_called_with(
             self._conn,
             server_side=True,
-            keyfile=self.flags.ca_signing_key_file,
-            certfile=HttpProxyPlugin.generated_cert_file_path(
-                self.flags.ca_cert_dir, host),
-            ssl_version=ssl.PROTOCOL_TLS
-        )
-        self.assertEqual(self._conn.setblocking.call_count, 2)
+            do_handshake_on_connect=False)
+        self.mock_ssl_wrap.return_value.do_handshake.assert_called_once()
+        self._conn.setblocking.assert_called_once_with(False)
         self.assertEqual(
             self.protocol_handler.client.connection,
             self.mock_ssl_wrap.return_value)
@@ -189,3 +206,69 @@ class TestHttpProxyTlsInterception(unittest.TestCase):
         self.assertEqual(
             self.proxy_plugin.return_value.client._conn,
             self.mock_ssl_wrap.return_value)
+
+
+class TestInterceptedResponses(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.flags = Proxy.initialize(
+            ca_cert_file='ca-cert.pem',
+            ca_key_file='ca-key.pem',
+            ca_signing_key_file='ca-signing-key.pem'
+        )
+        self.proxy_plugin = mock.MagicMock()
+        self.flags.plugins = {
+            b'HttpProxyBasePlugin': [self.proxy_plugin],
+        }
+        self.plugin = HttpProxyPlugin(
+            uuid.uuid4(), self.flags,
+            TcpClientConnection(mock.MagicMock(), ('127.0.0.1', 54382)),
+            HttpParser.request(build_http_request(
+                httpMethods.CONNECT, b'example.com:443')),
+            mock.MagicMock())
+
+    def send(self, method: bytes, path: bytes) -> None:
+        self.plugin.intercepted_requests.append(
+            (HttpParser.request(build_http_request(method, path)), time.time()))
+
+    def responses(self) -> List[Tuple[bytes, bytes, int]]:
+        return [(c[0][0].method, c[0][1].code, c[0][1].body_size)
+                for c in self.proxy_plugin.return_value.on_intercepted_response.call_args_list]
+
+    def test_pipelined_responses_are_paired(self) -> None:
+        self.send(httpMethods.GET, b'/a')
+        self.send(httpMethods.HEAD, b'/b')
+        self.send(httpMethods.GET, b'/c')
+        raw = build_http_response(
+            httpStatusCodes.OK, reason=b'OK',
+            headers={b'Content-Length': b'5'}, body=b'hello') + \
+            build_http_response(
+                httpStatusCodes.OK, reason=b'OK',
+                headers={b'Content-Length': b'5'}) + \
+            build_http_response(
+                httpStatusCodes.OK, reason=b'OK',
+                headers={b'Transfer-Encoding': b'chunked'},
+                body=b'5\r\nworld\r\n0\r\n\r\n')
+        # Deliver in small pieces, as received from upstream
+        for i in range(0, len(raw), 7):
+            self.plugin.handle_intercepted_response(memoryview(raw[i:i + 7]))
+        self.assertEqual(self.responses(), [
+            (httpMethods.GET, b'200', 5),
+            (httpMethods.HEAD, b'200', 0),
+            (httpMethods.GET, b'200', 5),
+        ])
+        self.assertEqual(len(self.plugin.intercepted_requests), 0)
+
+    def test_interim_and_upgrade_responses(self) -> None:
+        self.send(httpMethods.POST, b'/a')
+        self.send(httpMethods.GET, b'/ws')
+        self.plugin.handle_intercepted_response(memoryview(
+            build_http_response(httpStatusCodes.CONTINUE, reason=b'Continue') +
+            build_http_response(204, reason=b'No Content') +
+            build_http_response(httpStatusCodes.SWITCHING_PROTOCOLS, reason=b'Switching') +
+            b'\x81\x05hello'))
+        self.assertEqual(self.responses(), [
+            (httpMethods.POST, b'204', 0),
+            (httpMethods.GET, b'101', 0),
+        ])
+        self.assertFalse(self.plugin.observe_intercepted)
@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+"""
+    proxy.py
+    ~~~~~~~~
+    ⚡⚡⚡ Fast, Lightweight, Pluggable, TLS interception capable proxy server focused on
+    Network monitoring, controls & Application development, testing, debugging.
+
+    :copyright: (c) 2013-present by Abhinav Singh and contributors.
+    :license: BSD, see LICENSE for more details.
+"""
+import os
+import time
+import shutil
+import tempfile
+import threading
+import unittest
+from typing import Any
+from unittest import mock
+
+from proxy.proxy import Proxy
+from proxy.http.proxy.minter import CertificateMinter, CertificateQueue
+from proxy.http.proxy.minter import CERT_VALIDITY_DAYS, certificate_subject, needs_renewal
+
+
+class TestCertificateMinter(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.ca_cert_dir = tempfile.mkdtemp()
+        self.flags = Proxy.initialize(
+            ca_cert_dir=self.ca_cert_dir,
+            ca_cert_file='ca-cert.pem',
+            ca_key_file='ca-key.pem',
+            ca_signing_key_file='ca-signing-key.pem',
+            ca_cert_prewarm='example.com,example.org')
+        self.certificates = CertificateQueue()
+        self.minter = CertificateMinter(self.flags, self.certificates)
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.ca_cert_dir)
+
+    def cert_file_path(self, host: str) -> str:
+        return os.path.join(self.ca_cert_dir, '%s.pem' % host)
+
+    def test_certificate_subject(self) -> None:
+        self.assertEqual(certificate_subject({'subject': (
+            (('countryName', 'US'),),
+            (('organizationName', 'Example'),),
+            (('commonName', 'example.com'),),
+        )}), '/CN=example.com/C=US/O=Example')
+
+    def test_needs_renewal(self) -> None:
+        path = self.cert_file_path('example.com')
+        self.assertTrue(needs_renewal(path, 30))
+        open(path, 'wb').close()
+        self.assertFalse(needs_renewal(path, 30))
+        created = time.time() - (CERT_VALIDITY_DAYS - 29) * 24 * 60 * 60
+        os.utime(path, (created, created))
+        self.assertTrue(needs_renewal(path, 30))
+
+    @mock.patch('proxy.http.proxy.minter.gen_ca_signed_certificate')
+    def test_mints_once(self, mock_gen: mock.Mock) -> None:
+        def gen(flags: Any, host: str, subject: str, path: str, *args: Any, **kwargs: Any) -> None:
+            open(path, 'wb').close()
+        mock_gen.side_effect = gen
+        self.minter.mint('example.com', '/CN=example.com')
+        self.minter.mint('example.com', '/CN=example.com')
+        self.assertEqual(mock_gen.call_count, 1)
+        self.assertFalse(mock_gen.call_args[1]['renew'])
+        created = time.time() - CERT_VALIDITY_DAYS * 24 * 60 * 60
+        os.utime(self.cert_file_path('example.com'), (created, created))
+        self.minter.renew()
+        self.assertEqual(mock_gen.call_count, 2)
+        self.assertTrue(mock_gen.call_args[1]['renew'])
+
+    @mock.patch('proxy.http.proxy.minter.gen_ca_signed_certificate')
+    def test_prewarm_and_requests(self, mock_gen: mock.Mock) -> None:
+        def gen(flags: Any, host: str, subject: str, path: str, *args: Any, **kwargs: Any) -> None:
+            open(path, 'wb').close()
+        mock_gen.side_effect = gen
+        thread = threading.Thread(target=self.minter.run)
+        thread.start()
+        try:
+            self.certificates.mint(
+                'example.net', '/CN=example.net',
+                self.cert_file_path('example.net'), timeout=5)
+        finally:
+            self.minter.running.set()
+            thread.join()
+        self.assertEqual(
+            [c[0][1] for c in mock_gen.call_args_list],
+            ['example.com', 'example.org', 'example.net'])
+
+    def test_mint_timeout(self) -> None:
+        with self.assertRaises(TimeoutError):
+            self.certificates.mint(
+                'example.com', '/CN=example.com',
+                self.cert_file_path('example.com'), timeout=0.1)
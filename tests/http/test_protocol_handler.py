@@ -164,6 +164,19 @@ class TestHttpProtocolHandler(unittest.TestCase):
             self.protocol_handler.client.buffer[0],
             ProxyConnectionFailed.RESPONSE_PKT)
 
+    def test_request_header_fields_too_large(self) -> None:
+        self.mock_selector_for_client_read(self.mock_selector)
+        self._conn.recv.return_value = CRLF.join([
+            b'GET http://localhost HTTP/1.1',
+            b'Host: localhost',
+            b'X-Large: ' + b'a' * self.flags.max_header_size,
+            CRLF
+        ])
+        self.assertTrue(self.protocol_handler.run_once())
+        self.assertTrue(
+            self.protocol_handler.client.buffer[0].tobytes().startswith(
+                b'HTTP/1.1 431 Request Header Fields Too Large'))
+
     @mock.patch('selectors.DefaultSelector')
     @mock.patch('socket.fromfd')
     def test_proxy_authentication_failed(
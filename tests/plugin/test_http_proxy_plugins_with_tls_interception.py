@@ -17,9 +17,10 @@ from unittest import mock
 from typing import Any, cast
 
 from proxy.proxy import Proxy
+from proxy.common import tls
 from proxy.common.utils import bytes_
 from proxy.common.utils import build_http_request, build_http_response
-from proxy.core.connection import TcpClientConnection, TcpServerConnection
+from proxy.core.connection import TcpClientConnection, TcpConnection, TcpServerConnection
 from proxy.http.codes import httpStatusCodes
 from proxy.http.methods import httpMethods
 from proxy.http.handler import HttpProtocolHandler
@@ -30,12 +31,12 @@ from .utils import get_plugin_by_test_name
 
 class TestHttpProxyPluginExamplesWithTlsInterception(unittest.TestCase):
 
-    @mock.patch('ssl.wrap_socket')
+    @mock.patch('proxy.core.connection.client.server_context')
     @mock.patch('ssl.create_default_context')
     @mock.patch('proxy.http.proxy.server.TcpServerConnection')
-    @mock.patch('proxy.http.proxy.server.gen_public_key')
-    @mock.patch('proxy.http.proxy.server.gen_csr')
-    @mock.patch('proxy.http.proxy.server.sign_csr')
+    @mock.patch('proxy.http.proxy.minter.gen_public_key')
+    @mock.patch('proxy.http.proxy.minter.gen_csr')
+    @mock.patch('proxy.http.proxy.minter.sign_csr')
     @mock.patch('selectors.DefaultSelector')
     @mock.patch('socket.fromfd')
     def setUp(self,
@@ -46,7 +47,7 @@ class TestHttpProxyPluginExamplesWithTlsInterception(unittest.TestCase):
               mock_gen_public_key: mock.Mock,
               mock_server_conn: mock.Mock,
               mock_ssl_context: mock.Mock,
-              mock_ssl_wrap: mock.Mock) -> None:
+              mock_server_context: mock.Mock) -> None:
         self.mock_fromfd = mock_fromfd
         self.mock_selector = mock_selector
         self.mock_sign_csr = mock_sign_csr
@@ -54,7 +55,10 @@ class TestHttpProxyPluginExamplesWithTlsInterception(unittest.TestCase):
         self.mock_gen_public_key = mock_gen_public_key
         self.mock_server_conn = mock_server_conn
         self.mock_ssl_context = mock_ssl_context
-        self.mock_ssl_wrap = mock_ssl_wrap
+        self.mock_server_context = mock_server_context
+        self.mock_ssl_wrap = mock_server_context.return_value.wrap_socket
+        # Contexts are cached per process
+        tls.clear()
 
         self.mock_sign_csr.return_value = True
         self.mock_gen_csr.return_value = True
@@ -98,6 +102,10 @@ class TestHttpProxyPluginExamplesWithTlsInterception(unittest.TestCase):
                 return self.server_ssl_connection
             return self._conn
 
+        # Do not mock the original do_handshake method
+        self.server.do_handshake.side_effect = \
+            lambda: TcpConnection.do_handshake(self.server)
+
         # Do not mock the original wrap method
         self.server.wrap.side_effect = \
             lambda x, y: TcpServerConnection.wrap(self.server, x, y)
@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+"""
+    proxy.py
+    ~~~~~~~~
+    ⚡⚡⚡ Fast, Lightweight, Pluggable, TLS interception capable proxy server focused on
+    Network monitoring, controls & Application development, testing, debugging.
+
+    :copyright: (c) 2013-present by Abhinav Singh and contributors.
+    :license: BSD, see LICENSE for more details.
+"""
+import uuid
+import shutil
+import tempfile
+import unittest
+from typing import Dict, Optional
+from unittest import mock
+
+from proxy.proxy import Proxy
+from proxy.common.utils import build_http_request, build_http_response
+from proxy.http.parser import HttpParser
+from proxy.plugin import CacheResponsesPlugin
+from proxy.plugin.cache.store.replay import ReplayCacheStore
+from proxy.plugin.cache.store.segment import SegmentCacheTier
+
+
+def request(method: bytes = b'GET', body: Optional[bytes] = None,
+            headers: Optional[Dict[bytes, bytes]] = None) -> HttpParser:
+    return HttpParser.request(build_http_request(
+        method, b'http://example.org/get', headers=headers, body=body))
+
+
+class TestReplayCacheStore(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.cache_dir = tempfile.mkdtemp()
+        self.archive = SegmentCacheTier(self.cache_dir, slots=64)
+        self.store = ReplayCacheStore(uuid.uuid4(), self.archive)
+        self.response = build_http_response(
+            200, reason=b'OK',
+            headers={b'Cache-Control': b'no-store', b'Transfer-Encoding': b'chunked'},
+            body=b'5\r\nhello\r\n0\r\n\r\n')
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.cache_dir)
+
+    def record(self, req: HttpParser) -> None:
+        self.assertIsNone(self.store.cached_response(req))
+        self.store.open(req)
+        self.store.cache_response_chunk(memoryview(self.response[:20]))
+        self.store.cache_response_chunk(memoryview(self.response[20:]))
+        self.store.close()
+
+    def test_recorded_response_is_replayed(self) -> None:
+        self.record(request())
+        replayed = self.store.cached_response(request())
+        assert replayed is not None
+        response = HttpParser.response(replayed.tobytes())
+        self.assertEqual(response.code, b'200')
+        self.assertEqual(response.body, b'hello')
+        self.assertEqual(response.headers.get(b'cache-control'), b'no-store')
+        self.assertFalse(response.is_chunked_encoded())
+
+    def test_requests_are_keyed_by_method_and_body(self) -> None:
+        self.record(request(b'POST', b'a=1', {b'Content-Length': b'3'}))
+        self.assertIsNone(self.store.cached_response(request()))
+        self.assertIsNone(self.store.cached_response(
+            request(b'POST', b'a=2', {b'Content-Length': b'3'})))
+        self.assertIsNotNone(self.store.cached_response(
+            request(b'POST', b'a=1', {b'Content-Length': b'3'})))
+
+    def test_offline(self) -> None:
+        self.store.offline = True
+        replayed = self.store.cached_response(request())
+        assert replayed is not None
+        self.assertEqual(HttpParser.response(replayed.tobytes()).code, b'504')
+
+
+class TestCacheResponsesPlugin(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.cache_dir = tempfile.mkdtemp()
+        self.flags = Proxy.initialize()
+        self.flags.cache_dir = self.cache_dir
+        self.plugin = CacheResponsesPlugin(
+            uuid.uuid4(), self.flags, mock.MagicMock(), mock.MagicMock())
+
+    def tearDown(self) -> None:
+        CacheResponsesPlugin.ENABLED.clear()
+        CacheResponsesPlugin.archive = None
+        shutil.rmtree(self.cache_dir)
+
+    def test_store_follows_enabled(self) -> None:
+        self.plugin.before_upstream_connection(request())
+        self.assertIs(self.plugin.store, self.plugin.disk_store)
+        self.plugin.on_upstream_connection_close()
+        CacheResponsesPlugin.ENABLED.set()
+        self.plugin.before_upstream_connection(request())
+        self.assertIs(self.plugin.store, self.plugin.replay_store)
+        CacheResponsesPlugin.ENABLED.clear()
+        self.plugin.before_upstream_connection(request())
+        self.assertIs(self.plugin.store, self.plugin.disk_store)
@@ -0,0 +1,527 @@
+# -*- coding: utf-8 -*-
+"""
+    proxy.py
+    ~~~~~~~~
+    ⚡⚡⚡ Fast, Lightweight, Pluggable, TLS interception capable proxy server focused on
+    Network monitoring, controls & Application development, testing, debugging.
+
+    :copyright: (c) 2013-present by Abhinav Singh and contributors.
+    :license: BSD, see LICENSE for more details.
+"""
+import os
+import time
+import uuid
+import shutil
+import tempfile
+import unittest
+import selectors
+import email.utils
+from typing import Dict, List, Optional
+from unittest import mock
+
+from proxy.proxy import Proxy
+from proxy.common.constants import DEFAULT_HTTP_PORT
+from proxy.common.utils import build_http_request, build_http_response
+from proxy.core.connection import TcpClientConnection, UpstreamConnectionPool
+from proxy.http.handler import HttpProtocolHandler
+from proxy.http.parser import HttpParser
+from proxy.http.proxy import HttpProxyPlugin
+from proxy.plugin import SharedCacheResponsesPlugin
+from proxy.plugin.cache.collapse import CollapsedFetch, waiterStates
+from proxy.plugin.cache.policy import CacheEntry, parse_cache_control, is_storable
+from proxy.plugin.cache.revalidate import Revalidator
+from proxy.plugin.cache.store.disk import OnDiskCacheTier
+from proxy.plugin.cache.store.memory import InMemoryCacheTier
+from proxy.plugin.cache.store.segment import SegmentCacheTier
+from proxy.plugin.cache.store.shared import CacheCounters, SharedCache, SharedCacheStore
+
+
+def http_date(offset: float = 0) -> bytes:
+    return email.utils.formatdate(time.time() + offset, usegmt=True).encode()
+
+
+def request(url: bytes = b'http://example.org/get',
+            headers: Optional[Dict[bytes, bytes]] = None,
+            method: bytes = b'GET') -> HttpParser:
+    return HttpParser.request(build_http_request(method, url, headers=headers))
+
+
+def response(headers: Dict[bytes, bytes], body: bytes = b'hello') -> bytes:
+    return build_http_response(200, reason=b'OK', headers=headers, body=body)
+
+
+class TestCachePolicy(unittest.TestCase):
+
+    def test_parse_cache_control(self) -> None:
+        self.assertEqual(
+            parse_cache_control([b'Public, max-age=60', b'no-cache="Set-Cookie, X-Foo", MAX-AGE=10']),
+            {'public': None, 'max-age': '60', 'no-cache': 'Set-Cookie, X-Foo'})
+
+    def test_is_storable(self) -> None:
+        def storable(headers: Dict[bytes, bytes],
+                     request_headers: Optional[Dict[bytes, bytes]] = None) -> bool:
+            r = HttpParser.response(response(headers))
+            return is_storable(
+                request(headers=request_headers), r,
+                parse_cache_control(r.headers.get_all(b'cache-control')))
+        self.assertTrue(storable({b'Cache-Control': b'max-age=60'}))
+        self.assertTrue(storable({b'Expires': http_date(60)}))
+        self.assertTrue(storable({b'ETag': b'"v1"'}))
+        self.assertFalse(storable({}))
+        self.assertFalse(storable({b'Cache-Control': b'private, max-age=60'}))
+        self.assertFalse(storable({b'Cache-Control': b'no-store'}))
+        self.assertFalse(storable({b'Cache-Control': b'max-age=60', b'Vary': b'*'}))
+        self.assertFalse(storable({b'Cache-Control': b'max-age=60', b'Set-Cookie': b'a=b'}))
+        self.assertFalse(storable(
+            {b'Cache-Control': b'max-age=60'}, {b'Authorization': b'Basic eA=='}))
+        self.assertTrue(storable(
+            {b'Cache-Control': b'public, max-age=60'}, {b'Authorization': b'Basic eA=='}))
+
+    def test_freshness(self) -> None:
+        def entry(headers: Dict[bytes, bytes]) -> CacheEntry:
+            now = time.time()
+            return CacheEntry.from_response(
+                b'key', request(), HttpParser.response(response(headers)), now, now)
+        now = time.time()
+        fresh = entry({b'Cache-Control': b'max-age=60', b'Date': http_date()})
+        self.assertTrue(fresh.is_fresh({}, now))
+        self.assertFalse(fresh.is_fresh({}, now + 61))
+        self.assertFalse(fresh.is_fresh({'no-cache': None}, now))
+        self.assertFalse(fresh.is_fresh({'min-fresh': '120'}, now))
+        self.assertTrue(fresh.is_fresh({'max-stale': '10'}, now + 65))
+        self.assertTrue(fresh.is_fresh({'max-stale': None}, now + 3600))
+        # Age header received from upstream counts towards current age
+        aged = entry({b'Cache-Control': b'max-age=60', b'Age': b'50'})
+        self.assertFalse(aged.is_fresh({}, now + 20))
+        self.assertFalse(entry({b'Expires': b'0'}).is_fresh({}, now))
+        self.assertTrue(entry({b'Expires': http_date(60), b'Date': http_date()}).is_fresh({}, now))
+        # 10% of time since last modification
+        heuristic = entry({b'Last-Modified': http_date(-1000), b'Date': http_date()})
+        self.assertTrue(heuristic.is_fresh({}, now + 90))
+        self.assertFalse(heuristic.is_fresh({}, now + 110))
+        must_revalidate = entry({b'Cache-Control': b'max-age=0, must-revalidate'})
+        self.assertFalse(must_revalidate.is_fresh({'max-stale': None}, now + 1))
+
+    def test_entry_is_stored_without_hop_by_hop_headers(self) -> None:
+        chunked = b'HTTP/1.1 200 OK\r\n' + \
+            b'Cache-Control: max-age=60\r\n' + \
+            b'Transfer-Encoding: chunked\r\n' + \
+            b'Connection: keep-alive, X-Hop\r\n' + \
+            b'X-Hop: 1\r\n' + \
+            b'Age: 5\r\n\r\n' + \
+            b'5\r\nhello\r\n0\r\n\r\n'
+        now = time.time()
+        entry = CacheEntry.from_response(
+            b'key', request(), HttpParser.response(chunked), now, now)
+        served = HttpParser.response(entry.build(now))
+        self.assertEqual(served.header(b'age'), b'5')
+        self.assertEqual(served.header(b'content-length'), b'5')
+        self.assertEqual(served.body, b'hello')
+        for header in (b'transfer-encoding', b'connection', b'x-hop'):
+            self.assertFalse(served.has_header(header))
+        restored = CacheEntry.unpack(CacheEntry.pack([entry]))[0]
+        self.assertEqual(restored.build(now), entry.build(now))
+
+    def test_validators(self) -> None:
+        now = time.time()
+        last_modified = http_date(-3600)
+        entry = CacheEntry.from_response(
+            b'key', request(), HttpParser.response(response({
+                b'Cache-Control': b'max-age=0, stale-while-revalidate=30, stale-if-error=60',
+                b'ETag': b'W/"v1"',
+                b'Last-Modified': last_modified,
+            })), now, now)
+        self.assertEqual(entry.conditional_headers(), [
+            (b'If-None-Match', b'W/"v1"'), (b'If-Modified-Since', last_modified)])
+        self.assertTrue(entry.not_modified(request(headers={b'If-None-Match': b'"v0", "v1"'})))
+        self.assertFalse(entry.not_modified(request(headers={b'If-None-Match': b'"v2"'})))
+        self.assertTrue(entry.not_modified(request(headers={b'If-Modified-Since': http_date()})))
+        not_modified = HttpParser.response(entry.build_not_modified(now))
+        self.assertEqual(not_modified.code, b'304')
+        self.assertFalse(not_modified.has_header(b'content-length'))
+
+        self.assertTrue(entry.can_serve_stale('stale-while-revalidate', {}, now + 20))
+        self.assertFalse(entry.can_serve_stale('stale-while-revalidate', {}, now + 40))
+        self.assertFalse(entry.can_serve_stale('stale-while-revalidate', {'no-cache': None}, now))
+        self.assertTrue(entry.can_serve_stale('stale-if-error', {}, now + 40))
+        self.assertTrue(entry.can_serve_stale('stale-if-error', {'stale-if-error': '120'}, now + 100))
+
+        freshened = entry.freshen(HttpParser.response(build_http_response(
+            304, reason=b'Not Modified',
+            headers={b'Cache-Control': b'max-age=60', b'ETag': b'W/"v1"'})), now, now)
+        self.assertTrue(freshened.is_fresh({}, now + 30))
+        self.assertEqual(freshened.body, b'hello')
+        self.assertEqual(freshened.last_modified, last_modified)
+
+
+class TestSharedCacheStore(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.cache = SharedCache(InMemoryCacheTier(1024 * 1024), counters=CacheCounters())
+        self.store = SharedCacheStore(uuid.uuid4(), self.cache)
+
+    def fetch(self, req: HttpParser, raw: bytes) -> Optional[memoryview]:
+        cached = self.store.cached_response(req)
+        if cached is None:
+            self.store.open(req)
+            self.store.cache_response_chunk(memoryview(raw))
+            self.store.close()
+        return cached
+
+    def test_cache_key_normalization(self) -> None:
+        self.assertEqual(
+            self.store.cache_key(request(b'HTTP://Example.ORG:80/%7euser/a%2fb?q=1#frag')),
+            b'http://example.org/~user/a%2Fb?q=1')
+        self.assertEqual(
+            self.store.cache_key(request(b'http://example.org:8080')),
+            b'http://example.org:8080/')
+        self.assertIsNone(self.store.cache_key(request(b'example.org:443', method=b'CONNECT')))
+
+    def test_fresh_response_is_served_from_cache(self) -> None:
+        raw = response({b'Cache-Control': b'max-age=60'})
+        self.assertIsNone(self.fetch(request(), raw))
+        cached = self.fetch(request(), raw)
+        assert cached is not None
+        self.assertEqual(HttpParser.response(cached.tobytes()).body, b'hello')
+        counters = self.cache.counters.snapshot()
+        self.assertEqual(counters['hits'], 1)
+        self.assertEqual(counters['misses'], 1)
+        self.assertEqual(counters['stores'], 1)
+        self.assertEqual(counters['bytes_served'], len(cached))
+
+    def test_partial_and_large_responses_are_not_stored(self) -> None:
+        self.store.max_object_size = 3
+        self.fetch(request(), response({b'Cache-Control': b'max-age=60'}))
+        self.store.max_object_size = 1024
+        self.fetch(request(), response({b'Cache-Control': b'max-age=60'})[:-1])
+        self.assertIsNone(self.cache.lookup(b'http://example.org/get', request()))
+
+    def test_vary(self) -> None:
+        def fetch(encoding: bytes) -> Optional[memoryview]:
+            return self.fetch(
+                request(headers={b'Accept-Encoding': encoding}),
+                response({b'Cache-Control': b'max-age=60', b'Vary': b'Accept-Encoding'},
+                         body=encoding))
+        self.assertIsNone(fetch(b'gzip'))
+        self.assertIsNone(fetch(b'br'))
+        cached = fetch(b'gzip')
+        assert cached is not None
+        self.assertEqual(HttpParser.response(cached.tobytes()).body, b'gzip')
+
+    def test_unsafe_request_invalidates(self) -> None:
+        self.fetch(request(), response({b'Cache-Control': b'max-age=60'}))
+        self.fetch(request(method=b'POST'), response({}))
+        self.assertIsNone(self.store.cached_response(request()))
+
+    def test_fresh_response_satisfies_conditional_request(self) -> None:
+        self.fetch(request(), response({b'Cache-Control': b'max-age=60', b'ETag': b'"v1"'}))
+        cached = self.store.cached_response(request(headers={b'If-None-Match': b'"v1"'}))
+        assert cached is not None
+        self.assertEqual(HttpParser.response(cached.tobytes()).code, b'304')
+
+    def test_stale_response_is_revalidated(self) -> None:
+        self.fetch(request(), response({b'Cache-Control': b'max-age=0', b'ETag': b'"v1"'}))
+        req = request()
+        self.assertIsNone(self.store.cached_response(req))
+        self.store.open(req)
+        self.assertEqual(req.header(b'if-none-match'), b'"v1"')
+        not_modified = build_http_response(
+            304, reason=b'Not Modified',
+            headers={b'Cache-Control': b'max-age=60', b'ETag': b'"v1"'})
+        # Response is held back until headers are complete
+        self.assertEqual(self.store.cache_response_chunk(memoryview(not_modified[:10])).tobytes(), b'')
+        served = HttpParser.response(
+            self.store.cache_response_chunk(memoryview(not_modified[10:])).tobytes())
+        self.assertEqual(served.code, b'200')
+        self.assertEqual(served.body, b'hello')
+        self.assertIsNotNone(self.store.cached_response(request()))
+        counters = self.cache.counters.snapshot()
+        self.assertEqual(counters['revalidations'], 1)
+        self.assertEqual(counters['not_modified'], 1)
+
+    def test_stale_if_error(self) -> None:
+        self.fetch(request(), response({b'Cache-Control': b'max-age=0, stale-if-error=60'}))
+        req = request()
+        self.assertIsNone(self.store.cached_response(req))
+        self.store.open(req)
+        served = self.store.cache_response_chunk(memoryview(
+            build_http_response(503, reason=b'Service Unavailable', body=b'down')))
+        self.assertEqual(HttpParser.response(served.tobytes()).body, b'hello')
+        self.assertEqual(self.cache.counters.snapshot()['stale_hits'], 1)
+
+    def test_stale_while_revalidate(self) -> None:
+        self.store.revalidator = mock.MagicMock()
+        self.fetch(request(), response({b'Cache-Control': b'max-age=0, stale-while-revalidate=60'}))
+        cached = self.store.cached_response(request())
+        assert cached is not None
+        self.assertEqual(HttpParser.response(cached.tobytes()).body, b'hello')
+        self.store.revalidator.revalidate.assert_called_once()
+
+    @mock.patch('proxy.plugin.cache.revalidate.threading.Thread')
+    @mock.patch.object(Revalidator, 'fetch')
+    def test_background_revalidation(
+            self, mock_fetch: mock.Mock, mock_thread: mock.Mock) -> None:
+        self.fetch(request(), response({b'Cache-Control': b'max-age=0', b'ETag': b'"v1"'}))
+        entry = self.cache.lookup(b'http://example.org/get', request())
+        assert entry is not None
+        revalidator = Revalidator(self.cache)
+        self.assertTrue(revalidator.revalidate(entry, request()))
+        self.assertFalse(revalidator.revalidate(entry, request()))
+        (_, conditional, host, port) = mock_thread.call_args[1]['args']
+        self.assertEqual((host, port), ('example.org', DEFAULT_HTTP_PORT))
+        self.assertEqual(conditional.header(b'if-none-match'), b'"v1"')
+        mock_fetch.return_value = HttpParser.response(build_http_response(
+            304, reason=b'Not Modified', headers={b'Cache-Control': b'max-age=60'}))
+        revalidator.run(entry, conditional, host, port)
+        self.assertIsNotNone(self.store.cached_response(request()))
+        self.assertEqual(revalidator.inflight, set())
+
+    def test_only_if_cached(self) -> None:
+        cached = self.store.cached_response(
+            request(headers={b'Cache-Control': b'only-if-cached'}))
+        assert cached is not None
+        self.assertEqual(HttpParser.response(cached.tobytes()).code, b'504')
+
+
+class TestCacheTiers(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.cache_dir = tempfile.mkdtemp()
+        now = time.time()
+        self.entry = CacheEntry.from_response(
+            b'http://example.org/get', request(),
+            HttpParser.response(response({b'Cache-Control': b'max-age=60'})), now, now)
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.cache_dir)
+
+    def keyed(self, key: bytes) -> List[CacheEntry]:
+        return [CacheEntry.from_response(
+            key, request(), HttpParser.response(response({b'Cache-Control': b'max-age=60'})),
+            self.entry.request_time, self.entry.response_time)]
+
+    def test_memory_tier_evicts_least_recently_used(self) -> None:
+        tier = InMemoryCacheTier(self.entry.size * 2)
+        tier.put(b'a', [self.entry])
+        tier.put(b'b', [self.entry])
+        tier.get(b'a')
+        tier.put(b'c', [self.entry])
+        self.assertIsNotNone(tier.get(b'a'))
+        self.assertIsNone(tier.get(b'b'))
+        self.assertEqual(tier.size, self.entry.size * 2)
+
+    def test_disk_tier_is_promoted_into_memory(self) -> None:
+        disk = OnDiskCacheTier(self.cache_dir)
+        SharedCache(InMemoryCacheTier(1024), disk).store(self.entry)
+        cache = SharedCache(InMemoryCacheTier(1024), disk)
+        self.assertIsNotNone(cache.lookup(self.entry.key, request()))
+        self.assertIsNotNone(cache.memory.get(self.entry.key))
+
+    def test_segment_tier_is_shared(self) -> None:
+        writer = SegmentCacheTier(self.cache_dir, slots=64)
+        reader = SegmentCacheTier(self.cache_dir, slots=64)
+        self.assertIsNone(reader.get(self.entry.key))
+        writer.put(self.entry.key, [self.entry])
+        entries = reader.get(self.entry.key)
+        assert entries
+        self.assertEqual(entries[0].serialize(), self.entry.serialize())
+        reader.delete(self.entry.key)
+        self.assertIsNone(writer.get(self.entry.key))
+        self.assertEqual(len(writer), 0)
+
+    def test_segment_tier_compaction(self) -> None:
+        record = len(CacheEntry.pack([self.entry])) + len(self.entry.key) + 8
+        tier = SegmentCacheTier(self.cache_dir, segment_size=record * 2, slots=64)
+        for _ in range(3):
+            tier.put(self.entry.key, [self.entry])
+        # First segment held two versions of the record, both dead by now
+        self.assertFalse(os.path.exists(tier.path(0)))
+        self.assertEqual(tier.size, record)
+        self.assertIsNotNone(tier.get(self.entry.key))
+
+    def test_segment_tier_eviction(self) -> None:
+        record = len(CacheEntry.pack(self.keyed(b'a'))) + 1 + 8
+        tier = SegmentCacheTier(
+            self.cache_dir, max_size=record * 4, segment_size=record * 2, slots=64)
+        tier.put(b'a', self.keyed(b'a'))
+        tier.put(b'b', self.keyed(b'b'))
+        time.sleep(0.01)
+        tier.get(b'a')
+        for key in (b'c', b'd', b'e'):
+            tier.put(key, self.keyed(key))
+        # Recently used entry survives eviction of its segment
+        self.assertLessEqual(tier.size, record * 4)
+        self.assertIsNotNone(tier.get(b'a'))
+        self.assertIsNone(tier.get(b'b'))
+        self.assertIsNotNone(tier.get(b'e'))
+
+    def test_segment_tier_index_is_bounded(self) -> None:
+        tier = SegmentCacheTier(self.cache_dir, slots=8)
+        for n in range(20):
+            tier.put(b'%d' % n, self.keyed(b'%d' % n))
+        self.assertEqual(len(tier), 6)
+        self.assertIsNotNone(tier.get(b'19'))
+        self.assertIsNone(tier.get(b'0'))
+
+
+class TestRequestCollapsing(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.cache = SharedCache(InMemoryCacheTier(1024 * 1024), counters=CacheCounters())
+        self.leader = SharedCacheStore(uuid.uuid4(), self.cache)
+        self.follower = SharedCacheStore(uuid.uuid4(), self.cache)
+
+    def tearDown(self) -> None:
+        self.leader.close()
+        self.follower.close()
+
+    def test_follower_receives_leader_response(self) -> None:
+        raw = response({b'Cache-Control': b'max-age=60'})
+        self.assertIsNone(self.leader.cached_response(request()))
+        self.leader.open(request())
+        self.assertEqual(self.follower.cached_response(request()), b'')
+        assert self.follower.waiter
+        self.assertEqual(self.follower.receive(), [])
+        self.assertEqual(self.follower.waiter.state, waiterStates.WAITING)
+        self.leader.cache_response_chunk(memoryview(raw[:10]))
+        self.leader.cache_response_chunk(memoryview(raw[10:]))
+        received = self.follower.receive()
+        assert received is not None
+        self.assertEqual(b''.join(c.tobytes() for c in received), raw)
+        self.assertIsNone(self.follower.waiter)
+        counters = self.cache.counters.snapshot()
+        self.assertEqual(counters['collapsed'], 1)
+        self.assertEqual(counters['misses'], 1)
+
+    def test_private_requests_are_not_collapsed(self) -> None:
+        self.leader.open(request())
+        self.assertIsNone(self.follower.cached_response(
+            request(headers={b'Authorization': b'Basic dXNlcjpwYXNz'})))
+        self.assertIsNone(self.follower.cached_response(
+            request(headers={b'Range': b'bytes=0-1'})))
+        self.assertIsNone(self.follower.cached_response(
+            request(headers={b'Cache-Control': b'no-store'})))
+
+    @mock.patch('proxy.plugin.cache.collapse.threading.Thread')
+    def test_unshareable_response_falls_back(self, mock_thread: mock.Mock) -> None:
+        self.leader.open(request())
+        self.assertEqual(self.follower.cached_response(request()), b'')
+        self.leader.cache_response_chunk(memoryview(
+            response({b'Cache-Control': b'private'})))
+        self.assertEqual(self.follower.receive(), [])
+        mock_thread.assert_called_once()
+        assert self.follower.waiter
+        fetch = self.follower.waiter.fetch
+        self.assertTrue(fetch.private)
+        fetch.feed(response({b'Cache-Control': b'private'}, b'mine'))
+        received = self.follower.receive()
+        assert received is not None
+        self.assertEqual(HttpParser.response(received[0].tobytes()).body, b'mine')
+
+    @mock.patch('proxy.plugin.cache.collapse.threading.Thread')
+    def test_vary_mismatch_falls_back(self, mock_thread: mock.Mock) -> None:
+        self.leader.open(request(headers={b'Accept-Encoding': b'gzip'}))
+        self.assertEqual(self.follower.cached_response(request()), b'')
+        self.leader.cache_response_chunk(memoryview(response(
+            {b'Cache-Control': b'max-age=60', b'Vary': b'Accept-Encoding'})))
+        self.assertEqual(self.follower.receive(), [])
+        mock_thread.assert_called_once()
+
+    def test_failed_leader(self) -> None:
+        self.leader.open(request())
+        self.assertEqual(self.follower.cached_response(request()), b'')
+        self.leader.cache_response_chunk(memoryview(
+            response({b'Cache-Control': b'max-age=60'})[:-2]))
+        self.assertEqual(len(self.follower.receive() or []), 1)
+        self.leader.close()
+        self.assertIsNone(self.follower.receive())
+        self.assertIsNone(self.follower.waiter)
+
+    def test_delivered_chunks_are_trimmed(self) -> None:
+        fetch = CollapsedFetch(b'http://example.org/get', request(), 1024)
+        waiter = fetch.attach(request())
+        assert waiter
+        raw = build_http_response(200, headers={
+            b'Cache-Control': b'max-age=60', b'Transfer-Encoding': b'chunked'})
+        fetch.feed(raw)
+        fetch.feed(b'5\r\nhello\r\n')
+        fetch.accepting = False
+        self.assertEqual(b''.join(waiter.receive()), raw + b'5\r\nhello\r\n')
+        self.assertEqual(fetch.chunks, [])
+        fetch.feed(b'0\r\n\r\n')
+        self.assertEqual(waiter.receive(), [b'0\r\n\r\n'])
+        self.assertEqual(waiter.state, waiterStates.DONE)
+        self.assertIsNone(fetch.attach(request()))
+        waiter.close()
+
+
+class TestSharedCacheResponsesPlugin(unittest.TestCase):
+
+    @mock.patch('selectors.DefaultSelector')
+    @mock.patch('socket.fromfd')
+    def setUp(self,
+              mock_fromfd: mock.Mock,
+              mock_selector: mock.Mock) -> None:
+        self.mock_fromfd = mock_fromfd
+        self.mock_selector = mock_selector
+
+        self._addr = ('127.0.0.1', 54382)
+        self.flags = Proxy.initialize()
+        self.flags.plugins = {
+            b'HttpProtocolHandlerPlugin': [HttpProxyPlugin],
+            b'HttpProxyBasePlugin': [SharedCacheResponsesPlugin],
+        }
+        HttpProxyPlugin.pool = UpstreamConnectionPool(
+            self.flags.conn_pool_max_per_host, self.flags.conn_pool_idle_timeout)
+        SharedCacheResponsesPlugin.cache = SharedCache(
+            InMemoryCacheTier(1024 * 1024), counters=CacheCounters())
+        SharedCacheResponsesPlugin.revalidator = Revalidator(SharedCacheResponsesPlugin.cache)
+        self._conn = mock_fromfd.return_value
+        self.protocol_handler = HttpProtocolHandler(
+            TcpClientConnection(self._conn, self._addr),
+            flags=self.flags)
+        self.protocol_handler.initialize()
+
+    def tearDown(self) -> None:
+        SharedCacheResponsesPlugin.cache = None
+        SharedCacheResponsesPlugin.revalidator = None
+
+    @mock.patch('proxy.http.proxy.server.TcpServerConnection')
+    def test_keep_alive_request_is_served_from_cache(
+            self, mock_server_conn: mock.Mock) -> None:
+        server = mock_server_conn.return_value
+        server.closed = False
+        server.has_buffer.return_value = False
+        server.addr = ('example.org', DEFAULT_HTTP_PORT)
+        server.recv.return_value = memoryview(
+            response({b'Cache-Control': b'max-age=60'}))
+        self._conn.recv.return_value = build_http_request(
+            b'GET', b'http://example.org/get',
+            headers={b'Host': b'example.org'})
+        client_read = [(selectors.SelectorKey(
+            fileobj=self._conn,
+            fd=self._conn.fileno,
+            events=selectors.EVENT_READ,
+            data=None), selectors.EVENT_READ)]
+        self.mock_selector.return_value.select.side_effect = [
+            client_read,
+            [(selectors.SelectorKey(
+                fileobj=server.connection,
+                fd=server.connection.fileno,
+                events=selectors.EVENT_READ,
+                data=None), selectors.EVENT_READ)],
+            client_read,
+            client_read, ]
+
+        for _ in range(4):
+            self.protocol_handler.run_once()
+
+        mock_server_conn.assert_called_once_with('example.org', DEFAULT_HTTP_PORT)
+        server.queue.assert_called_once()
+        buffer = self.protocol_handler.client.buffer
+        self.assertEqual(len(buffer), 3)
+        for cached in buffer[1:]:
+            self.assertTrue(cached.tobytes().startswith(b'HTTP/1.1 200 OK\r\nAge: 0\r\n'))
+            self.assertTrue(cached.tobytes().endswith(b'\r\n\r\nhello'))
+        assert SharedCacheResponsesPlugin.cache
+        self.assertEqual(SharedCacheResponsesPlugin.cache.counters.snapshot()['hits'], 2)